@@ -7,19 +7,42 @@ from streamlit_lottie import st_lottie
 import os
 
 # --- NUEVOS IMPORTS ---
-from core.database import cargar_datos_desde_bd
-from core.processing import analizar_archivo_cargado, insertar_nuevos_datos, registrar_log_de_carga, to_excel
+from core.repositorio import crear_repositorio, ESTADISTICAS_LECTURA
+from core.database import cargar_datos_desde_bd, recargar_datos_completos, refrescar_operaciones, invalidar_datos, reporte_memoria, problemas_esquema, reporte_esquema_dataset, version_datos
+from core.indice_archivos import obtener_indice_archivos
+from core.calidad import obtener_perfil_dataset
+from core.agregados import obtener_agregado_local, cargar_agregado_remoto, filtrar_agregado
+from core.pronosticos import programar_pronosticos
+from core.ingesta import FORMATOS_SOPORTADOS
+from core.cache_analisis import hash_contenido, obtener_cache_analisis
+from core.trabajos import TIPOS_INGESTA, obtener_gestor_trabajos, trabajo_analisis, trabajo_carga
 # <-- MÉTRICAS: Paso 1 - Importar el nuevo código de métricas
 from core.metrics import init_metrics
 from ui.pages import filtros, resumen, clasificacion, soporte, asignacion, analisis_tiempos, analisis_general, pronosticos, glosario, admin_metrics # admin_metrics es nuevo
 from ui.styles import inyectar_estilos_compactos, load_lottie_url, inyectar_iconos_en_tabs, mostrar_footer
+from ui.descargas import boton_descarga
+from ui.reporte import mostrar_descarga_reporte
 from config import LOGO_URL, LOTTIE_URL
 
+# El DataFrame de operaciones se comparte entre sesiones: con copy-on-write los
+# subconjuntos y columnas derivadas de las páginas nunca lo modifican ni lo duplican
+pd.set_option("mode.copy_on_write", True)
+
 # --- CONFIGURACIÓN DE PÁGINA ---
 st.set_page_config(page_title="FAM Logística | BI", page_icon=LOGO_URL, layout="wide")
 st.markdown("""<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/bootstrap-icons.css">""", unsafe_allow_html=True)
 
 
+# Backend de datos: 'supabase' (producción), 'replica' (DuckDB local como caché de Supabase) o 'local' (DuckDB sin red)
+DATA_BACKEND = os.environ.get("DATA_BACKEND", "supabase").lower()
+# Con pushdown los KPIs agregados se calculan en la base (sql/agregado_operaciones.sql)
+AGGREGATION_PUSHDOWN = os.environ.get("AGGREGATION_PUSHDOWN", "0") == "1"
+
+@st.cache_resource
+def obtener_repositorio(_supabase: Client):
+    # Un único repositorio por proceso: el backend local mantiene abierta su conexión DuckDB
+    return crear_repositorio(_supabase, DATA_BACKEND)
+
 # --- INICIALIZACIÓN DE CREDENCIALES (Tu código actual) ---
 try:
     # Paso 1: Cargar las credenciales desde el entorno correcto
@@ -33,20 +56,22 @@ try:
         auth_user_password_hash = os.environ.get("auth_user_password_hash")
     else:
         # MODO LOCAL
-        supabase_url = st.secrets["supabase_url"]
-        supabase_key = st.secrets["supabase_key"]
+        supabase_url = st.secrets.get("supabase_url")
+        supabase_key = st.secrets.get("supabase_key")
         auth_admin_name = st.secrets["auth_admin_name"]
         auth_admin_password_hash = st.secrets["auth_admin_password_hash"]
         auth_user_name = st.secrets["auth_user_name"]
         auth_user_password_hash = st.secrets["auth_user_password_hash"]
 
     # Paso 2: Verificar que todas las credenciales se cargaron
-    if not all([supabase_url, supabase_key, auth_admin_name, auth_admin_password_hash, auth_user_name, auth_user_password_hash]):
+    credenciales_bd = [] if DATA_BACKEND == "local" else [supabase_url, supabase_key]
+    if not all([*credenciales_bd, auth_admin_name, auth_admin_password_hash, auth_user_name, auth_user_password_hash]):
         st.error("Error: Faltan una o más credenciales. Revisa tus secretos o variables de entorno.")
         st.stop()
     
     # Paso 3: Crear los clientes de Supabase y Autenticación
-    supabase = create_client(supabase_url, supabase_key)
+    supabase = create_client(supabase_url, supabase_key) if DATA_BACKEND != "local" else None
+    repo = obtener_repositorio(supabase)
     credentials = {
         "usernames": {
             "estrategia.dev": {"name": auth_admin_name, "password": auth_admin_password_hash},
@@ -62,8 +87,22 @@ except Exception as e:
     st.error(f"Error fatal de inicialización: {e}")
     st.stop()
 
+# Análisis y carga de archivos corren en segundo plano (core/trabajos.py); mientras hay
+# trabajos activos, este fragmento se vuelve a ejecutar solo, sin re-ejecutar toda la app
+@st.experimental_fragment(run_every=1)
+def panel_trabajos_activos():
+    activos = obtener_gestor_trabajos().activos(TIPOS_INGESTA)
+    if not activos:
+        st.rerun() # Terminaron: la app completa muestra los resultados
+    for trabajo in activos:
+        etiqueta = f"{'Analizando' if trabajo.tipo == 'analisis' else 'Cargando'} {trabajo.descripcion}"
+        if trabajo.progreso is None:
+            st.caption(f"⏳ {etiqueta} · {trabajo.mensaje or 'en cola...'}")
+        else:
+            st.progress(trabajo.progreso, text=f"{etiqueta} · {trabajo.mensaje}")
+
 # <-- MÉTRICAS: Paso 2 - Inicializar el objeto de métricas
-metrics = init_metrics(supabase)
+metrics = init_metrics(repo)
 
 # --- LÓGICA DE LOGIN (Tu código actual) ---
 name, authentication_status, username = authenticator.login()
@@ -117,43 +156,99 @@ with st.sidebar:
         st.sidebar.markdown("""<span style="font-size:18px;"><i class="bi bi-person-gear"></i> <strong>Panel de Administrador</strong></span>""", unsafe_allow_html=True)
         with st.sidebar.expander("Opciones", expanded=True):
             st.markdown('<h2><i class="bi bi-cloud-arrow-up"></i> Actualizar Datos</h2>', unsafe_allow_html=True)
-            uploaded_file = st.file_uploader("Sube el archivo de operaciones", type=['xls', 'xlsx'], key="file_uploader")
-            if 'df_nuevos' not in st.session_state:
-                st.session_state.df_nuevos, st.session_state.df_existentes, st.session_state.df_duplicados_internos, st.session_state.resumen_calidad = pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+            gestor = obtener_gestor_trabajos()
+            uploaded_file = st.file_uploader("Sube el archivo de operaciones", type=FORMATOS_SOPORTADOS, key="file_uploader", help="CSV y Parquet se procesan bastante más rápido que Excel para los mismos datos.")
             if uploaded_file:
-                if st.button("1. Analizar Archivo", type="secondary", use_container_width=True):
-                    with st.spinner("Realizando análisis completo del archivo..."):
-                        try:
-                            df_crudo = pd.read_excel(uploaded_file, engine=None)
-                            df_nuevos, df_existentes, df_duplicados_internos, resumen_calidad = analizar_archivo_cargado(df_crudo, supabase)
-                            st.session_state.df_nuevos, st.session_state.df_existentes, st.session_state.df_duplicados_internos, st.session_state.resumen_calidad = df_nuevos, df_existentes, df_duplicados_internos, resumen_calidad
-                        except Exception as e:
-                            st.sidebar.error(f"Error en el análisis: {e}")
-                            st.session_state.df_nuevos, st.session_state.df_existentes, st.session_state.df_duplicados_internos, st.session_state.resumen_calidad = pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-            
-            if not st.session_state.df_nuevos.empty or not st.session_state.df_existentes.empty or not st.session_state.df_duplicados_internos.empty:
-                st.subheader("Resultados del Análisis")
-                st.success(f"{len(st.session_state.df_nuevos)} registros nuevos para cargar.")
-                st.info(f"{len(st.session_state.df_existentes)} registros ya existentes en la BD.")
-                if not st.session_state.df_duplicados_internos.empty:
-                    st.warning(f"{len(st.session_state.df_duplicados_internos)} filas duplicadas en el archivo (descartadas).")
-                    st.download_button(label="Descargar Reporte de Duplicados", data=to_excel(st.session_state.df_duplicados_internos), file_name="reporte_duplicados.xlsx", use_container_width=True, key="descargar_duplicados")
-                if not st.session_state.resumen_calidad.empty:
-                    st.subheader("Calidad de los Datos Nuevos")
-                    st.dataframe(st.session_state.resumen_calidad, use_container_width=True)
-                if not st.session_state.df_nuevos.empty: # Comprobación extra
-                    if st.button(f"2. Cargar {len(st.session_state.df_nuevos)} Registros Nuevos a la BD", type="primary", use_container_width=True):
-                        num_insertados = insertar_nuevos_datos(st.session_state.df_nuevos, supabase)
-                        if num_insertados != -1:
-                            registrar_log_de_carga(supabase, num_insertados, len(st.session_state.df_existentes), len(st.session_state.df_duplicados_internos), st.session_state.resumen_calidad)
-                            st.cache_data.clear()
-                            st.session_state.df_nuevos, st.session_state.df_existentes, st.session_state.df_duplicados_internos, st.session_state.resumen_calidad = pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+                if st.button("1. Analizar Archivo", type="secondary", use_container_width=True, disabled=bool(gestor.activos(TIPOS_INGESTA))):
+                    contenido = uploaded_file.getvalue()
+                    hash_archivo = hash_contenido(contenido)
+                    # Se envían los bytes: el trabajo sigue aunque se recargue la página y el archivo subido desaparezca.
+                    # Si el archivo ya se analizó, el trabajo reutiliza su lectura y solo lo compara con la base actual
+                    gestor.enviar('analisis', uploaded_file.name, trabajo_analisis, contenido, uploaded_file.name, repo, hash_archivo)
+                    st.rerun()
+
+            if gestor.activos(TIPOS_INGESTA):
+                panel_trabajos_activos()
+            else:
+                trabajo_analisis_actual, trabajo_carga_actual = gestor.ultimo('analisis'), gestor.ultimo('carga')
+                carga_reciente = trabajo_carga_actual is not None and (trabajo_analisis_actual is None or trabajo_carga_actual.creado > trabajo_analisis_actual.creado)
+                if carga_reciente:
+                    if not trabajo_carga_actual.aplicado:
+                        # Lo que sí se guardó ya está en la BD aunque falten lotes: refrescamos igual
+                        if trabajo_carga_actual.resultado and trabajo_carga_actual.resultado['files_actualizados']:
+                            refrescar_operaciones(repo, trabajo_carga_actual.resultado['files_actualizados'])
+                        invalidar_datos()
+                        st.cache_data.clear()
+                        trabajo_carga_actual.aplicado = True
+                    resultado = trabajo_carga_actual.resultado
+                    if trabajo_carga_actual.estado == 'fallido':
+                        st.error(f"❌ Error al insertar los datos: {trabajo_carga_actual.error}")
+                    elif resultado['lotes_fallidos']:
+                        st.error(f"❌ {resultado['lotes_fallidos']} de {resultado['lotes_totales']} lotes no se pudieron insertar ({resultado['error']}). Vuelve a cargar para reanudar: los lotes ya guardados no se reenviarán.")
+                    elif 'error_actualizacion' in resultado:
+                        st.error(f"❌ Se añadieron {resultado['insertados']} operaciones nuevas, pero falló la actualización de las modificadas ({resultado['error_actualizacion']}). Vuelve a cargar para reintentarla.")
+                    else:
+                        st.success(f"✅ ¡Éxito! Se han añadido {resultado['insertados']} operaciones nuevas y actualizado {resultado['actualizados']} existentes.")
+                        if not resultado['log_registrado']:
+                            st.warning(f"No se pudo registrar el log de esta carga: {resultado.get('error_log', 'error desconocido')}")
+                analisis_pendiente = trabajo_analisis_actual is not None and not (carga_reciente and trabajo_carga_actual.estado == 'completado' and not trabajo_carga_actual.resultado['lotes_fallidos'] and 'error_actualizacion' not in trabajo_carga_actual.resultado)
+                if analisis_pendiente and trabajo_analisis_actual.estado == 'fallido':
+                    st.sidebar.error(f"Error en el análisis: {trabajo_analisis_actual.error}")
+                elif analisis_pendiente:
+                    analisis = trabajo_analisis_actual.resultado
+                    st.subheader("Resultados del Análisis")
+                    st.caption(f"Archivo: {analisis['nombre']}")
+                    if analisis['repetido']:
+                        st.info("Este archivo ya se había analizado: se reutiliza el resultado anterior.")
+                    if analisis['carga_previa'] is not None:
+                        st.warning(f"Este archivo ya se cargó a la BD el {pd.Timestamp(analisis['carga_previa']['fecha_carga']):%d/%m/%Y %H:%M} ({analisis['carga_previa']['registros_limpios']} registros). No hace falta volver a cargarlo.")
+                    st.success(f"{len(analisis['df_nuevos'])} registros nuevos para cargar.")
+                    st.info(f"{analisis['num_cambiados']} registros existentes con cambios (se actualizarán).")
+                    st.info(f"{len(analisis['df_existentes']) - analisis['num_cambiados']} registros existentes sin cambios.")
+                    if not analisis['df_duplicados_internos'].empty:
+                        st.warning(f"{len(analisis['df_duplicados_internos'])} filas duplicadas en el archivo (descartadas).")
+                        boton_descarga("Descargar Reporte de Duplicados", analisis['df_duplicados_internos'], "reporte_duplicados", key="duplicados", firma=analisis['hash_archivo'])
+                    if not analisis['problemas_esquema'].empty:
+                        st.warning(f"{int(analisis['problemas_esquema']['Filas'].sum())} valores no cumplen el esquema (se cargan vacíos):")
+                        st.dataframe(analisis['problemas_esquema'], hide_index=True, use_container_width=True)
+                    if not analisis['resumen_calidad'].empty:
+                        st.subheader("Calidad de los Datos Nuevos")
+                        st.dataframe(analisis['resumen_calidad'], use_container_width=True)
+                    if (not analisis['df_nuevos'].empty or analisis['num_cambiados']) and analisis['carga_previa'] is None: # Comprobación extra
+                        if st.button(f"2. Cargar {len(analisis['df_nuevos'])} Nuevos y Actualizar {analisis['num_cambiados']} Registros", type="primary", use_container_width=True):
+                            gestor.enviar('carga', analisis['nombre'], trabajo_carga, analisis, repo)
                             st.rerun()
 
+            st.divider()
+            if st.button("Recarga Completa de Datos", type="secondary", use_container_width=True, help="Vuelve a descargar toda la tabla de operaciones en lugar de solo los registros nuevos."):
+                with st.spinner("Descargando todas las operaciones..."):
+                    recargar_datos_completos(repo)
+                    obtener_indice_archivos().reiniciar()
+                    obtener_cache_analisis().reiniciar()
+                st.rerun()
+            for tabla, stats in ESTADISTICAS_LECTURA.items():
+                st.caption(f"Última lectura de '{tabla}': {stats['filas']:,} filas en {stats['segundos']} s ({stats['filas_por_segundo']:,.0f} filas/s, {stats['paginas_por_segundo']:,.1f} páginas/s)")
+            if st.checkbox("Ver uso de memoria del dataset", key="cb_memoria"):
+                st.dataframe(reporte_memoria(cargar_datos_desde_bd(repo)), hide_index=True, use_container_width=True)
+            if st.checkbox("Ver perfil de calidad del dataset", key="cb_calidad"):
+                st.dataframe(obtener_perfil_dataset(cargar_datos_desde_bd(repo), version_datos(), reporte_esquema_dataset()), hide_index=True, use_container_width=True)
+            if st.checkbox("Ver problemas de esquema del dataset", key="cb_esquema"):
+                df_problemas = problemas_esquema()
+                if df_problemas.empty: st.caption("Todas las filas cumplen el esquema.")
+                else: st.dataframe(df_problemas, hide_index=True, use_container_width=True)
+
 # --- LÓGICA PRINCIPAL DEL DASHBOARD ---
-df_operaciones = cargar_datos_desde_bd(supabase)
+# Los KPIs (Análisis General, Asignación, Capacidad, Clasificación, Resumen) se leen del cubo
+# por mes/operativo/tipo. Las filas completas solo las usan Tiempos y Pronósticos.
+if AGGREGATION_PUSHDOWN:
+    df_agregado_total = cargar_agregado_remoto(repo)
+else:
+    df_operaciones_total = cargar_datos_desde_bd(repo)
+    df_agregado_total = obtener_agregado_local(df_operaciones_total, version_datos())
+    # Cada versión nueva del dataset dispara el ajuste de pronósticos en segundo plano
+    programar_pronosticos(df_operaciones_total, version_datos())
 
-if df_operaciones.empty:
+if df_agregado_total.empty:
     # Tu código para mostrar animación de carga se mantiene igual
     lottie_animation = load_lottie_url(LOTTIE_URL)
     with st.container():
@@ -167,78 +262,59 @@ if df_operaciones.empty:
 else:
     st.markdown("""<style>.st-emotion-cache-183lzff{display:none;}</style><h1><i class="bi bi-graph-up-arrow"></i> FAM | Análisis de Operaciones</h1>""", unsafe_allow_html=True)
     st.title(" ")
-    analisis_general.mostrar_kpis_calidad(supabase)
-    df_filtrado = filtros.mostrar_filtros(df_operaciones)
+    analisis_general.mostrar_kpis_calidad(repo)
+    seleccion = filtros.mostrar_filtros(df_agregado_total)
+    if AGGREGATION_PUSHDOWN:
+        df_agregado = cargar_agregado_remoto(repo, seleccion)
+    else:
+        df_agregado = filtrar_agregado(df_agregado_total, seleccion)
+
+    # Las filas completas se cargan y filtran solo cuando una pestaña las pide
+    _filas = {}
+    def obtener_operaciones():
+        if 'todas' not in _filas:
+            _filas['todas'] = cargar_datos_desde_bd(repo)
+            programar_pronosticos(_filas['todas'], version_datos())
+        return _filas['todas']
+    def obtener_filtrado():
+        if 'filtradas' not in _filas:
+            _filas['filtradas'] = filtros.aplicar_filtros(obtener_operaciones(), seleccion, version_datos())
+        return _filas['filtradas']
     
-    if not df_filtrado.empty:
-        num_meses = len(df_filtrado['fecha_file'].dt.to_period('M').unique())
-        num_meses = max(1, num_meses)
+    if not df_agregado.empty:
+        num_meses = max(1, df_agregado['año_mes'].nunique())
     else:
         st.warning("No hay datos que coincidan con los filtros seleccionados.")
         num_meses = 1
 
+    with st.expander("Exportar reportes y detalle de operaciones filtradas"):
+        mostrar_descarga_reporte(repo, df_agregado_total, df_agregado, seleccion, num_meses, obtener_filtrado, firma=(version_datos(), repr(seleccion)))
+        # Las filas solo se cargan y filtran al pulsar el botón de preparar
+        boton_descarga("Descargar Detalle Filtrado", obtener_filtrado, "detalle_operaciones", key="detalle_filtrado", firma=(version_datos(), repr(seleccion)))
+
     # <-- MÉTRICAS: Paso 5 - Pestañas dinámicas y seguimiento de visitas
+    # st.tabs ejecuta el cuerpo de todas las pestañas en cada rerun; con la navegación por
+    # radio solo corre la vista elegida (y solo ella carga filas o entrena modelos)
+    vistas = {
+        "Análisis General": lambda: analisis_general.mostrar_analisis_general(df_agregado),
+        "Asignación": lambda: asignacion.mostrar_asignacion(df_agregado),
+        "Capacidad": lambda: soporte.mostrar_soporte(df_agregado),
+        "Clasificación": lambda: clasificacion.mostrar_clasificacion(df_agregado, num_meses),
+        "Resumen": lambda: resumen.mostrar_resumen(df_agregado),
+        "Tiempos": lambda: analisis_tiempos.mostrar_analisis_tiempos(obtener_filtrado()),
+        "Pronósticos": lambda: pronosticos.mostrar_pronosticos(obtener_operaciones(), version_datos()),
+    }
     # El administrador verá una pestaña extra para las métricas
     if st.session_state.get("username") == "estrategia.dev":
-        tab_names = ["Análisis General", "Asignación", "Capacidad", "Clasificación", "Resumen", "Tiempos", "Pronósticos", "Métricas", "Ayuda"]
-        tabs = st.tabs(tab_names)
-        inyectar_iconos_en_tabs() # Puedes ajustar los iconos si es necesario
-
-        with tabs[0]: 
-            metrics.track_page_visit("Análisis General")
-            analisis_general.mostrar_analisis_general(df_filtrado)
-        with tabs[1]: 
-            metrics.track_page_visit("Asignación")
-            asignacion.mostrar_asignacion(df_filtrado)
-        with tabs[2]: 
-            metrics.track_page_visit("Capacidad")
-            soporte.mostrar_soporte(df_filtrado)
-        with tabs[3]: 
-            metrics.track_page_visit("Clasificación")
-            clasificacion.mostrar_clasificacion(df_filtrado, num_meses)
-        with tabs[4]: 
-            metrics.track_page_visit("Resumen")
-            resumen.mostrar_resumen(df_filtrado)
-        with tabs[5]: 
-            metrics.track_page_visit("Tiempos")
-            analisis_tiempos.mostrar_analisis_tiempos(df_filtrado)
-        with tabs[6]: 
-            metrics.track_page_visit("Pronósticos")
-            pronosticos.mostrar_pronosticos(df_operaciones)
-        with tabs[7]: 
-            metrics.track_page_visit("Métricas")
-            admin_metrics.mostrar_metricas_admin(metrics)
-        with tabs[8]: 
-            metrics.track_page_visit("Ayuda")
-            glosario.mostrar_glosario_y_soporte()
-    else: # Vista para usuarios normales (sin la pestaña de métricas)
-        tab_names = ["Análisis General", "Asignación", "Capacidad", "Clasificación", "Resumen", "Tiempos", "Pronósticos", "Ayuda"]
-        tabs = st.tabs(tab_names)
-        inyectar_iconos_en_tabs()
-
-        with tabs[0]: 
-            metrics.track_page_visit("Análisis General")
-            analisis_general.mostrar_analisis_general(df_filtrado)
-        with tabs[1]: 
-            metrics.track_page_visit("Asignación")
-            asignacion.mostrar_asignacion(df_filtrado)
-        with tabs[2]: 
-            metrics.track_page_visit("Capacidad")
-            soporte.mostrar_soporte(df_filtrado)
-        with tabs[3]: 
-            metrics.track_page_visit("Clasificación")
-            clasificacion.mostrar_clasificacion(df_filtrado, num_meses)
-        with tabs[4]: 
-            metrics.track_page_visit("Resumen")
-            resumen.mostrar_resumen(df_filtrado)
-        with tabs[5]: 
-            metrics.track_page_visit("Tiempos")
-            analisis_tiempos.mostrar_analisis_tiempos(df_filtrado)
-        with tabs[6]: 
-            metrics.track_page_visit("Pronósticos")
-            pronosticos.mostrar_pronosticos(df_operaciones)
-        with tabs[7]: 
-            metrics.track_page_visit("Ayuda")
-            glosario.mostrar_glosario_y_soporte()
+        vistas["Métricas"] = lambda: admin_metrics.mostrar_metricas_admin(metrics)
+    vistas["Ayuda"] = glosario.mostrar_glosario_y_soporte
+
+    inyectar_iconos_en_tabs() # Va justo antes del radio: sus estilos solo alcanzan al radio siguiente
+    pestana = st.radio("Sección", list(vistas), horizontal=True, key="pestana_activa", label_visibility="collapsed")
+    # Una visita por cada vez que se entra a la pestaña, no por cada rerun dentro de ella
+    if st.session_state.get("pestana_registrada") != pestana:
+        metrics.track_page_visit(pestana)
+        st.session_state["pestana_registrada"] = pestana
+    vistas[pestana]()
 
     mostrar_footer(LOGO_URL)
\ No newline at end of file
@@ -0,0 +1,103 @@
+# dashboard/benchmarks/bench_ingesta.py
+"""
+Compara la limpieza + serialización del archivo subido: la implementación anterior
+(celda por celda) contra la vectorizada de core/processing.py.
+
+Uso (desde la carpeta dashboard):  python benchmarks/bench_ingesta.py [filas ...]
+Por defecto mide 10k, 100k y 1M filas.
+"""
+import os
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.esquema import COLUMNAS_TEXTO, COLUMNAS_FECHA, COLUMNAS_BD_FINAL
+from core.processing import _normalizar_bloque, serializar_registros
+
+ENCABEZADOS = {
+    'FILE': 'file', 'NIT Cliente': 'nit_cliente', 'Cliente': 'cliente', 'Fecha File': 'fecha_file',
+    'Tipo': 'tipo', 'Operativo': 'operativo', 'Comercial': 'comercial', 'FCH PRIMERA FACT PROV': None,
+    'Fecha Arribo': 'fecha_arribo', 'Fecha Zarpe': 'fecha_zarpe', 'Envío Facturar': 'envio_facturar',
+    'Fecha de Factura': 'fecha_de_factura', 'Fecha Envío Cierre': 'fecha_envio_cierre',
+    'Fecha Cierre': 'fecha_cierre', 'Estado': 'estado',
+}
+
+
+def generar_archivo(filas: int, semilla: int = 0):
+    """Un export sintético con la forma del Excel real: encabezados con espacios y acentos, huecos y fechas."""
+    rng = np.random.default_rng(semilla)
+    base = pd.Timestamp('2021-01-01')
+    fechas = lambda: pd.to_datetime(base + pd.to_timedelta(rng.integers(0, 1500, filas), unit='D')).where(rng.random(filas) > 0.1)
+    datos = {}
+    for encabezado in ENCABEZADOS:
+        if encabezado.startswith('F') and encabezado != 'FILE':
+            datos[encabezado] = fechas()
+        elif encabezado == 'FILE':
+            datos[encabezado] = [f"F-{i}" for i in range(filas)]
+        else:
+            opciones = np.array([' impo ', 'EXPO', 'nan', None, 'Ana', 'Luis'], dtype=object)
+            datos[encabezado] = opciones[rng.integers(0, len(opciones), filas)]
+    return pd.DataFrame(datos)
+
+
+# --- Implementación anterior, tal como estaba en core/processing.py ---
+
+def _normalize_column_name_anterior(name):
+    name = str(name)
+    name = pd.Series([name]).str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8').iloc[0]
+    name = re.sub(r'[^a-z0-9]', ' ', name.lower())
+    name = re.sub(r'\s+', '', name)
+    return name.strip('')
+
+
+def pipeline_anterior(df_crudo: pd.DataFrame):
+    df = df_crudo.copy()
+    df.columns = [_normalize_column_name_anterior(col) for col in df.columns]
+    # El nombre normalizado anterior no separaba palabras; para comparar el mismo trabajo
+    # se renombran aquí a los nombres de la BD
+    df.columns = [ENCABEZADOS.get(original) or nuevo for original, nuevo in zip(df_crudo.columns, df.columns)]
+    for col in COLUMNAS_TEXTO:
+        df[col] = df[col].astype(str).fillna('NO ESPECIFICADO').str.strip().str.upper()
+        df[col] = df[col].replace(['', 'NAN', 'NONE', 'NA'], 'NO ESPECIFICADO')
+    for col in COLUMNAS_FECHA:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    df = df[[col for col in COLUMNAS_BD_FINAL if col in df.columns]]
+    for col in COLUMNAS_FECHA:
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: x.isoformat() if pd.notna(x) else None)
+    df = df.replace({np.nan: None})
+    return df.to_dict(orient='records')
+
+
+def pipeline_vectorizado(df_crudo: pd.DataFrame):
+    return serializar_registros(_normalizar_bloque(df_crudo))
+
+
+def medir(funcion, df, repeticiones: int):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(df)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main(tamaños):
+    pd.set_option("mode.copy_on_write", True)
+    resultados = []
+    for filas in tamaños:
+        df = generar_archivo(filas)
+        repeticiones = 3 if filas <= 100_000 else 1
+        anterior = medir(pipeline_anterior, df, repeticiones)
+        vectorizado = medir(pipeline_vectorizado, df, repeticiones)
+        resultados.append({'filas': filas, 'anterior (s)': round(anterior, 3), 'vectorizado (s)': round(vectorizado, 3), 'aceleración': round(anterior / vectorizado, 2), 'filas/s vectorizado': round(filas / vectorizado)})
+        print(resultados[-1], flush=True)
+    print(pd.DataFrame(resultados).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,80 @@
+# dashboard/benchmarks/bench_pronosticos.py
+"""
+Backtest de los motores de pronóstico: latencia de ajuste y MAPE de cada motor NumPy
+(core/pronostico_rapido.py) contra Prophet, para TODOS y cada tipo de nuestra historia.
+
+Uso (desde la carpeta dashboard):
+    python benchmarks/bench_pronosticos.py [archivo.xlsx|csv|parquet] [--horizonte 30] [--cortes 3]
+Sin archivo, lee la base DuckDB local (LOCAL_DB_PATH); si no existe, usa una serie sintética.
+Si Prophet no está instalado, se omite de la comparación.
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.pronosticos import series_diarias, ajustar_prophet
+from core.pronostico_rapido import MOTORES_RAPIDOS, backtest
+
+
+def cargar_historia(ruta: str = None):
+    """Operaciones con fecha_file y tipo: del archivo indicado, de la base local o sintéticas."""
+    if ruta:
+        from core.ingesta import leer_en_bloques
+        from core.processing import _normalizar_bloque
+        with open(ruta, 'rb') as archivo:
+            return pd.concat([_normalizar_bloque(bloque) for bloque in leer_en_bloques(archivo)], ignore_index=True)
+    from core.repositorio import RUTA_BD_LOCAL, RepositorioLocal
+    ruta_bd = os.environ.get("LOCAL_DB_PATH", RUTA_BD_LOCAL)
+    if os.path.exists(ruta_bd):
+        df = RepositorioLocal(ruta_bd).leer_operaciones(columnas=['fecha_file', 'tipo'])
+        df['fecha_file'] = pd.to_datetime(df['fecha_file'], format='ISO8601')
+        return df.dropna(subset=['fecha_file'])
+    print(f"No hay archivo ni base local ({ruta_bd}): se usa una historia sintética de 3 años.")
+    rng = np.random.default_rng(0)
+    dias = pd.date_range('2022-01-01', periods=3 * 365, freq='D')
+    intensidad = 20 * (1 + 0.3 * np.sin(2 * np.pi * dias.dayofyear / 365.25)) * np.where(dias.dayofweek >= 5, 0.3, 1.0)
+    conteos = rng.poisson(intensidad)
+    fechas = np.repeat(dias.to_numpy(), conteos)
+    return pd.DataFrame({'fecha_file': fechas, 'tipo': rng.choice(list('AMFBSTC'), len(fechas))})
+
+
+def _prophet(serie, horizonte):
+    return ajustar_prophet(serie, horizonte)[1]
+
+
+def main(ruta, horizonte, cortes):
+    motores = dict(MOTORES_RAPIDOS)
+    try:
+        # La primera importación de Prophet (cmdstanpy, plotting) es parte de su costo en frío
+        inicio = time.perf_counter()
+        importlib.import_module('prophet')
+        print(f"Importar Prophet: {time.perf_counter() - inicio:.2f} s")
+        motores['Prophet'] = _prophet
+    except ImportError:
+        print("Prophet no está instalado: solo se comparan los motores NumPy.")
+    resultados = []
+    for tipo, serie in series_diarias(cargar_historia(ruta)).items():
+        for nombre, motor in motores.items():
+            resultado = backtest(serie, motor, horizonte, cortes)
+            resultados.append({'serie': tipo, 'motor': nombre, 'días': len(serie), **resultado})
+            print(resultados[-1], flush=True)
+    df = pd.DataFrame(resultados)
+    print(df.round({'latencia_s': 4, 'mape': 1}).to_string(index=False))
+    # El mejor motor por serie: el de menor MAPE
+    mejores = df.dropna(subset=['mape']).sort_values('mape').groupby('serie').head(1)
+    print("\nMotor recomendado por serie:")
+    print(mejores[['serie', 'motor', 'mape', 'latencia_s']].round({'latencia_s': 4, 'mape': 1}).to_string(index=False))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('archivo', nargs='?')
+    parser.add_argument('--horizonte', type=int, default=30)
+    parser.add_argument('--cortes', type=int, default=3)
+    args = parser.parse_args()
+    main(args.archivo, args.horizonte, args.cortes)
@@ -0,0 +1,84 @@
+# dashboard/core/agregados.py
+import pandas as pd
+import streamlit as st
+
+# Cubo de estadísticas por mes, operativo y tipo. Tiene la misma forma si se calcula en
+# Postgres (pushdown, sql/agregado_operaciones.sql), en DuckDB o en pandas. Todas las medidas
+# son sumables: bajo cualquier filtro se agregan de nuevo con resumir_cubo.
+DIMENSIONES_CUBO = ['año_mes', 'operativo', 'tipo']
+MEDIDAS_CUBO = [
+    'total_operaciones',
+    'operaciones_abiertas',
+    'duracion_suma', # Días de las operaciones con duración válida (duracion_real_dias)
+    'duracion_conteo', # Cuántas tienen duración válida
+    'operaciones_exitosas', # Cerradas dentro de su tiempo estándar
+    'esfuerzo_abiertas', # Puntos de esfuerzo (ESFUERZO_POR_TIPO) de las abiertas
+]
+COLUMNAS_AGREGADO = DIMENSIONES_CUBO + MEDIDAS_CUBO
+
+
+def agregar_operaciones_local(df: pd.DataFrame):
+    """Cubo de estadísticas por mes, operativo y tipo, con las columnas derivadas del dataset (core/derivadas.py)."""
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNAS_AGREGADO)
+    df_agregado = df.groupby(DIMENSIONES_CUBO, observed=True).agg(
+        total_operaciones=('es_abierta', 'size'),
+        operaciones_abiertas=('es_abierta', 'sum'),
+        duracion_suma=('duracion_real_dias', 'sum'),
+        duracion_conteo=('duracion_real_dias', 'count'),
+        operaciones_exitosas=('fue_exitoso', 'sum'),
+        esfuerzo=('esfuerzo', 'first'),
+    ).reset_index()
+    # El esfuerzo solo depende del tipo: es constante dentro de cada celda del cubo
+    df_agregado['esfuerzo_abiertas'] = df_agregado.pop('esfuerzo').astype(float) * df_agregado['operaciones_abiertas']
+    # Igual que el agregado remoto: 'año_mes' como texto y medidas sin nulos
+    df_agregado['año_mes'] = df_agregado['año_mes'].astype(str)
+    df_agregado = df_agregado.astype({'total_operaciones': 'int64', 'operaciones_abiertas': 'int64', 'duracion_suma': 'int64', 'duracion_conteo': 'int64', 'operaciones_exitosas': 'int64'})
+    return df_agregado[COLUMNAS_AGREGADO]
+
+
+def resumir_cubo(df_agregado: pd.DataFrame, dimensiones: list):
+    """
+    Suma las medidas del cubo por 'dimensiones' (p. ej. ['operativo', 'tipo']) y agrega los
+    promedios que se derivan de ellas: duracion_promedio y tasa_exito (sobre las operaciones
+    con duración válida; vacías si no hay ninguna).
+    """
+    df_resumen = df_agregado.groupby(dimensiones, observed=True)[MEDIDAS_CUBO].sum().reset_index()
+    con_duracion = df_resumen['duracion_conteo'].where(df_resumen['duracion_conteo'] > 0)
+    df_resumen['duracion_promedio'] = df_resumen['duracion_suma'] / con_duracion
+    df_resumen['tasa_exito'] = df_resumen['operaciones_exitosas'] / con_duracion
+    return df_resumen
+
+
+@st.cache_resource(max_entries=2)
+def obtener_agregado_local(_df: pd.DataFrame, version: int):
+    # Se calcula una vez por versión del dataset compartido y lo leen todas las sesiones
+    return agregar_operaciones_local(_df)
+
+
+def filtros_vacios(filtros: dict):
+    """True si alguna dimensión quedó sin ninguna opción seleccionada (None = sin filtro)."""
+    return any(valores is not None and len(valores) == 0 for valores in filtros.values())
+
+
+def filtrar_agregado(df_agregado: pd.DataFrame, filtros: dict):
+    if filtros_vacios(filtros) or df_agregado.empty:
+        return df_agregado.iloc[0:0]
+    mask = pd.Series(True, index=df_agregado.index)
+    if filtros.get('anios') is not None:
+        mask &= df_agregado['año_mes'].str[:4].astype(int).isin(filtros['anios'])
+    if filtros.get('meses') is not None:
+        mask &= df_agregado['año_mes'].isin(filtros['meses'])
+    if filtros.get('tipos') is not None:
+        mask &= df_agregado['tipo'].isin(filtros['tipos'])
+    if filtros.get('operativos') is not None:
+        mask &= df_agregado['operativo'].isin(filtros['operativos'])
+    return df_agregado[mask]
+
+
+@st.cache_data(ttl=300)
+def cargar_agregado_remoto(_repo, filtros: dict = None):
+    """Agregado calculado en la base (pushdown): solo viajan las filas ya agrupadas."""
+    if filtros is not None and filtros_vacios(filtros):
+        return pd.DataFrame(columns=COLUMNAS_AGREGADO)
+    return _repo.agregar_operaciones(filtros)
@@ -0,0 +1,81 @@
+# dashboard/core/asignacion_lote.py
+"""
+Asignación óptima en lote de operaciones entrantes a operativos. A diferencia del ranking
+por tipo de la guía de asignación, reparte todas las operaciones a la vez sin pasar la
+capacidad disponible de nadie (nadie recibe más cargas de las que admite).
+"""
+import numpy as np
+import pandas as pd
+
+SIN_CAPACIDAD = "Sin capacidad disponible"
+COLUMNAS_PLAN = ['Operación', 'Tipo', 'Operativo', 'Carga Nº', 'Índice Estratégico', 'Velocidad Promedio (días)', 'Eficacia Histórica (%)']
+
+
+def _cupos(df_guia_tipo: pd.DataFrame, maximo: int):
+    """
+    Un cupo por cada carga adicional que admite cada operativo (como mucho 'maximo', las
+    operaciones de ese tipo) con su puntaje: el índice estratégico recalculado con la
+    capacidad que le queda al operativo antes de recibir esa carga. Así la segunda carga de
+    un operativo vale menos que la primera y el plan reparte en vez de amontonar.
+    """
+    capacidad = df_guia_tipo['cargas_posibles_adicionales'].to_numpy(dtype=np.int64)
+    por_operativo = np.minimum(capacidad, maximo)
+    fila = np.repeat(np.arange(len(df_guia_tipo)), por_operativo)
+    orden = np.arange(len(fila)) - np.repeat(np.cumsum(por_operativo) - por_operativo, por_operativo)
+    velocidad = df_guia_tipo['velocidad_promedio_dias'].to_numpy(dtype=float)[fila]
+    eficacia = df_guia_tipo['eficacia_historica'].to_numpy(dtype=float)[fila]
+    # La misma fórmula que calcular_guia_asignacion, con la capacidad restante
+    puntaje = ((capacidad[fila] - orden) / (velocidad + 1)) * 100 * (1 + eficacia / 100)
+    return fila, orden, puntaje
+
+
+def resolver_asignacion(pendientes: pd.DataFrame, df_guia: pd.DataFrame):
+    """
+    Asigna cada operación pendiente ('tipo' y, opcional, 'operacion' con su identificador, en
+    orden de prioridad) a un operativo, maximizando la suma de índices estratégicos sin pasar
+    la capacidad disponible de cada operativo y tipo. 'df_guia' es la salida de
+    calcular_guia_asignacion. Las operaciones sin cupo quedan marcadas SIN_CAPACIDAD.
+    """
+    if pendientes.empty:
+        return pd.DataFrame(columns=COLUMNAS_PLAN)
+    pendientes = pendientes.reset_index(drop=True)
+    ids = pendientes['operacion'].astype(str) if 'operacion' in pendientes else pendientes['tipo'].astype(str) + '-' + (pendientes.groupby('tipo').cumcount() + 1).astype(str)
+    guia = df_guia.astype({'operativo': str, 'tipo': str})
+    plan = pd.DataFrame({
+        'Operación': ids,
+        'Tipo': pendientes['tipo'].astype(str),
+        'Operativo': SIN_CAPACIDAD,
+        'Carga Nº': pd.array([pd.NA] * len(pendientes), dtype='Int64'),
+        'Índice Estratégico': np.nan,
+        'Velocidad Promedio (días)': np.nan,
+        'Eficacia Histórica (%)': np.nan,
+    })
+
+    # La capacidad es por operativo y tipo: el problema se separa en uno por tipo
+    for tipo, posiciones in plan.groupby('Tipo').indices.items():
+        df_guia_tipo = guia[(guia['tipo'] == tipo) & (guia['cargas_posibles_adicionales'] > 0)].reset_index(drop=True)
+        if df_guia_tipo.empty: continue
+        fila, orden, puntaje = _cupos(df_guia_tipo, len(posiciones))
+        # Los cupos no compiten entre tipos y las operaciones de un tipo son intercambiables:
+        # el óptimo son los mejores cupos, y las primeras de la lista (las más prioritarias)
+        # se llevan los de mayor puntaje. Como el puntaje baja con cada carga, nunca se elige
+        # la segunda carga de un operativo sin la primera
+        cupos_elegidos = np.argsort(-puntaje, kind='stable')[:len(posiciones)]
+        asignadas = posiciones[:len(cupos_elegidos)]
+        operativos = df_guia_tipo.iloc[fila[cupos_elegidos]]
+        plan.loc[asignadas, 'Operativo'] = operativos['operativo'].to_numpy()
+        plan.loc[asignadas, 'Carga Nº'] = orden[cupos_elegidos] + 1
+        plan.loc[asignadas, 'Índice Estratégico'] = puntaje[cupos_elegidos].round(2)
+        plan.loc[asignadas, 'Velocidad Promedio (días)'] = operativos['velocidad_promedio_dias'].to_numpy(dtype=float).round(1)
+        plan.loc[asignadas, 'Eficacia Histórica (%)'] = operativos['eficacia_historica'].to_numpy(dtype=float)
+    return plan[COLUMNAS_PLAN]
+
+
+def resumir_plan(plan: pd.DataFrame):
+    """Cuántas operaciones de cada tipo recibe cada operativo en el plan."""
+    asignadas = plan[plan['Operativo'] != SIN_CAPACIDAD]
+    if asignadas.empty:
+        return pd.DataFrame()
+    resumen = asignadas.pivot_table(index='Operativo', columns='Tipo', values='Operación', aggfunc='count', fill_value=0)
+    resumen['Total'] = resumen.sum(axis=1)
+    return resumen.sort_values('Total', ascending=False)
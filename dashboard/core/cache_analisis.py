@@ -0,0 +1,54 @@
+# dashboard/core/cache_analisis.py
+import hashlib
+import threading
+from collections import OrderedDict
+import streamlit as st
+
+MAX_ANALISIS_EN_CACHE = 5
+MAX_MB_CACHE_ANALISIS = 500
+
+
+def hash_contenido(contenido: bytes) -> str:
+    """Huella del archivo subido: mismos bytes, mismo análisis."""
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def _mb_analisis(analisis: dict):
+    return sum(v.memory_usage(deep=True).sum() for v in analisis.values() if hasattr(v, 'memory_usage')) / 1024**2
+
+
+class CacheAnalisis:
+    """
+    Resultados de análisis indexados por el hash del archivo. Se desalojan los menos usados
+    recientemente cuando se supera el número de entradas o el tamaño total en MB.
+    """
+    def __init__(self, max_entradas: int = MAX_ANALISIS_EN_CACHE, max_mb: float = MAX_MB_CACHE_ANALISIS):
+        self.max_entradas = max_entradas
+        self.max_mb = max_mb
+        self.entradas = OrderedDict() # hash -> (analisis, mb)
+        self.lock = threading.Lock()
+
+    def obtener(self, hash_archivo: str):
+        with self.lock:
+            if hash_archivo not in self.entradas: return None
+            self.entradas.move_to_end(hash_archivo)
+            return self.entradas[hash_archivo][0]
+
+    def guardar(self, hash_archivo: str, analisis: dict):
+        mb = _mb_analisis(analisis)
+        with self.lock:
+            self.entradas[hash_archivo] = (analisis, mb)
+            self.entradas.move_to_end(hash_archivo)
+            # Siempre se conserva al menos la entrada recién guardada
+            while len(self.entradas) > 1 and (len(self.entradas) > self.max_entradas or sum(m for _, m in self.entradas.values()) > self.max_mb):
+                self.entradas.popitem(last=False)
+
+    def reiniciar(self):
+        with self.lock:
+            self.entradas = OrderedDict()
+
+
+@st.cache_resource
+def obtener_cache_analisis():
+    # Compartido por todas las sesiones del proceso
+    return CacheAnalisis()
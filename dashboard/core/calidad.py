@@ -0,0 +1,71 @@
+# dashboard/core/calidad.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+from core.esquema import ESQUEMA_OPERACIONES, ReporteEsquema
+
+VALOR_VACIO = 'NO ESPECIFICADO'
+PROBLEMA_FECHA_ILEGIBLE = 'Fecha con formato no reconocido'
+# (anterior, posterior): la fecha posterior no puede ser menor que la anterior
+PARES_FECHAS = [('fecha_file', 'fecha_cierre')]
+
+
+def _perfil_columna(serie: pd.Series, catalogo=None):
+    """
+    Vacíos, valores distintos y fuera de catálogo de una columna, con un único recorrido:
+    se trabaja sobre los códigos (los de la categórica o los de factorize) y sus conteos.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, unicos = serie.cat.codes.to_numpy(), pd.Index(serie.cat.categories)
+    else:
+        codigos, unicos = pd.factorize(serie)
+        unicos = pd.Index(unicos)
+    conteos = np.bincount(codigos + 1, minlength=len(unicos) + 1) # La posición 0 son los nulos (código -1)
+    por_valor = conteos[1:]
+    es_vacio = (unicos == VALOR_VACIO) if unicos.dtype == object else np.zeros(len(unicos), dtype=bool)
+    vacios = int(conteos[0] + por_valor[es_vacio].sum())
+    fuera = int(por_valor[~es_vacio & ~unicos.isin(catalogo)].sum()) if catalogo is not None else 0
+    distintos = int(((por_valor > 0) & ~es_vacio).sum())
+    return vacios, distintos, fuera
+
+
+def perfilar(df: pd.DataFrame, reporte: ReporteEsquema = None, ilegibles: dict = None):
+    """
+    Perfil de calidad de todas las columnas del esquema presentes en 'df': vacíos (nulos o
+    'NO ESPECIFICADO'), fechas ilegibles, fechas fuera de orden, valores fuera de catálogo
+    (p. ej. 'tipo' que no está en PROMEDIO_IDEAL) y cardinalidad. Sirve igual para un
+    archivo subido que para la tabla completa. Las fechas ilegibles salen de 'ilegibles'
+    ({columna: filas}, contadas sobre las mismas filas de 'df') o, si no se pasa, del
+    reporte de esquema de la lectura. El porcentaje se guarda como texto ('12.5%'), el
+    formato de siempre de calidad_json en cargas_log.
+    """
+    total = len(df)
+    if ilegibles is None:
+        ilegibles = {}
+        if reporte is not None:
+            ilegibles = {columna: filas for (columna, problema), (filas, _) in reporte.problemas.items() if problema == PROBLEMA_FECHA_ILEGIBLE}
+    desordenadas = {}
+    for anterior, posterior in PARES_FECHAS:
+        if anterior in df.columns and posterior in df.columns:
+            desordenadas[posterior] = int((df[posterior] < df[anterior]).sum())
+
+    filas = []
+    for columna in ESQUEMA_OPERACIONES:
+        if columna.nombre not in df.columns: continue
+        vacios, distintos, fuera = _perfil_columna(df[columna.nombre], columna.categorias)
+        filas.append({
+            "Campo": columna.nombre.replace('_', ' ').title(),
+            "Registros Faltantes": vacios,
+            "Porcentaje (%)": f"{vacios / total * 100 if total else 0.0:.1f}%",
+            "Fechas Ilegibles": ilegibles.get(columna.nombre, 0),
+            "Fechas Fuera de Orden": desordenadas.get(columna.nombre, 0),
+            "Fuera de Catálogo": fuera,
+            "Valores Distintos": distintos,
+        })
+    return pd.DataFrame(filas)
+
+
+@st.cache_resource(max_entries=2)
+def obtener_perfil_dataset(_df: pd.DataFrame, version: int, _reporte: ReporteEsquema = None):
+    # Una vez por versión del dataset compartido, igual que el agregado local
+    return perfilar(_df, _reporte)
@@ -1,23 +1,196 @@
 # dashboard/core/database.py
+import threading
+import time
 import pandas as pd
 import streamlit as st
-from supabase import Client
-
-# Tu función 'cargar_datos_desde_bd' original
-@st.cache_data(ttl=300)
-def cargar_datos_desde_bd(_supabase: Client): # Añadido _ para evitar error de cache
-    all_data = []
-    page = 0
-    while True:
-        response = _supabase.table('operaciones').select("*").range(page * 1000, (page + 1) * 1000 - 1).execute()
-        data = response.data
-        if not data: break
-        all_data.extend(data)
-        page += 1
-    df = pd.DataFrame(all_data)
-    if df.empty: return df
-    columnas_fecha = ['fecha_file', 'fecha_cierre', 'fecha_primera_factura', 'fecha_arribo', 'fecha_zarpe', 'fecha_de_factura', 'fecha_envio_cierre']
-    for col in columnas_fecha:
-        if col in df.columns: df[col] = pd.to_datetime(df[col], errors='coerce')
+from core.repositorio import RepositorioDatos
+from core.derivadas import materializar_derivadas
+# Columnas, fechas y dimensiones 'category' salen del esquema compartido con la carga de archivos
+from core.esquema import COLUMNAS_FECHA, COLUMNAS_CATEGORICAS, COLUMNAS_OPERACIONES, FORMATOS_FECHA_BD, ReporteEsquema, parsear_fecha, validar_bloque
+
+class _DatasetOperaciones:
+    """
+    Tabla de operaciones compartida por todas las sesiones del proceso. Cada sincronización
+    reemplaza el DataFrame completo (nunca se modifica en su lugar) y sube la versión, así
+    que las páginas pueden leerlo sin copiarlo.
+    """
+    def __init__(self):
+        self.df = pd.DataFrame()
+        self.version = 0
+        self.max_id = None # Marca de agua: el 'id' más alto visto
+        self.columnas = None
+        self.ultima_sincronizacion = 0.0
+        self.reporte_esquema = ReporteEsquema() # Valores de la tabla que no cumplen el esquema
+        self.lock = threading.Lock()
+
+    def publicar(self, df: pd.DataFrame):
+        # Las columnas derivadas se recalculan en cada versión, incluidas las filas recién unidas
+        self.df = materializar_derivadas(df)
+        self.version += 1
+
+    def reemplazar(self, df: pd.DataFrame, max_id, columnas, reporte_esquema: ReporteEsquema):
+        """Cambia todo el estado por el de una recarga completa, con una sola versión nueva."""
+        self.max_id = max_id
+        self.columnas = columnas
+        self.reporte_esquema = reporte_esquema
+        self.publicar(df)
+
+
+@st.cache_resource
+def _obtener_dataset():
+    # Un único objeto por proceso: st.cache_resource no serializa ni copia lo que devuelve
+    return _DatasetOperaciones()
+
+
+def _descargar_operaciones(repo: RepositorioDatos, desde_id=None):
+    return repo.leer_operaciones(columnas=COLUMNAS_OPERACIONES, desde_id=desde_id)
+
+
+def _parsear_fechas(df: pd.DataFrame, reporte: ReporteEsquema = None):
+    # La base siempre devuelve ISO 8601: no hace falta inferir el formato
+    for col in COLUMNAS_FECHA:
+        if col in df.columns: df[col] = parsear_fecha(df[col], FORMATOS_FECHA_BD, col, reporte)
+    if reporte is not None:
+        validar_bloque(df, reporte)
+    return df
+
+
+def compactar_operaciones(df: pd.DataFrame):
+    """
+    Convierte las dimensiones a 'category' y el 'id' al entero nullable más pequeño que
+    lo contiene. Las fechas ya llegan como datetime64 desde _parsear_fechas.
+    """
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns: df[col] = df[col].astype('category')
+    if 'id' in df.columns:
+        df['id'] = df['id'].astype('Int32' if df['id'].max() < 2**31 else 'Int64')
+    return df
+
+
+def reporte_memoria(df_compacto: pd.DataFrame):
+    """Compara, por columna, la memoria del DataFrame compacto contra su versión con textos 'object'."""
+    if df_compacto.empty: return pd.DataFrame()
+    tipos_originales = {col: object for col in COLUMNAS_CATEGORICAS if col in df_compacto.columns}
+    if 'id' in df_compacto.columns: tipos_originales['id'] = 'int64'
+    df_original = df_compacto.astype(tipos_originales)
+    reporte = pd.DataFrame({
+        'Columna': df_compacto.columns,
+        'Tipo original': df_original.dtypes.astype(str).values,
+        'Tipo compacto': df_compacto.dtypes.astype(str).values,
+        'MB original': df_original.memory_usage(deep=True, index=False).values / 1024**2,
+        'MB compacto': df_compacto.memory_usage(deep=True, index=False).values / 1024**2,
+    })
+    total = pd.DataFrame([{'Columna': 'TOTAL', 'Tipo original': '', 'Tipo compacto': '', 'MB original': reporte['MB original'].sum(), 'MB compacto': reporte['MB compacto'].sum()}])
+    reporte = pd.concat([reporte, total], ignore_index=True)
+    reporte['Ahorro (%)'] = ((1 - reporte['MB compacto'] / reporte['MB original']) * 100).round(1)
+    return reporte.round({'MB original': 2, 'MB compacto': 2})
+
+
+def _recarga_completa(repo: RepositorioDatos, dataset: _DatasetOperaciones, columnas_tabla=None):
+    # El DataFrame nuevo se arma completo antes de publicarlo: mientras tanto las otras
+    # sesiones siguen leyendo la versión anterior, nunca una vacía intermedia
+    df = _descargar_operaciones(repo)
+    reporte = ReporteEsquema()
+    if df.empty:
+        dataset.reemplazar(pd.DataFrame(), None, None, reporte)
+        return
+    columnas = columnas_tabla if columnas_tabla is not None else repo.columnas_operaciones()
+    max_id = int(df['id'].max())
+    df = _parsear_fechas(df, reporte)
     df.dropna(subset=['fecha_file'], inplace=True)
-    return df
\ No newline at end of file
+    dataset.reemplazar(compactar_operaciones(df.reset_index(drop=True)), max_id, columnas, reporte)
+
+
+def _carga_incremental(repo: RepositorioDatos, dataset: _DatasetOperaciones):
+    df_delta = _descargar_operaciones(repo, desde_id=dataset.max_id)
+    if df_delta.empty: return
+    # La marca de agua avanza aunque la fila luego se descarte por no tener fecha_file
+    dataset.max_id = max(dataset.max_id, int(df_delta['id'].max()))
+    df_delta = _parsear_fechas(df_delta, dataset.reporte_esquema)
+    df_delta.dropna(subset=['fecha_file'], inplace=True)
+    if df_delta.empty: return
+    df = pd.concat([dataset.df, df_delta], ignore_index=True)
+    # Si una fila se reenvió con el mismo id, nos quedamos con la versión más reciente
+    df = df.drop_duplicates(subset=['id'], keep='last').reset_index(drop=True)
+    # concat de categóricas con categorías distintas devuelve 'object': volvemos a compactar
+    dataset.publicar(compactar_operaciones(df))
+
+
+def sincronizar_operaciones(repo: RepositorioDatos, forzar_recarga: bool = False, ttl=None):
+    """
+    Trae solo las operaciones con 'id' mayor a la marca de agua y las une al DataFrame
+    compartido. La recarga completa se hace a pedido, en el primer uso o si cambia el esquema.
+
+    La marca de agua solo ve filas nuevas: las operaciones existentes que una carga actualiza
+    (mismo 'id') no llegan por aquí. El proceso que hizo la carga las relee con
+    refrescar_operaciones; otros procesos (otra réplica del dashboard) las ven recién en su
+    próxima recarga completa (botón de recarga o cambio de esquema).
+    """
+    dataset = _obtener_dataset()
+    with dataset.lock:
+        # Otra sesión pudo sincronizar mientras esperábamos el lock
+        if not forzar_recarga and ttl is not None and time.time() - dataset.ultima_sincronizacion < ttl:
+            return dataset.df
+        if forzar_recarga or dataset.max_id is None:
+            _recarga_completa(repo, dataset)
+        else:
+            columnas_tabla = repo.columnas_operaciones()
+            # Si la tabla quedó vacía o cambió de columnas, el estado guardado ya no sirve
+            if columnas_tabla is None or columnas_tabla != dataset.columnas:
+                _recarga_completa(repo, dataset, columnas_tabla)
+            else:
+                _carga_incremental(repo, dataset)
+        dataset.ultima_sincronizacion = time.time()
+        return dataset.df
+
+
+# Tu función 'cargar_datos_desde_bd' original, ahora compartida entre sesiones y con sincronización incremental
+def cargar_datos_desde_bd(repo: RepositorioDatos, ttl: int = 300):
+    """
+    Devuelve el DataFrame compartido (sin copiarlo). Si pasaron más de 'ttl' segundos desde
+    la última sincronización, primero trae las filas nuevas. Tratarlo como solo lectura.
+    """
+    dataset = _obtener_dataset()
+    if time.time() - dataset.ultima_sincronizacion >= ttl:
+        return sincronizar_operaciones(repo, ttl=ttl)
+    return dataset.df
+
+
+def refrescar_operaciones(repo: RepositorioDatos, files):
+    """
+    Vuelve a leer solo las operaciones indicadas (p. ej. recién actualizadas) y las reemplaza
+    en el DataFrame compartido. Solo afecta a este proceso: ver sincronizar_operaciones.
+    """
+    dataset = _obtener_dataset()
+    with dataset.lock:
+        if dataset.df.empty: return
+        df_frescas = _parsear_fechas(repo.leer_operaciones_por_files(files, COLUMNAS_OPERACIONES))
+        if df_frescas.empty: return
+        df = pd.concat([dataset.df, df_frescas], ignore_index=True)
+        df = df.drop_duplicates(subset=['id'], keep='last').reset_index(drop=True)
+        dataset.publicar(compactar_operaciones(df))
+
+
+def problemas_esquema():
+    """Valores del dataset que no cumplen el esquema (fechas ilegibles, categorías desconocidas...)."""
+    return _obtener_dataset().reporte_esquema.como_dataframe()
+
+
+def reporte_esquema_dataset():
+    """El ReporteEsquema acumulado del dataset (lo usa el perfil de calidad para las fechas ilegibles)."""
+    return _obtener_dataset().reporte_esquema
+
+
+def version_datos():
+    """Versión del DataFrame compartido; cambia cada vez que se publica uno nuevo."""
+    return _obtener_dataset().version
+
+
+def invalidar_datos():
+    """Hace que la próxima llamada a cargar_datos_desde_bd traiga las filas nuevas."""
+    _obtener_dataset().ultima_sincronizacion = 0.0
+
+
+def recargar_datos_completos(repo: RepositorioDatos):
+    """Descarta el estado incremental y vuelve a descargar toda la tabla."""
+    sincronizar_operaciones(repo, forzar_recarga=True)
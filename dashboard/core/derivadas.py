@@ -0,0 +1,46 @@
+# dashboard/core/derivadas.py
+import numpy as np
+import pandas as pd
+from config import ESFUERZO_POR_TIPO, TIEMPOS_ESTANDAR_POR_TIPO
+
+# Columnas calculadas una vez por versión del dataset; las páginas las leen en vez de recalcularlas
+COLUMNAS_DERIVADAS = ['año_mes', 'anio', 'es_abierta', 'duracion_real_dias', 'esfuerzo', 'tiempo_estandar', 'fue_exitoso']
+
+
+def _mapear_categorias(serie: pd.Series, funcion, dtype):
+    """Aplica 'funcion' a cada valor distinto (las categorías) y reparte el resultado por código."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, unicos = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, unicos = pd.factorize(serie)
+    # Se agrega un None al final: los nulos (código -1) toman el valor que le corresponde a un vacío
+    valores = pd.Index(list(unicos) + [None], dtype=object)
+    return np.asarray(funcion(valores), dtype=dtype)[codigos]
+
+
+def materializar_derivadas(df: pd.DataFrame):
+    """
+    Agrega al DataFrame de operaciones sus columnas derivadas:
+    - año_mes ('2024-03', category) y anio, de fecha_file.
+    - es_abierta: estado distinto de 'CERRADO'.
+    - duracion_real_dias: días entre fecha_file y fecha_cierre; vacío si falta alguna fecha o da negativo.
+    - esfuerzo (ESFUERZO_POR_TIPO, 1 si el tipo no está) y tiempo_estandar (TIEMPOS_ESTANDAR_POR_TIPO).
+    - fue_exitoso: se cerró dentro de su tiempo estándar.
+    """
+    if df.empty: return df
+    fechas = df['fecha_file']
+    anios, meses = fechas.dt.year.to_numpy(), fechas.dt.month.to_numpy()
+    # Se formatea cada mes distinto, no cada fila
+    codigos_mes, meses_unicos = pd.factorize(anios * 100 + meses, sort=True)
+    df['año_mes'] = pd.Categorical.from_codes(codigos_mes, categories=[f"{int(m) // 100:04d}-{int(m) % 100:02d}" for m in meses_unicos])
+    df['anio'] = pd.array(anios, dtype='Int16')
+
+    df['es_abierta'] = _mapear_categorias(df['estado'], lambda estados: estados.astype(str).str.upper() != 'CERRADO', bool)
+
+    dias = (df['fecha_cierre'] - fechas).dt.days
+    df['duracion_real_dias'] = dias.where(dias >= 0).astype('Int32')
+
+    df['esfuerzo'] = _mapear_categorias(df['tipo'], lambda tipos: tipos.map(ESFUERZO_POR_TIPO).astype(float).fillna(1), 'float32')
+    df['tiempo_estandar'] = _mapear_categorias(df['tipo'], lambda tipos: tipos.map(TIEMPOS_ESTANDAR_POR_TIPO).astype(float), 'float32')
+    df['fue_exitoso'] = (df['duracion_real_dias'].to_numpy(dtype='float64', na_value=np.nan) <= df['tiempo_estandar'].to_numpy())
+    return df
@@ -0,0 +1,120 @@
+# dashboard/core/esquema.py
+import pandas as pd
+from config import PROMEDIO_IDEAL
+
+# Formatos aceptados, en orden: lo que devuelve la base (ISO 8601) y lo que suele traer un
+# CSV exportado en Colombia. El Excel leído con openpyxl ya entrega fechas, no texto.
+FORMATOS_FECHA_BD = ['ISO8601']
+FORMATOS_FECHA_ARCHIVO = ['ISO8601', '%d/%m/%Y', '%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S', '%d-%m-%Y']
+VALORES_VACIOS = ['', 'NAN', 'NONE', 'NA', 'NAT', 'NULL']
+MAX_EJEMPLOS = 5
+
+
+class Columna:
+    """Definición de una columna de 'operaciones': tipo en memoria, formatos de fecha, categorías permitidas y si admite vacíos."""
+    def __init__(self, nombre: str, dtype: str, nulo: bool = True, categorias=None, formatos=None):
+        self.nombre = nombre
+        self.dtype = dtype # 'object', 'category', 'datetime64[ns]' o 'Int64'
+        self.nulo = nulo
+        self.categorias = categorias # None = cualquier valor
+        self.formatos = formatos
+
+    @property
+    def es_fecha(self):
+        return self.dtype == 'datetime64[ns]'
+
+    @property
+    def es_texto(self):
+        return self.dtype in ('object', 'category')
+
+
+# Orden de las columnas tal como se insertan desde el archivo
+ESQUEMA_OPERACIONES = [
+    Columna('file', 'object', nulo=False),
+    Columna('nit_cliente', 'object'),
+    Columna('cliente', 'category'),
+    Columna('fecha_file', 'datetime64[ns]', nulo=False, formatos=FORMATOS_FECHA_ARCHIVO),
+    Columna('tipo', 'category', categorias=list(PROMEDIO_IDEAL)),
+    Columna('operativo', 'category'),
+    Columna('comercial', 'category'),
+    Columna('fecha_primera_factura', 'datetime64[ns]', formatos=FORMATOS_FECHA_ARCHIVO),
+    Columna('fecha_arribo', 'datetime64[ns]', formatos=FORMATOS_FECHA_ARCHIVO),
+    Columna('fecha_zarpe', 'datetime64[ns]', formatos=FORMATOS_FECHA_ARCHIVO),
+    Columna('envio_facturar', 'category'),
+    Columna('fecha_de_factura', 'datetime64[ns]', formatos=FORMATOS_FECHA_ARCHIVO),
+    Columna('fecha_envio_cierre', 'datetime64[ns]', formatos=FORMATOS_FECHA_ARCHIVO),
+    Columna('fecha_cierre', 'datetime64[ns]', formatos=FORMATOS_FECHA_ARCHIVO),
+    Columna('estado', 'category'),
+]
+COLUMNAS_ESQUEMA = {columna.nombre: columna for columna in ESQUEMA_OPERACIONES}
+
+COLUMNAS_BD_FINAL = [c.nombre for c in ESQUEMA_OPERACIONES]
+COLUMNAS_FECHA = [c.nombre for c in ESQUEMA_OPERACIONES if c.es_fecha]
+COLUMNAS_TEXTO = [c.nombre for c in ESQUEMA_OPERACIONES if c.es_texto]
+COLUMNAS_CATEGORICAS = [c.nombre for c in ESQUEMA_OPERACIONES if c.dtype == 'category']
+# Lo que el dashboard lee de la tabla: el 'id' de la base más las columnas del esquema
+COLUMNAS_OPERACIONES = ['id'] + COLUMNAS_BD_FINAL
+
+
+class ReporteEsquema:
+    """Acumula, columna por columna, los valores que no cumplen el esquema (con algunos ejemplos)."""
+    def __init__(self):
+        self.problemas = {} # (columna, problema) -> [filas, ejemplos]
+
+    def registrar(self, columna: str, problema: str, valores: pd.Series, con_ejemplos: bool = True):
+        if valores.empty: return
+        filas, ejemplos = self.problemas.setdefault((columna, problema), [0, []])
+        self.problemas[(columna, problema)][0] = filas + len(valores)
+        faltan = MAX_EJEMPLOS - len(ejemplos)
+        if con_ejemplos and faltan > 0:
+            ejemplos.extend(str(v) for v in valores.drop_duplicates().head(faltan) if str(v) not in ejemplos)
+
+    def como_dataframe(self):
+        return pd.DataFrame(
+            [{'Columna': columna, 'Problema': problema, 'Filas': filas, 'Ejemplos': ', '.join(ejemplos)} for (columna, problema), (filas, ejemplos) in self.problemas.items()],
+            columns=['Columna', 'Problema', 'Filas', 'Ejemplos'],
+        )
+
+
+def fechas_vacias(serie: pd.Series):
+    """Las celdas de fecha sin valor: nulos y sus representaciones en texto ('', 'NaN', 'NULL'...)."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.isna()
+    return serie.isna() | serie.astype(str).str.strip().str.upper().isin(VALORES_VACIOS)
+
+
+def parsear_fecha(serie: pd.Series, formatos: list, columna: str = None, reporte: ReporteEsquema = None):
+    """
+    Convierte a datetime64 probando los formatos conocidos en orden, cada uno solo sobre lo
+    que aún no se pudo leer (nunca se infiere formato fila por fila). Los valores no vacíos
+    que no encajan en ningún formato quedan NaT y se registran en el reporte.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.tz_localize(None) if serie.dt.tz is not None else serie
+    resultado = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+    pendientes = serie[~fechas_vacias(serie)]
+    for formato in formatos:
+        if pendientes.empty: break
+        # utc=True evita que offsets mezclados dejen la columna como 'object'
+        leidas = pd.to_datetime(pendientes, format=formato, errors='coerce', utc=True).dt.tz_localize(None)
+        validas = leidas.notna()
+        resultado.loc[leidas.index[validas]] = leidas[validas]
+        pendientes = pendientes[~validas]
+    if reporte is not None and columna is not None:
+        reporte.registrar(columna, 'Fecha con formato no reconocido', pendientes)
+    return resultado
+
+
+def validar_bloque(df: pd.DataFrame, reporte: ReporteEsquema, vacio: str = 'NO ESPECIFICADO'):
+    """Registra categorías desconocidas y vacíos en columnas obligatorias. No modifica el DataFrame."""
+    for columna in ESQUEMA_OPERACIONES:
+        if columna.nombre not in df.columns: continue
+        serie = df[columna.nombre]
+        faltantes = serie.isna() | (serie == vacio) if columna.es_texto else serie.isna()
+        if not columna.nulo:
+            # Como ejemplo sirve el 'file' de la fila; si lo que falta es el propio 'file', solo se cuenta
+            reporte.registrar(columna.nombre, 'Vacío en columna obligatoria', df.loc[faltantes, 'file'], con_ejemplos=columna.nombre != 'file')
+        if columna.categorias is not None:
+            desconocidas = ~faltantes & ~serie.isin(columna.categorias)
+            reporte.registrar(columna.nombre, 'Categoría no permitida', serie[desconocidas])
+    return reporte
@@ -0,0 +1,121 @@
+# dashboard/core/exportacion.py
+import io
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+# formato -> (extensión, mime)
+FORMATOS_EXPORTACION = {
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+MAX_FILAS_EXCEL = 1_048_575 # Límite de filas de una hoja, sin contar el encabezado
+FILAS_MUESTRA_ANCHO = 1000
+ANCHO_MAXIMO = 60
+FORMATO_FECHA = 'yyyy-mm-dd hh:mm'
+_ORIGEN_EXCEL = np.datetime64('1899-12-30', 'ns')
+_NS_POR_DIA = 86_400 * 10**9
+
+
+def _anchos_columnas(df: pd.DataFrame, filas_muestra: int = FILAS_MUESTRA_ANCHO):
+    """Ancho de cada columna estimado con el encabezado y una muestra de filas (no con todas las celdas)."""
+    muestra = df.head(filas_muestra)
+    anchos = []
+    for columna in df.columns:
+        largo = len(str(columna))
+        if pd.api.types.is_datetime64_any_dtype(muestra[columna]):
+            largo = max(largo, len(FORMATO_FECHA))
+        elif not muestra.empty:
+            largo = max(largo, int(muestra[columna].astype(str).str.len().max()))
+        anchos.append(min(largo + 1, ANCHO_MAXIMO))
+    return anchos
+
+
+def _valores_columna(serie: pd.Series):
+    """
+    Valores de la columna listos para xlsxwriter, con None donde va una celda vacía, y el
+    método que los escribe. Las fechas pasan a número de serie de Excel en una sola operación.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        fechas = serie.dt.tz_localize(None) if serie.dt.tz is not None else serie
+        valores = fechas.to_numpy(dtype='datetime64[ns]')
+        seriales = (valores - _ORIGEN_EXCEL).astype('int64') / _NS_POR_DIA
+        return np.where(pd.isna(valores), None, seriales).tolist(), 'fecha'
+    if pd.api.types.is_bool_dtype(serie):
+        return serie.astype(object).where(serie.notna(), None).tolist(), 'booleano'
+    if pd.api.types.is_numeric_dtype(serie):
+        numeros = serie.astype('float64').to_numpy()
+        return np.where(np.isfinite(numeros), numeros, None).tolist(), 'numero'
+    valores = serie.astype(object)
+    return valores.where(valores.notna(), None).map(str, na_action='ignore').tolist(), 'texto'
+
+
+def _escribir_hoja(libro, nombre: str, df: pd.DataFrame, formato_fecha):
+    if len(df) > MAX_FILAS_EXCEL:
+        raise ValueError(f"Excel admite hasta {MAX_FILAS_EXCEL:,} filas por hoja; usa CSV o Parquet para {len(df):,} filas.")
+    hoja = libro.add_worksheet(nombre)
+    for idx, ancho in enumerate(_anchos_columnas(df)):
+        hoja.set_column(idx, idx, ancho)
+    hoja.write_row(0, 0, [str(columna) for columna in df.columns])
+
+    escritores = {
+        'fecha': lambda fila, col, valor: hoja.write_number(fila, col, valor, formato_fecha),
+        'numero': hoja.write_number,
+        'booleano': hoja.write_boolean,
+        'texto': hoja.write_string,
+    }
+    columnas = []
+    for idx, columna in enumerate(df.columns):
+        valores, tipo = _valores_columna(df.iloc[:, idx])
+        columnas.append((idx, valores, escritores[tipo]))
+    # En constant_memory las filas deben escribirse en orden: se recorre fila a fila
+    for fila in range(len(df)):
+        for col, valores, escribir in columnas:
+            valor = valores[fila]
+            if valor is not None:
+                escribir(fila + 1, col, valor)
+
+
+def exportar_libro(hojas: dict) -> bytes:
+    """
+    Escribe un libro con una hoja por DataFrame ({nombre: df}), fila por fila en modo
+    'constant_memory' de xlsxwriter: solo la fila en curso queda en memoria mientras se arma
+    cada hoja, en vez de todo el libro como con pandas.
+    """
+    salida = io.BytesIO()
+    libro = xlsxwriter.Workbook(salida, {'constant_memory': True})
+    formato_fecha = libro.add_format({'num_format': FORMATO_FECHA})
+    try:
+        for nombre, df in hojas.items():
+            _escribir_hoja(libro, nombre, df, formato_fecha)
+    finally:
+        libro.close()
+    return salida.getvalue()
+
+
+def exportar_excel(df: pd.DataFrame, hoja: str = 'Datos') -> bytes:
+    return exportar_libro({hoja: df})
+
+
+def exportar_csv(df: pd.DataFrame) -> bytes:
+    # utf-8-sig para que Excel abra bien las tildes al hacer doble clic en el CSV
+    return df.to_csv(index=False, date_format='%Y-%m-%d %H:%M:%S').encode('utf-8-sig')
+
+
+def exportar_parquet(df: pd.DataFrame) -> bytes:
+    salida = io.BytesIO()
+    df.to_parquet(salida, index=False, engine='pyarrow')
+    return salida.getvalue()
+
+
+_EXPORTADORES = {'Excel': exportar_excel, 'CSV': exportar_csv, 'Parquet': exportar_parquet}
+
+
+def exportar(df: pd.DataFrame, formato: str) -> bytes:
+    """Bytes del DataFrame en el formato pedido ('Excel', 'CSV' o 'Parquet')."""
+    return _EXPORTADORES[formato](df)
+
+
+def nombre_archivo(nombre_base: str, formato: str):
+    return f"{nombre_base}.{FORMATOS_EXPORTACION[formato][0]}"
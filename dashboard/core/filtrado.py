@@ -0,0 +1,89 @@
+# dashboard/core/filtrado.py
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+MAX_FILTROS_EN_CACHE = 16
+MAX_MB_CACHE_FILTROS = 300
+DIMENSIONES = ('anios', 'meses', 'tipos', 'operativos')
+
+
+def _codigos(serie: pd.Series):
+    """Código entero de cada fila y los valores que representan (los de la categórica, o factorize)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), pd.Index(serie.cat.categories)
+    codigos, valores = pd.factorize(serie)
+    return codigos, pd.Index(valores)
+
+
+def _clave(filtros: dict):
+    # Tupla canónica: el orden en que se marcaron las opciones no cambia el resultado
+    return tuple(None if filtros.get(d) is None else tuple(sorted(map(str, filtros[d]))) for d in DIMENSIONES)
+
+
+class IndiceFiltros:
+    """
+    Índice de las dimensiones filtrables del DataFrame compartido (año, mes, tipo, operativo),
+    construido una vez por versión: cada fila guarda un código entero por dimensión. Una
+    combinación de filtros se resuelve marcando los valores elegidos en una tabla pequeña
+    por dimensión y leyéndola con los códigos; sin strftime ni isin sobre toda la tabla.
+    Los resultados de las combinaciones usadas hace poco se guardan en un LRU.
+    """
+    def __init__(self, df: pd.DataFrame, max_entradas: int = MAX_FILTROS_EN_CACHE, max_mb: float = MAX_MB_CACHE_FILTROS):
+        self.df = df
+        self.dimensiones = {}
+        if not df.empty:
+            # 'anio' y 'año_mes' son columnas derivadas del dataset (core/derivadas.py)
+            self.dimensiones['anios'] = _codigos(df['anio'])
+            self.dimensiones['meses'] = _codigos(df['año_mes'])
+            self.dimensiones['tipos'] = _codigos(df['tipo'])
+            self.dimensiones['operativos'] = _codigos(df['operativo'])
+        self.max_entradas = max_entradas
+        self.max_mb = max_mb
+        self.entradas = OrderedDict() # clave -> (df filtrado, mb)
+        self.lock = threading.Lock()
+
+    def _valores_buscados(self, dimension: str, valores):
+        if dimension == 'anios':
+            return [int(v) for v in valores]
+        if dimension == 'meses':
+            return [str(v) for v in valores]
+        return list(valores)
+
+    def _mascara(self, filtros: dict):
+        mask = np.ones(len(self.df), dtype=bool)
+        for dimension in DIMENSIONES:
+            valores = filtros.get(dimension)
+            if valores is None: continue
+            codigos, unicos = self.dimensiones[dimension]
+            # Una posición por valor distinto, más una al final para los nulos (código -1)
+            elegidos = np.append(unicos.isin(self._valores_buscados(dimension, valores)), False)
+            mask &= elegidos[codigos]
+        return mask
+
+    def filtrar(self, filtros: dict):
+        """Filas del DataFrame que cumplen los filtros. Si ninguno descarta filas, devuelve el mismo objeto."""
+        if self.df.empty or any(filtros.get(d) is not None and len(filtros[d]) == 0 for d in DIMENSIONES):
+            return pd.DataFrame()
+        clave = _clave(filtros)
+        with self.lock:
+            if clave in self.entradas:
+                self.entradas.move_to_end(clave)
+                return self.entradas[clave][0]
+        mask = self._mascara(filtros)
+        resultado = self.df if mask.all() else self.df[mask]
+        # El DataFrame completo ya está en memoria: no cuenta para el límite
+        mb = 0.0 if resultado is self.df else resultado.memory_usage(index=True).sum() / 1024**2
+        with self.lock:
+            self.entradas[clave] = (resultado, mb)
+            while len(self.entradas) > 1 and (len(self.entradas) > self.max_entradas or sum(m for _, m in self.entradas.values()) > self.max_mb):
+                self.entradas.popitem(last=False)
+        return resultado
+
+
+@st.cache_resource(max_entries=2)
+def obtener_indice_filtros(_df: pd.DataFrame, version: int):
+    # Uno por versión del dataset compartido, igual que el agregado local
+    return IndiceFiltros(_df)
@@ -0,0 +1,43 @@
+# dashboard/core/indice_archivos.py
+import threading
+import streamlit as st
+from core.repositorio import RepositorioDatos
+
+
+class IndiceArchivos:
+    """
+    Caché local de los 'file' que sabemos que ya existen en la base. Solo guarda positivos:
+    lo que no está aquí se confirma contra la base y, si aparece, se agrega al índice.
+    """
+    def __init__(self):
+        self.conocidos = set()
+        self.lock = threading.Lock()
+
+    def existentes(self, repo: RepositorioDatos, files) -> set:
+        files = set(files)
+        with self.lock:
+            ya_conocidos = files & self.conocidos
+        # Solo consultamos a la base las llaves del archivo que aún no conocemos
+        encontrados = repo.buscar_files_existentes(files - ya_conocidos)
+        self.registrar(encontrados)
+        return ya_conocidos | encontrados
+
+    def conocidos_de(self, files) -> set:
+        """Los 'file' que el índice ya conoce, sin consultar la base."""
+        with self.lock:
+            return set(files) & self.conocidos
+
+    def registrar(self, files):
+        """Se llama después de cada inserción exitosa con los 'file' insertados."""
+        with self.lock:
+            self.conocidos.update(files)
+
+    def reiniciar(self):
+        with self.lock:
+            self.conocidos = set()
+
+
+@st.cache_resource
+def obtener_indice_archivos():
+    # Compartido por todas las sesiones del proceso
+    return IndiceArchivos()
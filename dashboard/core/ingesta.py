@@ -0,0 +1,80 @@
+# dashboard/core/ingesta.py
+import csv
+import os
+import pandas as pd
+
+# Filas por bloque: el análisis nunca tiene en memoria más que un bloque crudo a la vez
+TAM_BLOQUE_LECTURA = 20000
+FORMATOS_SOPORTADOS = ['xlsx', 'xls', 'csv', 'parquet']
+
+
+def _extension(archivo):
+    return os.path.splitext(getattr(archivo, 'name', str(archivo)))[1].lower().lstrip('.')
+
+
+def _bloques_xlsx(archivo, tam_bloque):
+    """Recorre la primera hoja fila a fila con openpyxl en modo solo lectura."""
+    import openpyxl
+    libro = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None: return
+        # Igual que read_excel: las columnas sin título se llaman 'Unnamed: n' y luego se descartan
+        columnas = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(encabezado)]
+        bloque = []
+        for fila in filas:
+            if all(v is None for v in fila): continue
+            bloque.append(fila)
+            if len(bloque) == tam_bloque:
+                yield pd.DataFrame(bloque, columns=columnas)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=columnas)
+    finally:
+        libro.close()
+
+
+def _detectar_formato_csv(archivo):
+    muestra = archivo.read(64 * 1024)
+    archivo.seek(0)
+    try:
+        texto, encoding = muestra.decode('utf-8-sig'), 'utf-8-sig'
+    except UnicodeDecodeError:
+        texto, encoding = muestra.decode('latin-1'), 'latin-1' # Exportaciones de Excel en Windows
+    try:
+        separador = csv.Sniffer().sniff(texto, delimiters=',;\t|').delimiter
+    except csv.Error:
+        separador = ','
+    return encoding, separador
+
+
+def _bloques_csv(archivo, tam_bloque):
+    encoding, separador = _detectar_formato_csv(archivo)
+    # dtype=str conserva los ceros a la izquierda de 'file' y 'nit_cliente'; las fechas se parsean después
+    yield from pd.read_csv(archivo, sep=separador, encoding=encoding, dtype=str, chunksize=tam_bloque)
+
+
+def _bloques_parquet(archivo, tam_bloque):
+    import pyarrow.parquet as pq
+    for lote in pq.ParquetFile(archivo).iter_batches(batch_size=tam_bloque):
+        yield lote.to_pandas()
+
+
+def leer_en_bloques(archivo, tam_bloque: int = TAM_BLOQUE_LECTURA):
+    """
+    Generador de DataFrames de hasta 'tam_bloque' filas a partir del archivo subido
+    (xlsx, xls, csv o parquet, según la extensión del nombre).
+    """
+    extension = _extension(archivo)
+    if hasattr(archivo, 'seek'): archivo.seek(0)
+    if extension == 'xlsx':
+        return _bloques_xlsx(archivo, tam_bloque)
+    if extension == 'csv':
+        return _bloques_csv(archivo, tam_bloque)
+    if extension == 'parquet':
+        return _bloques_parquet(archivo, tam_bloque)
+    if extension == 'xls':
+        # xlrd no lee por partes: el formato antiguo se carga completo en un solo bloque
+        return iter([pd.read_excel(archivo, engine='xlrd')])
+    raise ValueError(f"Formato no soportado: '{extension}'. Usa uno de: {', '.join(FORMATOS_SOPORTADOS)}.")
@@ -4,11 +4,11 @@ import pandas as pd
 import json
 import os
 from datetime import datetime, timedelta
-from supabase import Client
+from core.repositorio import RepositorioDatos
 
 class UserMetrics:
-    def __init__(self, supabase: Client):
-        self.supabase = supabase
+    def __init__(self, repo: RepositorioDatos):
+        self.repo = repo
         self.log_file = "/app/logs/user_sessions.json" # Ruta dentro del contenedor Docker
         self._ensure_log_file()
 
@@ -51,7 +51,7 @@ class UserMetrics:
             }
             
             try:
-                self.supabase.table('user_sessions').insert(session_data).execute()
+                self.repo.insertar_sesion(session_data)
             except Exception as e:
                 # Log local como respaldo si falla la inserción en Supabase
                 session_data['error'] = str(e)
@@ -75,9 +75,8 @@ class UserMetrics:
     def get_metrics_summary(self, days=30):
         try:
             start_date = datetime.now() - timedelta(days=days)
-            response = self.supabase.table('user_sessions').select("*").gte('session_start', start_date.isoformat()).execute()
-            if not response.data: return None
-            df = pd.DataFrame(response.data)
+            df = self.repo.leer_sesiones(desde=start_date)
+            if df.empty: return None
             df['session_start'] = pd.to_datetime(df['session_start'])
             return {
                 'total_sessions': len(df),
@@ -91,18 +90,15 @@ class UserMetrics:
     def get_recent_sessions(self, limit=50):
         """Obtiene las N sesiones más recientes de la base de datos."""
         try:
-            response = self.supabase.table('user_sessions').select("*").order('session_start', desc=True).limit(limit).execute()
-            if response.data:
-                return pd.DataFrame(response.data)
-            # Devuelve un DataFrame vacío si no hay datos o si falla
-            return pd.DataFrame() 
+            # Devuelve un DataFrame vacío si no hay datos
+            return self.repo.leer_sesiones(limite=limit)
         except Exception as e:
             # En lugar de mostrar un error que detenga la app, lo registramos y devolvemos un DF vacío
             print(f"Error al obtener sesiones recientes: {e}")
             return pd.DataFrame()
 
 
-def init_metrics(supabase: Client):
+def init_metrics(repo: RepositorioDatos):
     if 'metrics' not in st.session_state:
-        st.session_state.metrics = UserMetrics(supabase)
+        st.session_state.metrics = UserMetrics(repo)
     return st.session_state.metrics
\ No newline at end of file
@@ -1,99 +1,315 @@
 # dashboard/core/processing.py
-import streamlit as st
 import pandas as pd
-from supabase import Client
-import io
+from core.repositorio import RepositorioDatos
+from core.indice_archivos import obtener_indice_archivos
+from core.calidad import perfilar
+from core.esquema import COLUMNAS_BD_FINAL, COLUMNAS_FECHA, COLUMNAS_TEXTO, COLUMNAS_ESQUEMA, FORMATOS_FECHA_BD, ReporteEsquema, fechas_vacias, parsear_fecha, validar_bloque
+import os
+import json
+import time
+import random
+import hashlib
 import numpy as np
-import re
-
-# Tu función 'analizar_archivo_cargado' original
-def analizar_archivo_cargado(df_crudo: pd.DataFrame, supabase: Client):
-    df = df_crudo.copy()
-    df = df.loc[:, ~df.columns.str.contains('^Unnamed', case=False, na=False)]
-    
-    def normalize_column_name(name):
-        name = str(name)
-        name = pd.Series([name]).str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8').iloc[0]
-        name = re.sub(r'[^a-z0-9]', ' ', name.lower())
-        name = re.sub(r'\s+', '', name)
-        name = name.strip('')
-        return name
-
-    df.columns = [normalize_column_name(col) for col in df.columns]
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+TAM_LOTE_INSERCION = 500
+MAX_LOTES_CONCURRENTES = 3
+MAX_REINTENTOS = 3
+RUTA_CHECKPOINTS = "/app/logs/checkpoints"
+
+
+def normalizar_nombres_columnas(columnas) -> pd.Index:
+    """
+    'Fecha File' -> 'fecha_file', 'FCH. PRIMERA FACT. PROV' -> 'fch_primera_fact_prov'. Todo el
+    encabezado en una sola pasada: sin acentos, en minúsculas y con '_' entre palabras.
+    """
+    nombres = pd.Index(columnas).astype(str).str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
+    return nombres.str.lower().str.replace(r'[^a-z0-9]+', '_', regex=True).str.strip('_')
+
+
+def _limpiar_texto(serie: pd.Series):
+    # Se limpia cada valor distinto una sola vez (tipo, estado, operativo... se repiten mucho).
+    # Nulos, vacíos y sus representaciones en texto quedan como 'NO ESPECIFICADO'
+    codigos, unicos = pd.factorize(serie)
+    texto = pd.Index(unicos).astype(str).str.strip().str.upper()
+    texto = texto.where(~texto.isin(['', 'NAN', 'NONE', 'NA', 'NAT']), 'NO ESPECIFICADO')
+    limpios = np.append(texto.to_numpy(dtype=object), 'NO ESPECIFICADO') # El código -1 (nulo) apunta al último
+    return pd.Series(limpios[codigos], index=serie.index, dtype=object)
+
+
+def _normalizar_bloque(df: pd.DataFrame, reporte: ReporteEsquema = None, ilegibles: dict = None):
+    """
+    Limpieza de un bloque crudo: nombres de columnas, textos y fechas (con los formatos del
+    esquema). Solo deja las columnas de la BD. Lo que no cumple el esquema va al reporte.
+    Si se pasa 'ilegibles', se llena con {columna de fecha: máscara de las filas cuya fecha
+    traía un valor que no se pudo leer}, para contarlas sobre cualquier subconjunto del bloque.
+    """
+    df = df.loc[:, ~df.columns.astype(str).str.contains('^Unnamed', case=False, na=False)]
+    df.columns = normalizar_nombres_columnas(df.columns)
     mapa_post_normalizacion = {'fch_primera_fact_prov': 'fecha_primera_factura'}
-    df.rename(columns=mapa_post_normalizacion, inplace=True)
-    columnas_texto = ['file', 'nit_cliente', 'cliente', 'tipo', 'operativo', 'comercial', 'envio_facturar', 'estado']
-    for col in columnas_texto:
-        if col not in df.columns: df[col] = 'NO ESPECIFICADO'
+    df = df.rename(columns=mapa_post_normalizacion)
+    # Si dos encabezados quedan con el mismo nombre, se conserva el primero
+    df = df.loc[:, ~df.columns.duplicated()]
+    for col in COLUMNAS_TEXTO:
+        df[col] = _limpiar_texto(df[col]) if col in df.columns else 'NO ESPECIFICADO'
+    for col in COLUMNAS_FECHA:
+        if col in df.columns:
+            con_valor = ~fechas_vacias(df[col])
+            df[col] = parsear_fecha(df[col], COLUMNAS_ESQUEMA[col].formatos, col, reporte)
+            if ilegibles is not None:
+                ilegibles[col] = con_valor & df[col].isna()
+    df = df[[col for col in COLUMNAS_BD_FINAL if col in df.columns]]
+    if reporte is not None:
+        validar_bloque(df, reporte)
+    return df[df['file'] != 'NO ESPECIFICADO']
+
+
+def _columna_canonica(df: pd.DataFrame, col: str):
+    # Los valores tal como quedan tras normalizar la carga: un texto vacío, nulo o 'NO
+    # ESPECIFICADO' es el mismo valor, venga del archivo o de la base
+    if col in COLUMNAS_FECHA:
+        if col not in df.columns: return pd.Series(pd.NaT, index=df.index, dtype='datetime64[s]')
+        return pd.to_datetime(df[col], errors='coerce').astype('datetime64[s]')
+    if col not in df.columns: return pd.Series('', index=df.index, dtype=object)
+    texto = _limpiar_texto(df[col])
+    return texto.mask(texto == 'NO ESPECIFICADO', '')
+
+
+def hash_filas(df: pd.DataFrame) -> pd.Series:
+    """
+    Hash de 64 bits por fila (en texto) del contenido normalizado de COLUMNAS_BD_FINAL
+    (columna ausente = vacía), calculado en bloque con pd.util.hash_pandas_object. Se guarda
+    en 'hash_contenido' al insertar, así una nueva carga sabe qué filas no cambiaron sin
+    tener que leer sus valores.
+    """
+    if df.empty: return pd.Series([], index=df.index, dtype=object)
+    canonico = pd.DataFrame({col: _columna_canonica(df, col) for col in COLUMNAS_BD_FINAL}, index=df.index)
+    valores = pd.util.hash_pandas_object(canonico, index=False).to_numpy()
+    return pd.Series(valores.astype(str), index=df.index, dtype=object)
+
+
+def serializar_registros(df: pd.DataFrame) -> list:
+    """
+    Payload JSON para insertar: fechas a texto ISO y nulos a None, columna por columna,
+    y los dicts se arman en una sola pasada sobre las filas.
+    """
+    columnas, valores = list(df.columns), []
+    for col in columnas:
+        serie = df[col]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            # datetime_as_string formatea en C; strftime lo hace fecha por fecha
+            arreglo = np.datetime_as_string(serie.to_numpy(dtype='datetime64[s]'), unit='s').astype(object)
+            arreglo[serie.isna().to_numpy()] = None
         else:
-            df[col] = df[col].astype(str).fillna('NO ESPECIFICADO').str.strip().str.upper()
-            df[col] = df[col].replace(['', 'NAN', 'NONE', 'NA'], 'NO ESPECIFICADO')
-
-    df_validos = df[df['file'] != 'NO ESPECIFICADO'].copy()
-    es_duplicado_interno = df_validos.duplicated(subset=['file'], keep=False)
-    df_duplicados_internos = df_validos[es_duplicado_interno].sort_values('file')
-    df_limpio = df_validos.drop_duplicates(subset=['file'], keep='first')
-    
-    all_files_db = []
-    page = 0
-    with st.spinner("Consultando todos los registros de la base de datos..."):
-        while True:
-            response = supabase.table('operaciones').select('file').range(page * 1000, (page + 1) * 1000 - 1).execute()
-            data = response.data
-            if not data: break
-            all_files_db.extend(data)
-            page += 1
-    
-    archivos_existentes_db = {str(item['file']).strip().upper() for item in all_files_db if item.get('file')}
-    mask_existentes = df_limpio['file'].isin(archivos_existentes_db)
-    df_nuevos = df_limpio[~mask_existentes]
-    df_existentes = df_limpio[mask_existentes]
-    
-    resumen_calidad = []
-    if not df_nuevos.empty:
-        total_nuevos = len(df_nuevos)
-        columnas_a_revisar = ['operativo', 'comercial', 'estado']
-        for col in columnas_a_revisar:
-            faltantes = df_nuevos[df_nuevos[col] == 'NO ESPECIFICADO'].shape[0]
-            porcentaje = (faltantes / total_nuevos) * 100
-            # Corregido typo de tu código original: resumencalidad -> resumen_calidad
-            resumen_calidad.append({"Campo": col.replace('_', ' ').title(), "Registros Faltantes": faltantes, "Porcentaje (%)": f"{porcentaje:.1f}%"})
-    
-    columnas_fecha = ['fecha_file', 'fecha_cierre', 'fecha_primera_factura', 'fecha_arribo', 'fecha_zarpe', 'fecha_de_factura', 'fecha_envio_cierre']
-    for col in columnas_fecha:
-        if col in df_nuevos.columns:
-            df_nuevos.loc[:,col] = pd.to_datetime(df_nuevos[col], errors='coerce') # Usamos .loc para evitar SettingWithCopyWarning
-    
-    columnas_bd_final = ['file', 'nit_cliente', 'cliente', 'fecha_file', 'tipo', 'operativo', 'comercial', 'fecha_primera_factura', 'fecha_arribo', 'fecha_zarpe', 'envio_facturar', 'fecha_de_factura', 'fecha_envio_cierre', 'fecha_cierre', 'estado']
-    columnas_a_mantener = [col for col in columnas_bd_final if col in df_nuevos.columns]
-    df_nuevos = df_nuevos[columnas_a_mantener]
-    
-    return df_nuevos, df_existentes, df_duplicados_internos, pd.DataFrame(resumen_calidad)
-
-# Tu función 'insertar_nuevos_datos' original
-def insertar_nuevos_datos(df_nuevos: pd.DataFrame, supabase: Client) -> int:
+            arreglo = serie.to_numpy(dtype=object, na_value=None) if serie.hasnans else serie.to_numpy(dtype=object)
+        valores.append(arreglo)
+    return [dict(zip(columnas, fila)) for fila in zip(*valores)]
+
+
+def detectar_cambios(df_existentes: pd.DataFrame, repo: RepositorioDatos):
+    """
+    Compara las filas que ya existen en la base con lo subido. Primero solo se leen los
+    hashes guardados; los valores completos se piden solo para las filas cuyo hash difiere.
+    Un campo vacío en el archivo ('NO ESPECIFICADO' o sin fecha) nunca borra un valor de la base.
+    Devuelve (cambios, num_cambiados): cada cambio es la fila completa como debe quedar en la
+    base (todas las columnas de COLUMNAS_BD_FINAL y el nuevo 'hash_contenido'); así el
+    upsert nunca propone una fila a la que le falten columnas obligatorias.
+    """
+    if df_existentes.empty: return [], 0
+    guardados = repo.leer_operaciones_por_files(df_existentes['file'], ['file', 'hash_contenido']).drop_duplicates('file', keep='last')
+    hash_guardado = df_existentes['file'].map(guardados.set_index('file')['hash_contenido'])
+    candidatos = df_existentes[hash_guardado.ne(df_existentes['hash_contenido'])]
+    if candidatos.empty: return [], 0
+
+    columnas = [col for col in COLUMNAS_BD_FINAL if col in candidatos.columns and col != 'file']
+    columnas_bd = [col for col in COLUMNAS_BD_FINAL if col != 'file']
+    subida = candidatos.set_index('file')
+    bd = repo.leer_operaciones_por_files(subida.index, ['file', 'hash_contenido'] + columnas_bd).drop_duplicates('file', keep='last').set_index('file').reindex(subida.index)
+    for col in columnas_bd:
+        if col in COLUMNAS_FECHA: bd[col] = parsear_fecha(bd[col], FORMATOS_FECHA_BD)
+    distintos = pd.DataFrame({
+        col: (subida[col].notna() if col in COLUMNAS_FECHA else subida[col].ne('NO ESPECIFICADO')) & subida[col].ne(bd[col])
+        for col in columnas
+    })
+    # La fila tal como quedará en la base tras aplicar el cambio, y su hash
+    fusion = bd[columnas_bd].copy()
+    fusion[columnas] = bd[columnas].mask(distintos, subida[columnas])
+    fusion['hash_contenido'] = hash_filas(fusion).to_numpy()
+
+    hay_cambios = distintos.any(axis=1)
+    # Sin cambios reales, solo se reescribe si el hash guardado no es el de la fila (filas
+    # previas a la columna, o hashes de un formato anterior)
+    escribir = hay_cambios | bd['hash_contenido'].ne(fusion['hash_contenido'])
+    cambios = serializar_registros(fusion[escribir.to_numpy()].reset_index())
+    return cambios, int(hay_cambios.sum())
+
+
+def aplicar_cambios(cambios: list, repo: RepositorioDatos, tam_lote: int = TAM_LOTE_INSERCION):
+    """Escribe los cambios por lotes. Es idempotente: si falla, se puede volver a ejecutar igual."""
+    for i in range(0, len(cambios), tam_lote):
+        repo.actualizar_operaciones(cambios[i:i + tam_lote])
+    return len(cambios)
+
+
+def analizar_archivo_por_bloques(bloques, repo: RepositorioDatos, al_progresar=None):
+    """
+    Analiza el archivo bloque a bloque: cada bloque crudo se normaliza, se deduplica contra
+    lo ya visto y se cruza con la base, y luego se descarta. Solo se acumulan las filas
+    limpias, con las columnas de la BD.
+    al_progresar(bloques_leidos, filas_leidas) se llama al terminar cada bloque.
+    Además de los cuatro resultados de siempre devuelve los problemas de esquema encontrados.
+    """
+    reporte = ReporteEsquema()
+    vistos = set()
+    claves_duplicadas = set()
+    partes_nuevos, partes_existentes, partes_repetidas = [], [], []
+    filas_leidas = 0
+    # Fechas ilegibles de las filas nuevas: el resumen de calidad cuenta todo sobre df_nuevos
+    ilegibles_nuevos = {}
+    indice = obtener_indice_archivos()
+    for num_bloque, df_crudo in enumerate(bloques, start=1):
+        filas_leidas += len(df_crudo)
+        ilegibles = {}
+        df = _normalizar_bloque(df_crudo, reporte, ilegibles)
+        del df_crudo
+        # Duplicados dentro del bloque o con bloques anteriores: se conserva la primera aparición
+        repetida = df['file'].duplicated(keep='first') | df['file'].isin(vistos)
+        if repetida.any():
+            partes_repetidas.append(df[repetida])
+            claves_duplicadas.update(df.loc[repetida, 'file'])
+            df = df[~repetida]
+        vistos.update(df['file'])
+        df['hash_contenido'] = hash_filas(df)
+        # Solo se consultan las llaves del bloque (en lotes), no toda la tabla
+        existentes = indice.existentes(repo, df['file'])
+        mask_existentes = df['file'].isin(existentes)
+        partes_nuevos.append(df[~mask_existentes])
+        partes_existentes.append(df[mask_existentes])
+        for col, mascara in ilegibles.items():
+            ilegibles_nuevos[col] = ilegibles_nuevos.get(col, 0) + int(mascara.loc[df.index[~mask_existentes]].sum())
+        if al_progresar: al_progresar(num_bloque, filas_leidas)
+
+    vacio = pd.DataFrame(columns=COLUMNAS_BD_FINAL)
+    df_nuevos = pd.concat(partes_nuevos, ignore_index=True) if partes_nuevos else vacio
+    df_existentes = pd.concat(partes_existentes, ignore_index=True) if partes_existentes else vacio
+    # Como antes (keep=False), el reporte incluye también la primera aparición de cada 'file' repetido
+    if claves_duplicadas:
+        primeras = [df[df['file'].isin(claves_duplicadas)].drop(columns='hash_contenido') for df in (df_nuevos, df_existentes)]
+        df_duplicados_internos = pd.concat(primeras + partes_repetidas, ignore_index=True).sort_values('file', kind='stable')
+    else:
+        df_duplicados_internos = pd.DataFrame()
+    resumen_calidad = perfilar(df_nuevos, ilegibles=ilegibles_nuevos) if not df_nuevos.empty else pd.DataFrame()
+    return df_nuevos, df_existentes, df_duplicados_internos, resumen_calidad, reporte.como_dataframe()
+
+
+# Tu función 'analizar_archivo_cargado' original; ahora es el caso de un único bloque
+def analizar_archivo_cargado(df_crudo: pd.DataFrame, repo: RepositorioDatos):
+    return analizar_archivo_por_bloques([df_crudo], repo)[:4]
+
+
+
+def _ruta_checkpoint(df_nuevos: pd.DataFrame):
+    # La carga se identifica por sus 'file': el mismo archivo reanuda el mismo checkpoint
+    huella = hashlib.sha1("\n".join(sorted(df_nuevos['file'].astype(str))).encode('utf-8')).hexdigest()
+    return os.path.join(RUTA_CHECKPOINTS, f"{huella}.json")
+
+
+def _leer_checkpoint(ruta: str, tam_lote: int):
+    try:
+        with open(ruta, 'r') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('tam_lote') == tam_lote:
+            return set(checkpoint.get('lotes_confirmados', []))
+    except Exception:
+        pass
+    return set()
+
+
+def _guardar_checkpoint(ruta: str, tam_lote: int, lotes_confirmados: set):
+    try:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, 'w') as f:
+            json.dump({'tam_lote': tam_lote, 'lotes_confirmados': sorted(lotes_confirmados)}, f)
+    except Exception:
+        pass # Sin checkpoint la carga sigue funcionando, solo no se podrá reanudar
+
+
+def _insertar_lote(repo: RepositorioDatos, registros: list):
+    """Inserta un lote reintentando con espera exponencial. Devuelve cuántos reintentos usó."""
+    for intento in range(MAX_REINTENTOS + 1):
+        try:
+            if intento > 0:
+                # El intento anterior pudo haberse guardado aunque la respuesta falló:
+                # solo reenviamos las filas que la base todavía no tiene
+                ya_insertados = repo.buscar_files_existentes([r['file'] for r in registros])
+                registros = [r for r in registros if r['file'] not in ya_insertados]
+            if registros:
+                repo.insertar_operaciones(registros)
+            return intento
+        except Exception:
+            if intento == MAX_REINTENTOS:
+                raise
+            time.sleep(0.5 * 2 ** intento + random.uniform(0, 0.25))
+
+
+# Tu función 'insertar_nuevos_datos' original, ahora por lotes concurrentes y reanudable
+def insertar_nuevos_datos(df_nuevos: pd.DataFrame, repo: RepositorioDatos, tam_lote: int = TAM_LOTE_INSERCION, max_concurrencia: int = MAX_LOTES_CONCURRENTES, al_progresar=None) -> dict:
+    """
+    Inserta en lotes de 'tam_lote' filas, con hasta 'max_concurrencia' lotes a la vez.
+    Los lotes confirmados se anotan en un checkpoint en disco, así que si la carga falla
+    a medias, volver a ejecutarla solo envía los lotes pendientes.
+    al_progresar(lotes_hechos, lotes_totales, filas_insertadas, filas_por_segundo) se
+    llama desde el hilo que invocó la función cada vez que termina un lote.
+    No usa st.*: puede ejecutarse en un trabajo en segundo plano (core/trabajos.py).
+    """
+    resultado = {'insertados': 0, 'lotes_totales': 0, 'lotes_exitosos': 0, 'lotes_reintentados': 0, 'lotes_fallidos': 0, 'lotes_omitidos': 0, 'filas_por_segundo': 0.0, 'error': None}
     num_nuevos = len(df_nuevos)
     if num_nuevos == 0:
-        st.info("No hay registros nuevos para insertar.")
-        return 0
-    try:
-        with st.spinner(f"Insertando {num_nuevos} operaciones nuevas..."):
-            df_insertar = df_nuevos.copy()
-            columnas_fecha = ['fecha_file', 'fecha_cierre', 'fecha_primera_factura', 'fecha_arribo', 'fecha_zarpe', 'fecha_de_factura', 'fecha_envio_cierre']
-            for col in columnas_fecha:
-                if col in df_insertar.columns:
-                    df_insertar[col] = df_insertar[col].apply(lambda x: x.isoformat() if pd.notna(x) else None)
-            df_insertar = df_insertar.replace({np.nan: None})
-            data_to_insert = df_insertar.to_dict(orient='records')
-            supabase.table('operaciones').insert(data_to_insert).execute()
-            st.success(f"✅ ¡Éxito! Se han añadido {num_nuevos} operaciones nuevas.")
-            return num_nuevos
-    except Exception as e:
-        st.error(f"❌ Error al actualizar la base de datos: {e}")
-        return -1
+        return resultado
+
+    data_to_insert = serializar_registros(df_nuevos)
+
+    lotes = [data_to_insert[i:i + tam_lote] for i in range(0, num_nuevos, tam_lote)]
+    ruta_checkpoint = _ruta_checkpoint(df_nuevos)
+    confirmados = _leer_checkpoint(ruta_checkpoint, tam_lote)
+    pendientes = [i for i in range(len(lotes)) if i not in confirmados]
+    resultado['lotes_totales'] = len(lotes)
+    resultado['lotes_omitidos'] = len(confirmados)
+
+    inicio = time.perf_counter()
+    errores = []
+    with ThreadPoolExecutor(max_workers=max_concurrencia) as executor:
+        futuros = {executor.submit(_insertar_lote, repo, lotes[i]): i for i in pendientes}
+        for futuro in as_completed(futuros):
+            i = futuros[futuro]
+            try:
+                reintentos = futuro.result()
+            except Exception as e:
+                resultado['lotes_fallidos'] += 1
+                errores.append(str(e))
+            else:
+                resultado['lotes_exitosos'] += 1
+                resultado['lotes_reintentados'] += int(reintentos > 0)
+                resultado['insertados'] += len(lotes[i])
+                confirmados.add(i)
+                _guardar_checkpoint(ruta_checkpoint, tam_lote, confirmados)
+                obtener_indice_archivos().registrar(r['file'] for r in lotes[i])
+            resultado['filas_por_segundo'] = round(resultado['insertados'] / max(time.perf_counter() - inicio, 1e-6), 1)
+            if al_progresar:
+                al_progresar(len(confirmados) + resultado['lotes_fallidos'], len(lotes), resultado['insertados'], resultado['filas_por_segundo'])
+
+    if resultado['lotes_fallidos']:
+        resultado['error'] = errores[0]
+    else:
+        try:
+            os.remove(ruta_checkpoint)
+        except OSError:
+            pass
+    return resultado
 
 # Tu función 'registrar_log_de_carga' original
-def registrar_log_de_carga(supabase: Client, num_nuevos: int, num_existentes: int, num_duplicados: int, resumen_calidad: pd.DataFrame):
+def registrar_log_de_carga(repo: RepositorioDatos, num_nuevos: int, num_existentes: int, num_duplicados: int, resumen_calidad: pd.DataFrame, lotes_exitosos: int = None, lotes_reintentados: int = None, hash_archivo: str = None):
+    """Registra la carga en cargas_log. Devuelve None si se guardó, o el error para mostrarlo en la página."""
     try:
         calidad_dict = resumen_calidad.to_dict(orient='records')
         log_entry = {
@@ -101,22 +317,14 @@ def registrar_log_de_carga(supabase: Client, num_nuevos: int, num_existentes: in
             "registros_duplicados": num_duplicados + num_existentes,
             "calidad_json": calidad_dict
         }
-        supabase.table('cargas_log').insert(log_entry).execute()
-        return True
+        # Columnas añadidas en sql/cargas_log_lotes.sql
+        if lotes_exitosos is not None:
+            log_entry["lotes_exitosos"] = lotes_exitosos
+            log_entry["lotes_reintentados"] = lotes_reintentados or 0
+        # sql/cargas_log_hash.sql: permite reconocer un archivo que ya se cargó
+        if hash_archivo is not None:
+            log_entry["hash_archivo"] = hash_archivo
+        repo.insertar_carga_log(log_entry)
+        return None
     except Exception as e:
-        st.sidebar.error(f"Error al registrar el log de carga: {e}")
-        return False
-
-# Tu función 'to_excel' original
-@st.cache_data
-def to_excel(df: pd.DataFrame):
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Datos')
-        worksheet = writer.sheets['Datos']
-        for idx, col in enumerate(df):
-            series = df[col]
-            if not series.empty:
-                max_len = max((series.astype(str).map(len).max(), len(str(series.name)))) + 1
-                worksheet.set_column(idx, idx, max_len)
-    return output.getvalue()
\ No newline at end of file
+        return str(e)
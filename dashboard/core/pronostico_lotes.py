@@ -0,0 +1,206 @@
+# dashboard/core/pronostico_lotes.py
+"""
+Pronóstico en lote de todas las series operativo × tipo, para planificar personal. Las series
+se arman con un solo groupby sobre la historia, se ajustan en paralelo en un pool de procesos
+y el resultado se guarda en una única tabla parquet que la UI y las exportaciones consultan.
+"""
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from core.pronostico_rapido import MOTORES_RAPIDOS, Z_INTERVALO
+from core.pronosticos import RUTA_PRONOSTICOS, HORIZONTE_MAXIMO, MIN_REGISTROS_PRONOSTICO, MOTOR_PROPHET, PARAMETROS_PROPHET, _escribir_atomico
+
+RUTA_LOTES = os.path.join(RUTA_PRONOSTICOS, "lotes")
+MAX_LOTES_GUARDADOS = 6
+MOTOR_LOTE_POR_DEFECTO = 'Conteos diarios (Poisson)' # El más preciso y rápido en benchmarks/bench_pronosticos.py
+FRECUENCIAS_LOTE = {'Diaria': 'D', 'Semanal': 'W'}
+BLOQUES_POR_PROCESO = 4 # Varias tareas por proceso: si un bloque tarda más, los otros procesos siguen con el resto
+COLUMNAS_LOTE = ['operativo', 'tipo', 'ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+def procesos_lote():
+    # Se deja un núcleo libre para el servidor de Streamlit
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def conteos_operativo_tipo(df: pd.DataFrame):
+    """
+    Operaciones por día de cada operativo × tipo, en formato largo (operativo, tipo, ds, y), con
+    un solo groupby. Se descartan las series con menos de MIN_REGISTROS_PRONOSTICO operaciones
+    o con menos de 2 días, igual que en el pronóstico por tipo.
+    """
+    if df.empty: return pd.DataFrame(columns=['operativo', 'tipo', 'ds', 'y'])
+    conteos = df.groupby([df['operativo'], df['tipo'], df['fecha_file'].dt.normalize().rename('ds')], observed=True).size()
+    conteos = conteos.rename('y').reset_index()
+    por_serie = conteos.groupby(['operativo', 'tipo'], observed=True)['y']
+    suficientes = (por_serie.transform('sum') >= MIN_REGISTROS_PRONOSTICO) & (por_serie.transform('size') >= 2)
+    return conteos[suficientes].reset_index(drop=True)
+
+
+def _separar_series(conteos: pd.DataFrame, hasta: pd.Timestamp):
+    """[((operativo, tipo), DataFrame(ds, y)), ...]. Todas terminan en 'hasta' para que sus pronósticos empiecen el mismo día."""
+    conteos = conteos.sort_values(['operativo', 'tipo', 'ds'], kind='stable')
+    claves = conteos[['operativo', 'tipo']].astype(str).to_numpy()
+    cortes = np.flatnonzero((claves[1:] != claves[:-1]).any(axis=1)) + 1
+    series = []
+    for inicio, fin in zip(np.r_[0, cortes], np.r_[cortes, len(conteos)]):
+        serie = conteos.iloc[inicio:fin][['ds', 'y']].reset_index(drop=True)
+        if serie['ds'].iloc[-1] < hasta:
+            serie = pd.concat([serie, pd.DataFrame({'ds': [hasta], 'y': [0]})], ignore_index=True)
+        series.append(((claves[inicio, 0], claves[inicio, 1]), serie))
+    return series
+
+
+def _motor(nombre: str):
+    if nombre == MOTOR_PROPHET:
+        from core.pronosticos import ajustar_prophet
+        return lambda serie, horizonte: ajustar_prophet(serie, horizonte)[1][['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    return MOTORES_RAPIDOS[nombre]
+
+
+def _pronosticar_bloque(bloque, motor: str, horizonte: int):
+    """
+    Se ejecuta en un proceso aparte: pronostica cada serie del bloque y devuelve solo los días
+    futuros. Si una serie falla, se anota y se sigue con las demás.
+    """
+    pronosticar = _motor(motor)
+    tablas, fallidas = [], []
+    for (operativo, tipo), serie in bloque:
+        try:
+            pronostico = pronosticar(serie, horizonte)
+        except Exception as e:
+            fallidas.append({'operativo': operativo, 'tipo': tipo, 'error': str(e)})
+            continue
+        futuro = pronostico[pronostico['ds'] > serie['ds'].iloc[-1]].reset_index(drop=True)
+        futuro.insert(0, 'tipo', tipo)
+        futuro.insert(0, 'operativo', operativo)
+        tablas.append(futuro)
+    return tablas, fallidas
+
+
+def _horizonte_semanal(ultimo_dia: pd.Timestamp, horizonte: int):
+    """Días a pronosticar para cubrir 'horizonte' con semanas completas (lunes a domingo) desde el primer lunes futuro."""
+    hasta_lunes = (7 - (ultimo_dia + pd.Timedelta(days=1)).dayofweek) % 7
+    return hasta_lunes + -(-horizonte // 7) * 7
+
+
+def _por_semana(tabla: pd.DataFrame):
+    """
+    Suma los días de cada semana (lunes a domingo); el intervalo suma varianzas, como si los días
+    fueran independientes. Las semanas incompletas (la del último día con datos) se descartan:
+    una suma de menos días no es comparable con las demás.
+    """
+    varianza = ((tabla['yhat_upper'] - tabla['yhat']) / Z_INTERVALO) ** 2
+    semanal = tabla.assign(ds=tabla['ds'].dt.to_period('W').dt.start_time, varianza=varianza, dias=1) \
+        .groupby(['operativo', 'tipo', 'ds'], observed=True)[['yhat', 'varianza', 'dias']].sum().reset_index()
+    semanal = semanal[semanal.pop('dias') == 7].reset_index(drop=True)
+    sigma = np.sqrt(semanal.pop('varianza'))
+    semanal['yhat_lower'] = np.clip(semanal['yhat'] - Z_INTERVALO * sigma, 0, None)
+    semanal['yhat_upper'] = semanal['yhat'] + Z_INTERVALO * sigma
+    return semanal
+
+
+def huella_lote(conteos: pd.DataFrame, motor: str, frecuencia: str, horizonte: int):
+    """Identifica la historia y la configuración: la misma combinación nunca se vuelve a calcular."""
+    configuracion = (motor, frecuencia, horizonte, MIN_REGISTROS_PRONOSTICO)
+    if motor == MOTOR_PROPHET:
+        configuracion += (tuple(sorted(PARAMETROS_PROPHET.items())),)
+    huella = hashlib.sha1(repr(configuracion).encode('utf-8'))
+    huella.update(pd.util.hash_pandas_object(conteos, index=False).to_numpy().tobytes())
+    return huella.hexdigest()[:16]
+
+
+def _podar_lotes():
+    resumenes = sorted(glob.glob(os.path.join(RUTA_LOTES, "*.json")), key=os.path.getmtime, reverse=True)
+    for ruta in resumenes[MAX_LOTES_GUARDADOS:]:
+        for archivo in (ruta, ruta[:-len('.json')] + '.parquet'):
+            try:
+                os.remove(archivo)
+            except OSError:
+                pass
+
+
+def leer_resumen_lote(ruta_base: str):
+    """El resumen del lote ya calculado, o None si no existe."""
+    try:
+        with open(f"{ruta_base}.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def pronosticar_lote(df: pd.DataFrame, motor: str = MOTOR_LOTE_POR_DEFECTO, frecuencia: str = 'D',
+                     horizonte: int = HORIZONTE_MAXIMO, max_procesos: int = None):
+    """
+    Pronostica todas las series operativo × tipo del DataFrame de operaciones
+    (cargar_datos_desde_bd) y guarda la tabla (operativo, tipo, ds, yhat, yhat_lower,
+    yhat_upper) en RUTA_LOTES. 'frecuencia' es 'D' (diaria) o 'W' (semanal: los días
+    pronosticados se suman por semana, solo semanas completas de lunes a domingo). Si el mismo lote ya está en disco, no se recalcula.
+    Devuelve el resumen: ruta de la tabla, series pronosticadas, omitidas y fallidas.
+    """
+    if frecuencia not in FRECUENCIAS_LOTE.values():
+        raise ValueError(f"Frecuencia no soportada: {frecuencia}")
+    if motor != MOTOR_PROPHET and motor not in MOTORES_RAPIDOS:
+        raise ValueError(f"Motor de pronóstico desconocido: {motor}")
+    conteos = conteos_operativo_tipo(df)
+    ruta_base = os.path.join(RUTA_LOTES, huella_lote(conteos, motor, frecuencia, horizonte))
+    resumen = leer_resumen_lote(ruta_base)
+    if resumen is not None:
+        return resumen
+
+    series = _separar_series(conteos, conteos['ds'].max()) if not conteos.empty else []
+    # En semanal se pronostican los días que faltan hasta el primer lunes y semanas enteras desde ahí
+    dias = _horizonte_semanal(conteos['ds'].max(), horizonte) if frecuencia == 'W' and series else horizonte
+    max_procesos = max_procesos or procesos_lote()
+    tablas, fallidas = [], []
+    if max_procesos == 1 or len(series) <= 1:
+        tablas, fallidas = _pronosticar_bloque(series, motor, dias)
+    else:
+        # Bloques intercalados: las series largas y cortas quedan repartidas entre los procesos
+        n_bloques = min(len(series), max_procesos * BLOQUES_POR_PROCESO)
+        bloques = [series[i::n_bloques] for i in range(n_bloques)]
+        # 'spawn', como el pool de core/pronosticos.py: el proceso de Streamlit tiene hilos
+        with ProcessPoolExecutor(max_workers=max_procesos, mp_context=multiprocessing.get_context('spawn')) as executor:
+            for tablas_bloque, fallidas_bloque in executor.map(_pronosticar_bloque, bloques, [motor] * n_bloques, [dias] * n_bloques):
+                tablas += tablas_bloque
+                fallidas += fallidas_bloque
+
+    tabla = pd.concat(tablas, ignore_index=True) if tablas else pd.DataFrame(columns=COLUMNAS_LOTE)
+    if frecuencia == 'W' and not tabla.empty:
+        tabla = _por_semana(tabla)
+    tabla = tabla[COLUMNAS_LOTE].astype({'operativo': 'category', 'tipo': 'category', 'ds': 'datetime64[ns]', 'yhat': 'float32', 'yhat_lower': 'float32', 'yhat_upper': 'float32'})
+
+    total_series = df[['operativo', 'tipo']].drop_duplicates().dropna().shape[0] if not df.empty else 0
+    resumen = {
+        'ruta': f"{ruta_base}.parquet",
+        'motor': motor,
+        'frecuencia': frecuencia,
+        'horizonte': horizonte,
+        'desde': str(tabla['ds'].min().date()) if not tabla.empty else None,
+        'series': len(series) - len(fallidas),
+        'omitidas': total_series - len(series),
+        'fallidas': fallidas,
+    }
+    os.makedirs(RUTA_LOTES, exist_ok=True)
+    _escribir_atomico(resumen['ruta'], lambda ruta: tabla.to_parquet(ruta, index=False))
+    # El resumen se escribe al final: su existencia indica que la tabla está completa
+    def escribir_resumen(ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(resumen, f, ensure_ascii=False)
+    _escribir_atomico(f"{ruta_base}.json", escribir_resumen)
+    _podar_lotes()
+    return resumen
+
+
+def leer_pronostico_lote(ruta: str, operativos=None, tipos=None, hasta=None):
+    """Consulta la tabla del lote; los filtros se aplican al leer el parquet, sin cargarla completa."""
+    filtros = []
+    if operativos is not None: filtros.append(('operativo', 'in', [str(o) for o in operativos]))
+    if tipos is not None: filtros.append(('tipo', 'in', [str(t) for t in tipos]))
+    if hasta is not None: filtros.append(('ds', '<=', pd.Timestamp(hasta)))
+    return pd.read_parquet(ruta, filters=filtros or None)
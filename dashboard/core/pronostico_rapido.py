@@ -0,0 +1,183 @@
+# dashboard/core/pronostico_rapido.py
+"""
+Motores de pronóstico livianos en NumPy, alternativos a Prophet. Todos reciben la serie diaria
+(ds, y) y el horizonte en días, y devuelven el mismo esquema que Prophet: ds, yhat, yhat_lower
+y yhat_upper para la historia ajustada más los días pronosticados.
+"""
+import time
+import numpy as np
+import pandas as pd
+
+Z_INTERVALO = 1.2816 # Intervalo del 80 %, el mismo interval_width por defecto de Prophet
+DIAS_SEMANA = 7
+DIAS_ANIO = 365.25
+TERMINOS_FOURIER_ANUAL = 3
+# Rejilla de Holt-Winters: todas las combinaciones se ajustan a la vez, como un vector
+ALPHAS = np.array([0.05, 0.1, 0.2, 0.4])
+BETAS = np.array([0.0, 0.01, 0.05])
+GAMMAS = np.array([0.05, 0.1, 0.3])
+AMORTIGUACION_TENDENCIA = 0.98
+
+
+def serie_completa(serie: pd.DataFrame):
+    """Fechas y conteos de todos los días entre el primero y el último: los días sin operaciones valen 0."""
+    diaria = serie.set_index('ds')['y'].asfreq('D', fill_value=0)
+    return diaria.index, diaria.to_numpy(dtype=float)
+
+
+def _resultado(fechas: pd.DatetimeIndex, horizonte: int, yhat, sigma):
+    """DataFrame con el esquema de Prophet; los conteos no pueden ser negativos."""
+    ds = fechas.append(pd.date_range(fechas[-1] + pd.Timedelta(days=1), periods=horizonte, freq='D'))
+    yhat = np.clip(yhat, 0, None)
+    return pd.DataFrame({
+        'ds': ds,
+        'yhat': yhat,
+        'yhat_lower': np.clip(yhat - Z_INTERVALO * sigma, 0, None),
+        'yhat_upper': yhat + Z_INTERVALO * sigma,
+    })
+
+
+def _fourier_anual(t: np.ndarray, terminos: int = TERMINOS_FOURIER_ANUAL):
+    angulos = 2 * np.pi * np.outer(t, np.arange(1, terminos + 1)) / DIAS_ANIO
+    return np.hstack([np.sin(angulos), np.cos(angulos)])
+
+
+def naive_estacional(serie: pd.DataFrame, horizonte: int, periodo: int = DIAS_SEMANA):
+    """Cada día repite el mismo día de la semana anterior."""
+    fechas, y = serie_completa(serie)
+    n = len(y)
+    ajustado = np.concatenate([y[:periodo], y[:-periodo]])[:n]
+    futuro = y[n - periodo:][np.arange(horizonte) % periodo] if n >= periodo else np.full(horizonte, y.mean())
+    errores = y[periodo:] - y[:-periodo]
+    sigma_base = errores.std() if len(errores) > 1 else y.std()
+    # La incertidumbre crece con cada semana que se repite hacia adelante
+    sigma = np.concatenate([np.full(n, sigma_base), sigma_base * np.sqrt(1 + np.arange(horizonte) // periodo)])
+    return _resultado(fechas, horizonte, np.concatenate([ajustado, futuro]), sigma)
+
+
+def _componente_anual(y: np.ndarray):
+    """Estacionalidad anual por Fourier sobre la serie sin tendencia; solo con al menos dos años de historia."""
+    n = len(y)
+    if n < 2 * DIAS_ANIO:
+        return np.zeros(n), lambda t: np.zeros(len(t))
+    t = np.arange(n)
+    tendencia = np.polyval(np.polyfit(t, y, 1), t)
+    F = _fourier_anual(t)
+    coeficientes, *_ = np.linalg.lstsq(F, y - tendencia, rcond=None)
+    return F @ coeficientes, lambda t_futuro: _fourier_anual(t_futuro) @ coeficientes
+
+
+def holt_winters(serie: pd.DataFrame, horizonte: int, periodo: int = DIAS_SEMANA):
+    """
+    Holt-Winters aditivo con tendencia amortiguada y estacionalidad semanal; la anual se
+    modela aparte con términos de Fourier. Los parámetros se eligen por error de un paso
+    sobre una rejilla que se recorre en paralelo: un vector por combinación, un bucle por día.
+    """
+    fechas, y_total = serie_completa(serie)
+    anual, anual_futuro = _componente_anual(y_total)
+    y = y_total - anual
+    n = len(y)
+    if n < 2 * periodo:
+        return naive_estacional(serie, horizonte, periodo)
+
+    alpha, beta, gamma = (v.ravel() for v in np.meshgrid(ALPHAS, BETAS, GAMMAS, indexing='ij'))
+    phi = AMORTIGUACION_TENDENCIA
+    nivel = np.full(alpha.shape, y[:periodo].mean())
+    tendencia = np.full(alpha.shape, (y[periodo:2 * periodo].mean() - y[:periodo].mean()) / periodo)
+    estacion = np.tile(y[:periodo] - y[:periodo].mean(), (len(alpha), 1))
+    predicciones = np.empty((len(alpha), n))
+    for t in range(n):
+        s = estacion[:, t % periodo]
+        predicciones[:, t] = nivel + phi * tendencia + s
+        nivel_nuevo = alpha * (y[t] - s) + (1 - alpha) * (nivel + phi * tendencia)
+        tendencia = beta * (nivel_nuevo - nivel) + (1 - beta) * phi * tendencia
+        estacion[:, t % periodo] = gamma * (y[t] - nivel_nuevo) + (1 - gamma) * s
+        nivel = nivel_nuevo
+
+    # La primera semana solo inicializa: no cuenta para elegir parámetros
+    errores = y[periodo:] - predicciones[:, periodo:]
+    mejor = int(np.argmin((errores ** 2).sum(axis=1)))
+    pasos = np.arange(1, horizonte + 1)
+    amortiguada = np.cumsum(phi ** pasos)
+    futuro = nivel[mejor] + amortiguada * tendencia[mejor] + estacion[mejor, (n + pasos - 1) % periodo]
+    futuro += anual_futuro(np.arange(n, n + horizonte))
+
+    sigma_base = errores[mejor].std()
+    # Varianza del pronóstico a k pasos de un modelo ETS aditivo (aproximada, sin tendencia)
+    sigma = np.concatenate([np.full(n, sigma_base), sigma_base * np.sqrt(1 + (pasos - 1) * alpha[mejor] ** 2)])
+    ajustado = predicciones[mejor] + anual
+    return _resultado(fechas, horizonte, np.concatenate([ajustado, futuro]), sigma)
+
+
+def _diseno(t: np.ndarray, dia_semana: np.ndarray, n_historia: int, con_anual: bool):
+    columnas = [np.ones(len(t)), t / n_historia]
+    columnas += [(dia_semana == d).astype(float) for d in range(1, DIAS_SEMANA)]
+    X = np.column_stack(columnas)
+    return np.hstack([X, _fourier_anual(t)]) if con_anual else X
+
+
+def conteos_diarios(serie: pd.DataFrame, horizonte: int, iteraciones: int = 25):
+    """
+    Regresión de Poisson (IRLS) del conteo diario sobre tendencia, día de la semana y, con
+    al menos un año de historia, estacionalidad anual. El intervalo usa la sobredispersión
+    observada.
+    """
+    fechas, y = serie_completa(serie)
+    n = len(y)
+    ds_total = fechas.append(pd.date_range(fechas[-1] + pd.Timedelta(days=1), periods=horizonte, freq='D'))
+    t_total = np.arange(n + horizonte)
+    X_total = _diseno(t_total, ds_total.dayofweek.to_numpy(), n, con_anual=n >= DIAS_ANIO)
+    X = X_total[:n]
+
+    # Arranque por mínimos cuadrados sobre log(1 + y), luego IRLS
+    coeficientes, *_ = np.linalg.lstsq(X, np.log1p(y), rcond=None)
+    for _ in range(iteraciones):
+        eta = np.clip(X @ coeficientes, -20, 20)
+        mu = np.exp(eta)
+        z = eta + (y - mu) / mu
+        XtW = X.T * mu
+        nuevos = np.linalg.solve(XtW @ X + 1e-8 * np.eye(X.shape[1]), XtW @ z)
+        if np.max(np.abs(nuevos - coeficientes)) < 1e-6:
+            coeficientes = nuevos
+            break
+        coeficientes = nuevos
+
+    yhat = np.exp(np.clip(X_total @ coeficientes, -20, 20))
+    mu = yhat[:n]
+    dispersion = max(1.0, ((y - mu) ** 2 / mu).sum() / max(1, n - X.shape[1]))
+    return _resultado(fechas, horizonte, yhat, np.sqrt(dispersion * yhat))
+
+
+MOTORES_RAPIDOS = {
+    'Holt-Winters': holt_winters,
+    'Naive estacional': naive_estacional,
+    'Conteos diarios (Poisson)': conteos_diarios,
+}
+
+
+def backtest(serie: pd.DataFrame, pronosticar, horizonte: int = 30, cortes: int = 3):
+    """
+    Evalúa un motor (función (serie, horizonte) -> DataFrame con ds y yhat) en 'cortes'
+    ventanas consecutivas al final de la historia: se ajusta con lo anterior a cada ventana y
+    se compara con lo observado. El MAPE solo usa los días con operaciones (y > 0).
+    """
+    fechas, y = serie_completa(serie)
+    completa = pd.DataFrame({'ds': fechas, 'y': y})
+    latencias, errores = [], []
+    for corte in range(cortes, 0, -1):
+        fin = len(completa) - corte * horizonte
+        if fin < 2 * DIAS_SEMANA: continue
+        entrenamiento, prueba = completa.iloc[:fin], completa.iloc[fin:fin + horizonte]
+        inicio = time.perf_counter()
+        pronostico = pronosticar(entrenamiento, horizonte)
+        latencias.append(time.perf_counter() - inicio)
+        estimado = pronostico.set_index('ds')['yhat'].reindex(prueba['ds']).to_numpy()
+        real = prueba['y'].to_numpy()
+        con_datos = real > 0
+        if con_datos.any():
+            errores.append(np.mean(np.abs(real[con_datos] - estimado[con_datos]) / real[con_datos]) * 100)
+    return {
+        'ventanas': len(latencias),
+        'latencia_s': float(np.mean(latencias)) if latencias else np.nan,
+        'mape': float(np.mean(errores)) if errores else np.nan,
+    }
@@ -0,0 +1,185 @@
+# dashboard/core/pronosticos.py
+import glob
+import hashlib
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import pandas as pd
+import streamlit as st
+from concurrent.futures import ProcessPoolExecutor
+
+RUTA_PRONOSTICOS = "/app/logs/pronosticos" # Junto a los logs, que ya se persisten en un volumen
+HORIZONTE_MAXIMO = 365 # Días; los horizontes menores se sirven recortando este pronóstico
+MIN_REGISTROS_PRONOSTICO = 10 # Prophet necesita un mínimo de datos
+MAX_PROCESOS_PRONOSTICO = 2
+MAX_PRONOSTICOS_GUARDADOS = 40
+TODOS = "TODOS"
+MOTOR_PROPHET = "Prophet"
+# Si cambian los parámetros del modelo, cambia la huella y se vuelve a ajustar todo
+PARAMETROS_PROPHET = dict(daily_seasonality=False, weekly_seasonality=True, yearly_seasonality=True, changepoint_prior_scale=0.05)
+
+
+def series_diarias(df: pd.DataFrame):
+    """Operaciones por día para TODOS y para cada tipo: {tipo: DataFrame(ds, y)}. Solo los que tienen datos suficientes."""
+    if df.empty: return {}
+    dias = df['fecha_file'].dt.normalize()
+    series = {TODOS: (dias, len(df))}
+    conteos_tipo = df['tipo'].value_counts()
+    for tipo, registros in conteos_tipo.items():
+        series[tipo] = (dias[df['tipo'] == tipo], registros)
+    resultado = {}
+    for tipo, (dias_tipo, registros) in series.items():
+        if registros < MIN_REGISTROS_PRONOSTICO: continue
+        serie = dias_tipo.value_counts().sort_index().rename_axis('ds').reset_index(name='y')
+        if len(serie) < 2: continue # Prophet necesita al menos 2 puntos de datos
+        resultado[str(tipo)] = serie
+    return resultado
+
+
+def huella_serie(serie: pd.DataFrame):
+    """Identifica la serie y los parámetros: los mismos datos nunca se vuelven a ajustar, aunque reinicie el proceso."""
+    huella = hashlib.sha1(repr((sorted(PARAMETROS_PROPHET.items()), HORIZONTE_MAXIMO)).encode('utf-8'))
+    huella.update(pd.util.hash_pandas_object(serie, index=False).to_numpy().tobytes())
+    return huella.hexdigest()[:16]
+
+
+def _ruta_base(tipo: str, huella: str):
+    return os.path.join(RUTA_PRONOSTICOS, f"{re.sub(r'[^A-Za-z0-9_-]', '_', tipo)}_{huella}")
+
+
+def _escribir_atomico(ruta: str, escribir):
+    # Un temporal único por escritura (no por proceso): las sesiones y los trabajos de fondo
+    # son hilos del mismo proceso y pueden escribir la misma ruta a la vez
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    os.close(descriptor)
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.remove(temporal)
+        raise
+
+
+def ajustar_prophet(serie: pd.DataFrame, horizonte: int):
+    """Ajusta Prophet sobre la serie (ds, y) y pronostica 'horizonte' días. Devuelve (modelo, pronóstico)."""
+    from prophet import Prophet # Import tardío: Prophet y cmdstanpy son lo más pesado del dashboard
+    modelo = Prophet(**PARAMETROS_PROPHET)
+    modelo.fit(serie)
+    return modelo, modelo.predict(modelo.make_future_dataframe(periods=horizonte, freq='D'))
+
+
+def ajustar_y_guardar(serie: pd.DataFrame, ruta_base: str):
+    """
+    Se ejecuta en un proceso aparte: ajusta Prophet, pronostica HORIZONTE_MAXIMO días y guarda
+    el modelo (JSON de prophet.serialize) y el pronóstico (parquet). El modelo se escribe
+    al final: su existencia indica que el pronóstico está completo.
+    """
+    from prophet.serialize import model_to_json
+    modelo, pronostico = ajustar_prophet(serie, HORIZONTE_MAXIMO)
+    os.makedirs(os.path.dirname(ruta_base), exist_ok=True)
+    _escribir_atomico(f"{ruta_base}.parquet", lambda ruta: pronostico.to_parquet(ruta, index=False))
+    def escribir_modelo(ruta):
+        with open(ruta, 'w') as f:
+            f.write(model_to_json(modelo))
+    _escribir_atomico(f"{ruta_base}.json", escribir_modelo)
+    return ruta_base
+
+
+def _podar_pronosticos():
+    # Se conservan los más recientes; los de versiones de datos viejas ya nadie los pide
+    modelos = sorted(glob.glob(os.path.join(RUTA_PRONOSTICOS, "*.json")), key=os.path.getmtime, reverse=True)
+    for ruta in modelos[MAX_PRONOSTICOS_GUARDADOS:]:
+        for archivo in (ruta, ruta[:-len('.json')] + '.parquet'):
+            try:
+                os.remove(archivo)
+            except OSError:
+                pass
+
+
+class GestorPronosticos:
+    """
+    Ajusta en segundo plano, en un pool de procesos, los pronósticos de TODOS y de cada tipo
+    cada vez que cambia la versión del dataset. Ajustar Prophet es CPU pura: en procesos
+    aparte no compite por el GIL con las sesiones de Streamlit.
+    """
+    def __init__(self, max_procesos: int = MAX_PROCESOS_PRONOSTICO):
+        self.max_procesos = max_procesos
+        self.executor = None
+        self.pendientes = {} # ruta_base -> Future
+        self.version_programada = None
+        self.lock = threading.Lock()
+
+    def _obtener_executor(self):
+        if self.executor is None:
+            # 'spawn': el proceso de Streamlit tiene hilos y un fork podría heredar locks tomados
+            self.executor = ProcessPoolExecutor(max_workers=self.max_procesos, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def programar(self, df: pd.DataFrame, version: int):
+        """Encola los ajustes que faltan para esta versión. Si la versión ya se programó, no hace nada."""
+        with self.lock:
+            if version == self.version_programada: return
+            self.version_programada = version
+        for tipo, serie in obtener_series(df, version).items():
+            self._encolar(tipo, serie)
+        _podar_pronosticos()
+
+    def _encolar(self, tipo: str, serie: pd.DataFrame):
+        ruta_base = _ruta_base(tipo, huella_serie(serie))
+        if os.path.exists(f"{ruta_base}.json"): return
+        with self.lock:
+            futuro = self.pendientes.get(ruta_base)
+            if futuro is not None and not futuro.done(): return
+            self.pendientes[ruta_base] = self._obtener_executor().submit(ajustar_y_guardar, serie, ruta_base)
+
+    def estado(self, tipo: str, serie: pd.DataFrame):
+        """('listo', ruta_base), ('en_curso', None) o ('fallido', mensaje)."""
+        ruta_base = _ruta_base(tipo, huella_serie(serie))
+        if os.path.exists(f"{ruta_base}.json"):
+            return 'listo', ruta_base
+        with self.lock:
+            futuro = self.pendientes.get(ruta_base)
+        if futuro is None:
+            self._encolar(tipo, serie) # Por ejemplo, si otro proceso podó el archivo
+            return 'en_curso', None
+        if futuro.done() and futuro.exception() is not None:
+            return 'fallido', str(futuro.exception())
+        return 'en_curso', None
+
+    def reintentar(self, tipo: str, serie: pd.DataFrame):
+        with self.lock:
+            self.pendientes.pop(_ruta_base(tipo, huella_serie(serie)), None)
+        self._encolar(tipo, serie)
+
+
+@st.cache_resource
+def obtener_gestor_pronosticos():
+    # Compartido por todas las sesiones del proceso
+    return GestorPronosticos()
+
+
+@st.cache_resource(max_entries=2)
+def obtener_series(_df: pd.DataFrame, version: int):
+    # Una vez por versión del dataset compartido
+    return series_diarias(_df)
+
+
+def programar_pronosticos(df: pd.DataFrame, version: int):
+    """Pre-calienta en segundo plano los pronósticos de esta versión de datos."""
+    obtener_gestor_pronosticos().programar(df, version)
+
+
+@st.cache_resource(max_entries=16)
+def cargar_pronostico(ruta_base: str):
+    """Modelo y pronóstico al horizonte máximo leídos de disco (sin volver a ajustar)."""
+    from prophet.serialize import model_from_json
+    with open(f"{ruta_base}.json", 'r') as f:
+        modelo = model_from_json(f.read())
+    return modelo, pd.read_parquet(f"{ruta_base}.parquet")
+
+
+def recortar_horizonte(pronostico: pd.DataFrame, ultima_fecha, periodos: int):
+    """El pronóstico hasta 'periodos' días después del último dato histórico."""
+    return pronostico[pronostico['ds'] <= ultima_fecha + pd.Timedelta(days=periodos)]
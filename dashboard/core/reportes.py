@@ -0,0 +1,80 @@
+# dashboard/core/reportes.py
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import pandas as pd
+from core.exportacion import exportar_libro
+
+RUTA_REPORTES = "/app/logs/reportes" # Junto a los logs, que ya se persisten en un volumen
+MAX_REPORTES_GUARDADOS = 30
+
+
+def version_reporte(df_agregado_total: pd.DataFrame, ultima_carga=None):
+    """
+    Huella de los datos que sobrevive a reinicios del proceso (a diferencia de version_datos):
+    el agregado completo por mes/operativo/tipo más la fecha de la última carga registrada,
+    que también cambia cuando una carga solo actualiza filas existentes.
+    """
+    huella = hashlib.sha1(str(ultima_carga).encode('utf-8'))
+    if not df_agregado_total.empty:
+        huella.update(pd.util.hash_pandas_object(df_agregado_total, index=False).to_numpy().tobytes())
+    return huella.hexdigest()[:16]
+
+
+def _clave_filtros(filtros: dict):
+    canonico = {dimension: sorted(map(str, valores)) if valores is not None else None for dimension, valores in filtros.items()}
+    return hashlib.sha1(json.dumps(canonico, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def ruta_reporte(version: str, filtros: dict):
+    return os.path.join(RUTA_REPORTES, f"reporte_{version}_{_clave_filtros(filtros)}.xlsx")
+
+
+def leer_reporte(version: str, filtros: dict):
+    """Bytes del reporte ya generado para esa versión de datos y esos filtros, o None."""
+    try:
+        with open(ruta_reporte(version, filtros), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _podar_reportes():
+    # Se conservan los más recientes; los de versiones viejas ya nadie los pide
+    reportes = sorted(glob.glob(os.path.join(RUTA_REPORTES, "reporte_*.xlsx")), key=os.path.getmtime, reverse=True)
+    for ruta in reportes[MAX_REPORTES_GUARDADOS:]:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+def generar_reporte(version: str, filtros: dict, construir_hojas):
+    """
+    Arma el libro con las hojas que devuelve construir_hojas() ({nombre: df}) y lo deja en
+    disco. Si otra sesión ya lo generó para la misma versión y filtros, solo se lee.
+    Devuelve (contenido, error): si el disco falla el libro se entrega igual y 'error' lo explica.
+    """
+    contenido = leer_reporte(version, filtros)
+    if contenido is not None:
+        return contenido, None
+    contenido = exportar_libro(construir_hojas())
+    ruta = ruta_reporte(version, filtros)
+    try:
+        os.makedirs(RUTA_REPORTES, exist_ok=True)
+        # Se escribe aparte y se renombra: nadie lee nunca un libro a medio escribir. El
+        # temporal es único por escritura: dos sesiones (hilos del mismo proceso) no lo comparten
+        descriptor, temporal = tempfile.mkstemp(dir=RUTA_REPORTES, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(contenido)
+            os.replace(temporal, ruta)
+        except OSError:
+            os.remove(temporal)
+            raise
+        _podar_reportes()
+    except OSError as e:
+        return contenido, str(e)
+    return contenido, None
@@ -0,0 +1,474 @@
+# dashboard/core/repositorio.py
+import json
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from supabase import Client
+from core.agregados import COLUMNAS_AGREGADO, agregar_operaciones_local, filtrar_agregado
+from core.derivadas import materializar_derivadas
+from config import ESFUERZO_POR_TIPO, TIEMPOS_ESTANDAR_POR_TIPO
+
+TAM_PAGINA = 1000
+MAX_HILOS_LECTURA = 4
+TAM_LOTE_IN = 200 # Llaves por consulta 'in_': mantiene la URL de PostgREST en un tamaño seguro
+RUTA_BD_LOCAL = "/app/logs/operaciones.duckdb" # Junto a los logs, que ya se persisten en un volumen
+
+# Rendimiento de la última lectura paginada por tabla (filas/s y páginas/s)
+ESTADISTICAS_LECTURA = {}
+
+
+def _id_extremo(supabase: Client, tabla: str, desde_id=None, desc=False):
+    query = supabase.table(tabla).select('id')
+    if desde_id is not None:
+        query = query.gt('id', desde_id)
+    response = query.order('id', desc=desc).limit(1).execute()
+    return response.data[0]['id'] if response.data else None
+
+
+def _leer_tramo(supabase: Client, tabla: str, seleccion: str, id_desde: int, id_hasta: int, tam_pagina: int):
+    # Paginación por llave: cada página arranca después del último 'id' recibido
+    filas, paginas, ultimo_id = [], 0, id_desde
+    while True:
+        response = supabase.table(tabla).select(seleccion).gt('id', ultimo_id).lte('id', id_hasta).order('id').limit(tam_pagina).execute()
+        data = response.data
+        paginas += 1
+        filas.extend(data)
+        # Una página incompleta es la última: no hace falta otra consulta vacía
+        if len(data) < tam_pagina: break
+        ultimo_id = data[-1]['id']
+    return filas, paginas
+
+
+def leer_tabla_paginada(supabase: Client, tabla: str, columnas=None, desde_id=None, tam_pagina: int = TAM_PAGINA, max_hilos: int = MAX_HILOS_LECTURA):
+    """
+    Lee una tabla completa (o solo las filas con 'id' mayor a desde_id) usando paginación
+    por llave primaria. El rango de ids se reparte en tramos que se leen en paralelo.
+    """
+    inicio = time.perf_counter()
+    columnas = list(columnas) if columnas else ['*']
+    if '*' not in columnas and 'id' not in columnas:
+        columnas = ['id'] + columnas
+    seleccion = ','.join(columnas)
+
+    filas, paginas = [], 0
+    id_min = _id_extremo(supabase, tabla, desde_id)
+    if id_min is not None:
+        id_max = _id_extremo(supabase, tabla, desde_id, desc=True)
+        num_tramos = max(1, min(max_hilos, (id_max - id_min) // tam_pagina + 1))
+        ancho = (id_max - id_min) // num_tramos + 1
+        tramos = [(id_min - 1 + i * ancho, min(id_max, id_min - 1 + (i + 1) * ancho)) for i in range(num_tramos)]
+        with ThreadPoolExecutor(max_workers=num_tramos) as executor:
+            resultados = executor.map(lambda t: _leer_tramo(supabase, tabla, seleccion, t[0], t[1], tam_pagina), tramos)
+            for filas_tramo, paginas_tramo in resultados: # map conserva el orden de los tramos
+                filas.extend(filas_tramo)
+                paginas += paginas_tramo
+
+    segundos = max(time.perf_counter() - inicio, 1e-6)
+    ESTADISTICAS_LECTURA[tabla] = {
+        'filas': len(filas),
+        'paginas': paginas,
+        'segundos': round(segundos, 3),
+        'filas_por_segundo': round(len(filas) / segundos, 1),
+        'paginas_por_segundo': round(paginas / segundos, 1),
+    }
+    return pd.DataFrame(filas)
+
+
+def agrupar_por_columnas(cambios: list):
+    """Agrupa los cambios por el conjunto de columnas que tocan: {(columnas...): [cambios]}."""
+    grupos = {}
+    for cambio in cambios:
+        grupos.setdefault(tuple(sorted(cambio)), []).append(cambio)
+    return grupos
+
+
+class RepositorioDatos(ABC):
+    """
+    Acceso a las tablas 'operaciones', 'cargas_log' y 'user_sessions'.
+    El resto de la app solo habla con esta interfaz, nunca con el cliente de la base. Un
+    backend al que le falte un método abstracto falla al instanciarse, no al usarlo.
+    """
+    # --- operaciones ---
+    @abstractmethod
+    def leer_operaciones(self, columnas=None, desde_id=None) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def columnas_operaciones(self):
+        """Columnas actuales de la tabla, o None si está vacía."""
+
+    @abstractmethod
+    def insertar_operaciones(self, registros: list):
+        ...
+
+    @abstractmethod
+    def leer_operaciones_por_files(self, files, columnas: list) -> pd.DataFrame:
+        """Las columnas pedidas de las operaciones cuyo 'file' está en 'files'."""
+
+    @abstractmethod
+    def actualizar_operaciones(self, cambios: list):
+        """Actualiza operaciones existentes. Cada cambio es un dict con 'file' y las columnas a escribir (detectar_cambios manda la fila completa)."""
+
+    @abstractmethod
+    def buscar_files_existentes(self, files) -> set:
+        """Devuelve cuáles de los 'file' dados ya están en la tabla, sin leer la tabla entera."""
+
+    def agregar_operaciones(self, filtros: dict = None) -> pd.DataFrame:
+        """
+        Cubo de estadísticas por mes, operativo y tipo (ver core.agregados). Esta versión
+        genérica descarga las filas; los backends que pueden agregar en la base la reemplazan.
+        """
+        df = self.leer_operaciones(columnas=['fecha_file', 'fecha_cierre', 'operativo', 'tipo', 'estado'])
+        if df.empty:
+            return pd.DataFrame(columns=COLUMNAS_AGREGADO)
+        for columna in ('fecha_file', 'fecha_cierre'):
+            df[columna] = pd.to_datetime(df[columna], errors='coerce', utc=True).dt.tz_localize(None)
+        df = df.dropna(subset=['fecha_file']).reset_index(drop=True)
+        return filtrar_agregado(agregar_operaciones_local(materializar_derivadas(df)), filtros or {})
+
+    # --- cargas_log ---
+    @abstractmethod
+    def leer_cargas_log(self) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def buscar_carga_por_hash(self, hash_archivo: str):
+        """La carga más reciente de un archivo con ese hash (dict), o None si nunca se cargó."""
+
+    @abstractmethod
+    def insertar_carga_log(self, registro: dict):
+        ...
+
+    # --- user_sessions ---
+    @abstractmethod
+    def leer_sesiones(self, desde=None, limite=None) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def insertar_sesion(self, registro: dict):
+        ...
+
+
+class RepositorioSupabase(RepositorioDatos):
+    """Implementación sobre el cliente de Supabase (la base de producción)."""
+    def __init__(self, supabase: Client):
+        self.supabase = supabase
+
+    def leer_operaciones(self, columnas=None, desde_id=None):
+        return leer_tabla_paginada(self.supabase, 'operaciones', columnas=columnas, desde_id=desde_id)
+
+    def columnas_operaciones(self):
+        # Con una sola fila basta para saber qué columnas tiene hoy la tabla
+        response = self.supabase.table('operaciones').select("*").limit(1).execute()
+        return set(response.data[0].keys()) if response.data else None
+
+    def insertar_operaciones(self, registros: list):
+        self.supabase.table('operaciones').insert(registros).execute()
+
+    def _leer_lote_por_files(self, lote: list, seleccion: str):
+        return self.supabase.table('operaciones').select(seleccion).in_('file', lote).execute().data
+
+    def leer_operaciones_por_files(self, files, columnas: list):
+        files = sorted(set(files))
+        if not files: return pd.DataFrame(columns=columnas)
+        lotes = [files[i:i + TAM_LOTE_IN] for i in range(0, len(files), TAM_LOTE_IN)]
+        seleccion = ','.join(columnas)
+        filas = []
+        with ThreadPoolExecutor(max_workers=min(MAX_HILOS_LECTURA, len(lotes))) as executor:
+            for parcial in executor.map(lambda lote: self._leer_lote_por_files(lote, seleccion), lotes):
+                filas.extend(parcial)
+        return pd.DataFrame(filas, columns=columnas)
+
+    def buscar_files_existentes(self, files) -> set:
+        return set(self.leer_operaciones_por_files(files, ['file'])['file'])
+
+    def actualizar_operaciones(self, cambios: list):
+        # Upsert sobre 'file' (índice único de sql/operaciones_hash_contenido.sql). Postgres
+        # valida los NOT NULL de la fila propuesta antes de resolver el conflicto: los cambios
+        # deben traer la fila completa (detectar_cambios lo hace). Cada grupo comparte
+        # columnas, así que es un solo request
+        for grupo in agrupar_por_columnas(cambios).values():
+            for i in range(0, len(grupo), TAM_PAGINA):
+                self.supabase.table('operaciones').upsert(grupo[i:i + TAM_PAGINA], on_conflict='file').execute()
+
+    def agregar_operaciones(self, filtros: dict = None):
+        # Función 'agregado_operaciones' definida en sql/agregado_operaciones.sql
+        filtros = filtros or {}
+        parametros = {
+            'p_anios': filtros.get('anios'),
+            'p_meses': filtros.get('meses'),
+            'p_tipos': filtros.get('tipos'),
+            'p_operativos': filtros.get('operativos'),
+        }
+        filas, pagina = [], 0
+        while True: # PostgREST limita cada respuesta a TAM_PAGINA filas
+            response = self.supabase.rpc('agregado_operaciones', parametros).order('año_mes').order('operativo').order('tipo').range(pagina * TAM_PAGINA, (pagina + 1) * TAM_PAGINA - 1).execute()
+            filas.extend(response.data)
+            if len(response.data) < TAM_PAGINA: break
+            pagina += 1
+        return pd.DataFrame(filas, columns=COLUMNAS_AGREGADO)
+
+    def leer_cargas_log(self):
+        response = self.supabase.table('cargas_log').select("*").order('fecha_carga', desc=True).execute()
+        return pd.DataFrame(response.data)
+
+    def buscar_carga_por_hash(self, hash_archivo: str):
+        response = self.supabase.table('cargas_log').select("fecha_carga, registros_limpios").eq('hash_archivo', hash_archivo).order('fecha_carga', desc=True).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    def insertar_carga_log(self, registro: dict):
+        self.supabase.table('cargas_log').insert(registro).execute()
+
+    def leer_sesiones(self, desde=None, limite=None):
+        query = self.supabase.table('user_sessions').select("*")
+        if desde is not None:
+            query = query.gte('session_start', desde.isoformat())
+        query = query.order('session_start', desc=True)
+        if limite is not None:
+            query = query.limit(limite)
+        return pd.DataFrame(query.execute().data)
+
+    def insertar_sesion(self, registro: dict):
+        self.supabase.table('user_sessions').insert(registro).execute()
+
+
+_ESQUEMA_LOCAL = """
+CREATE SEQUENCE IF NOT EXISTS operaciones_id_seq;
+CREATE TABLE IF NOT EXISTS operaciones (
+    id BIGINT DEFAULT nextval('operaciones_id_seq') PRIMARY KEY,
+    file VARCHAR, nit_cliente VARCHAR, cliente VARCHAR, fecha_file TIMESTAMP, tipo VARCHAR,
+    operativo VARCHAR, comercial VARCHAR, fecha_primera_factura TIMESTAMP, fecha_arribo TIMESTAMP,
+    fecha_zarpe TIMESTAMP, envio_facturar VARCHAR, fecha_de_factura TIMESTAMP,
+    fecha_envio_cierre TIMESTAMP, fecha_cierre TIMESTAMP, estado VARCHAR,
+    created_at TIMESTAMP DEFAULT current_timestamp
+);
+ALTER TABLE operaciones ADD COLUMN IF NOT EXISTS hash_contenido VARCHAR;
+CREATE SEQUENCE IF NOT EXISTS cargas_log_id_seq;
+CREATE TABLE IF NOT EXISTS cargas_log (
+    id BIGINT DEFAULT nextval('cargas_log_id_seq'),
+    fecha_carga TIMESTAMP DEFAULT current_timestamp,
+    registros_limpios INTEGER, registros_duplicados INTEGER, calidad_json VARCHAR
+);
+ALTER TABLE cargas_log ADD COLUMN IF NOT EXISTS lotes_exitosos INTEGER;
+ALTER TABLE cargas_log ADD COLUMN IF NOT EXISTS lotes_reintentados INTEGER;
+ALTER TABLE cargas_log ADD COLUMN IF NOT EXISTS hash_archivo VARCHAR;
+CREATE SEQUENCE IF NOT EXISTS user_sessions_id_seq;
+CREATE TABLE IF NOT EXISTS user_sessions (
+    id BIGINT DEFAULT nextval('user_sessions_id_seq'),
+    username VARCHAR, session_start TIMESTAMP, session_end TIMESTAMP,
+    duration_minutes INTEGER, pages_visited VARCHAR
+);
+"""
+
+
+def _case_por_tipo(valores: dict, por_defecto):
+    # Las reglas de config.py como expresión SQL; los valores son números de configuración, no datos del usuario
+    ramas = ' '.join(f"WHEN '{tipo}' THEN {valor}" for tipo, valor in valores.items())
+    return f"(CASE tipo {ramas} ELSE {por_defecto} END)"
+
+
+class RepositorioLocal(RepositorioDatos):
+    """
+    Implementación embebida sobre DuckDB (columnar, sin red). Sirve como base offline para
+    pruebas y perfiles, y como réplica de lectura si se le pasa un repositorio 'origen':
+    en ese caso las lecturas de operaciones se sirven localmente tras traer las filas
+    nuevas del origen, y las escrituras se envían al origen.
+    """
+    def __init__(self, ruta: str = ":memory:", origen: RepositorioDatos = None):
+        import duckdb # Solo lo necesita quien usa el backend local
+        if ruta != ":memory:":
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self.con = duckdb.connect(ruta)
+        self.origen = origen
+        self._lock = threading.Lock() # Una conexión DuckDB no admite uso concurrente
+        self._lock_replica = threading.Lock() # Una sola réplica a la vez: si no, dos ven el mismo último id y traen las mismas filas
+        self.con.execute(_ESQUEMA_LOCAL)
+        self._asegurar_id_unico()
+
+    def _asegurar_id_unico(self):
+        """
+        Las bases creadas antes de declarar 'id' como PRIMARY KEY no tienen la restricción y
+        DuckDB no permite agregarla a una tabla existente: se quitan los duplicados que haya
+        dejado la réplica y se crea un índice único, que cumple la misma función.
+        """
+        tiene_clave = self.con.execute("SELECT count(*) FROM duckdb_constraints() WHERE table_name = 'operaciones' AND constraint_type = 'PRIMARY KEY'").fetchone()[0]
+        if tiene_clave: return
+        self.con.execute("DELETE FROM operaciones WHERE rowid NOT IN (SELECT min(rowid) FROM operaciones GROUP BY id)")
+        self.con.execute("CREATE UNIQUE INDEX IF NOT EXISTS operaciones_id_unico ON operaciones (id)")
+
+    def _consultar(self, sql: str, parametros=None) -> pd.DataFrame:
+        with self._lock:
+            return self.con.execute(sql, parametros or []).df()
+
+    def _insertar(self, tabla: str, registros: list, ignorar_duplicados: bool = False):
+        if not registros: return
+        df = pd.DataFrame(registros)
+        columnas = ', '.join(df.columns)
+        insertar = "INSERT OR IGNORE INTO" if ignorar_duplicados else "INSERT INTO"
+        with self._lock:
+            self.con.register('_registros', df)
+            try:
+                self.con.execute(f"{insertar} {tabla} ({columnas}) SELECT {columnas} FROM _registros")
+            finally:
+                self.con.unregister('_registros')
+
+    def consultar(self, sql: str, parametros=None) -> pd.DataFrame:
+        """Consulta SQL libre sobre las tablas locales (agregaciones a velocidad columnar)."""
+        return self._consultar(sql, parametros)
+
+    def replicar_desde(self, origen: RepositorioDatos):
+        """
+        Copia del origen las operaciones con 'id' mayor al último replicado. Leer el último id,
+        traer y guardar va bajo un mismo lock; además los ids repetidos se ignoran al insertar.
+        """
+        with self._lock_replica:
+            max_id = self._consultar("SELECT max(id) AS max_id FROM operaciones")['max_id'].iloc[0]
+            desde_id = None if pd.isna(max_id) else int(max_id)
+            df_nuevas = origen.leer_operaciones(desde_id=desde_id)
+            if not df_nuevas.empty:
+                columnas_locales = set(self._consultar("SELECT * FROM operaciones LIMIT 0").columns)
+                df_nuevas = df_nuevas[[col for col in df_nuevas.columns if col in columnas_locales]]
+                self._insertar('operaciones', df_nuevas.to_dict(orient='records'), ignorar_duplicados=True)
+            return len(df_nuevas)
+
+    def leer_operaciones(self, columnas=None, desde_id=None):
+        if self.origen is not None:
+            self.replicar_desde(self.origen)
+        seleccion = ', '.join(columnas) if columnas else '*'
+        if columnas and 'id' not in columnas:
+            seleccion = 'id, ' + seleccion
+        if desde_id is None:
+            return self._consultar(f"SELECT {seleccion} FROM operaciones ORDER BY id")
+        return self._consultar(f"SELECT {seleccion} FROM operaciones WHERE id > ? ORDER BY id", [desde_id])
+
+    def buscar_files_existentes(self, files) -> set:
+        if self.origen is not None:
+            return self.origen.buscar_files_existentes(files)
+        files = list(set(files))
+        if not files: return set()
+        df = self._consultar("SELECT DISTINCT file FROM operaciones WHERE list_contains(?, file)", [files])
+        return set(df['file'])
+
+    def leer_operaciones_por_files(self, files, columnas: list):
+        if self.origen is not None:
+            return self.origen.leer_operaciones_por_files(files, columnas)
+        files = list(set(files))
+        if not files: return pd.DataFrame(columns=columnas)
+        return self._consultar(f"SELECT {', '.join(columnas)} FROM operaciones WHERE list_contains(?, file)", [files])
+
+    def actualizar_operaciones(self, cambios: list):
+        if self.origen is not None:
+            self.origen.actualizar_operaciones(cambios)
+        # En modo réplica también se aplica localmente: replicar_desde solo trae ids nuevos
+        for columnas, grupo in agrupar_por_columnas(cambios).items():
+            asignaciones = ', '.join(f"{col} = _cambios.{col}" for col in columnas if col != 'file')
+            with self._lock:
+                self.con.register('_cambios', pd.DataFrame(grupo))
+                try:
+                    self.con.execute(f"UPDATE operaciones SET {asignaciones} FROM _cambios WHERE operaciones.file = _cambios.file")
+                finally:
+                    self.con.unregister('_cambios')
+
+    def agregar_operaciones(self, filtros: dict = None):
+        if self.origen is not None:
+            self.replicar_desde(self.origen)
+        filtros = filtros or {}
+        condiciones, parametros = ["fecha_file IS NOT NULL"], []
+        for clave, expresion in [('anios', 'year(fecha_file)'), ('meses', "strftime(fecha_file, '%Y-%m')"), ('tipos', 'tipo'), ('operativos', 'operativo')]:
+            if filtros.get(clave) is not None:
+                condiciones.append(f"list_contains(?, {expresion})")
+                parametros.append(list(filtros[clave]))
+        # Las mismas reglas que core/derivadas.py: duración en días completos, válida si no es
+        # negativa; éxito si no supera el tiempo estándar del tipo; esfuerzo 1 si el tipo no está
+        esfuerzo = _case_por_tipo(ESFUERZO_POR_TIPO, 1)
+        estandar = _case_por_tipo(TIEMPOS_ESTANDAR_POR_TIPO, 'NULL')
+        return self._consultar(f"""
+            WITH filas AS (
+                SELECT strftime(fecha_file, '%Y-%m') AS año_mes, operativo, tipo,
+                       upper(coalesce(estado, '')) <> 'CERRADO' AS es_abierta,
+                       CASE WHEN date_diff('second', fecha_file, fecha_cierre) >= 0
+                            THEN date_diff('second', fecha_file, fecha_cierre) // 86400 END AS duracion
+                FROM operaciones
+                WHERE {' AND '.join(condiciones)}
+            )
+            SELECT año_mes, operativo, tipo,
+                   count(*) AS total_operaciones,
+                   count(*) FILTER (WHERE es_abierta) AS operaciones_abiertas,
+                   coalesce(sum(duracion), 0) AS duracion_suma,
+                   count(duracion) AS duracion_conteo,
+                   count(*) FILTER (WHERE duracion <= {estandar}) AS operaciones_exitosas,
+                   CAST(count(*) FILTER (WHERE es_abierta) * {esfuerzo} AS DOUBLE) AS esfuerzo_abiertas
+            FROM filas
+            GROUP BY 1, 2, 3
+            ORDER BY 1, 2, 3
+        """, parametros)
+
+    def columnas_operaciones(self):
+        if self.origen is not None:
+            return self.origen.columnas_operaciones()
+        df = self._consultar("SELECT * FROM operaciones LIMIT 1")
+        return None if df.empty else set(df.columns)
+
+    def insertar_operaciones(self, registros: list):
+        if self.origen is not None:
+            self.origen.insertar_operaciones(registros)
+            self.replicar_desde(self.origen)
+        else:
+            self._insertar('operaciones', registros)
+
+    def leer_cargas_log(self):
+        if self.origen is not None:
+            return self.origen.leer_cargas_log()
+        df = self._consultar("SELECT * FROM cargas_log ORDER BY fecha_carga DESC")
+        if not df.empty:
+            # Igual que Supabase, devolvemos el JSON ya decodificado
+            df['calidad_json'] = df['calidad_json'].map(lambda x: json.loads(x) if isinstance(x, str) else [])
+        return df
+
+    def buscar_carga_por_hash(self, hash_archivo: str):
+        if self.origen is not None:
+            return self.origen.buscar_carga_por_hash(hash_archivo)
+        df = self._consultar("SELECT fecha_carga, registros_limpios FROM cargas_log WHERE hash_archivo = ? ORDER BY fecha_carga DESC LIMIT 1", [hash_archivo])
+        return None if df.empty else df.iloc[0].to_dict()
+
+    def insertar_carga_log(self, registro: dict):
+        if self.origen is not None:
+            return self.origen.insertar_carga_log(registro)
+        registro = dict(registro)
+        if 'calidad_json' in registro:
+            registro['calidad_json'] = json.dumps(registro['calidad_json'], default=str)
+        self._insertar('cargas_log', [registro])
+
+    def leer_sesiones(self, desde=None, limite=None):
+        if self.origen is not None:
+            return self.origen.leer_sesiones(desde=desde, limite=limite)
+        sql, parametros = "SELECT * FROM user_sessions", []
+        if desde is not None:
+            sql += " WHERE session_start >= ?"
+            parametros.append(desde)
+        sql += " ORDER BY session_start DESC"
+        if limite is not None:
+            sql += f" LIMIT {int(limite)}"
+        return self._consultar(sql, parametros)
+
+    def insertar_sesion(self, registro: dict):
+        if self.origen is not None:
+            return self.origen.insertar_sesion(registro)
+        self._insertar('user_sessions', [registro])
+
+
+def crear_repositorio(supabase: Client = None, backend: str = None) -> RepositorioDatos:
+    """
+    Elige la implementación según DATA_BACKEND: 'supabase' (por defecto), 'local'
+    (DuckDB sin red) o 'replica' (DuckDB como caché de lectura de Supabase).
+    """
+    backend = (backend or os.environ.get("DATA_BACKEND", "supabase")).lower()
+    ruta = os.environ.get("LOCAL_DB_PATH", RUTA_BD_LOCAL)
+    if backend == "local":
+        return RepositorioLocal(ruta)
+    if backend == "replica":
+        return RepositorioLocal(ruta, origen=RepositorioSupabase(supabase))
+    return RepositorioSupabase(supabase)
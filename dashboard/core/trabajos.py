@@ -0,0 +1,172 @@
+# dashboard/core/trabajos.py
+import io
+import itertools
+import threading
+import time
+import pandas as pd
+import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
+from core.repositorio import RepositorioDatos
+from core.ingesta import leer_en_bloques
+from core.cache_analisis import obtener_cache_analisis
+from core.indice_archivos import obtener_indice_archivos
+from core.processing import analizar_archivo_por_bloques, detectar_cambios, aplicar_cambios, insertar_nuevos_datos, registrar_log_de_carga
+
+MAX_TRABAJOS_GUARDADOS = 20
+TIPOS_INGESTA = ('analisis', 'carga') # Comparten un solo hilo; los demás tipos tienen el suyo
+
+
+class Trabajo:
+    """Estado de un trabajo en segundo plano. Lo escribe el hilo trabajador y lo leen las sesiones."""
+    def __init__(self, id: int, tipo: str, descripcion: str):
+        self.id = id
+        self.tipo = tipo
+        self.descripcion = descripcion
+        self.estado = 'pendiente' # pendiente -> en_curso -> completado | fallido
+        self.progreso = None # 0..1, o None si no se conoce el total
+        self.mensaje = ''
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.terminado = None
+        self.aplicado = False # La UI ya reaccionó al resultado (p. ej. invalidar cachés)
+
+    @property
+    def activo(self):
+        return self.estado in ('pendiente', 'en_curso')
+
+    def reportar(self, progreso=None, mensaje=''):
+        self.progreso = progreso
+        self.mensaje = mensaje
+
+
+class GestorTrabajos:
+    """
+    Tabla de trabajos del proceso y el hilo que los ejecuta. Como vive fuera de la sesión,
+    un trabajo sigue corriendo aunque el script se vuelva a ejecutar o se recargue el navegador.
+    Con un solo hilo los trabajos de carga nunca se pisan entre sí: se ejecutan en orden. Los
+    demás tipos (p. ej. un lote de pronósticos de varios minutos) van a otro hilo para no
+    demorar una carga.
+    """
+    def __init__(self, max_hilos: int = 1):
+        self.executor = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="trabajo")
+        self.executors_aparte = {}
+        self.trabajos = {}
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def enviar(self, tipo: str, descripcion: str, funcion, *args, **kwargs) -> Trabajo:
+        """Encola funcion(trabajo, *args, **kwargs); su valor de retorno queda en trabajo.resultado."""
+        trabajo = Trabajo(next(self._ids), tipo, descripcion)
+        with self.lock:
+            self.trabajos[trabajo.id] = trabajo
+            self._podar()
+            executor = self.executor if tipo in TIPOS_INGESTA else self.executors_aparte.setdefault(tipo, ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"trabajo_{tipo}"))
+        executor.submit(self._ejecutar, trabajo, funcion, args, kwargs)
+        return trabajo
+
+    def _ejecutar(self, trabajo: Trabajo, funcion, args, kwargs):
+        trabajo.estado = 'en_curso'
+        try:
+            trabajo.resultado = funcion(trabajo, *args, **kwargs)
+            trabajo.estado = 'completado'
+        except Exception as e:
+            trabajo.error = str(e)
+            trabajo.estado = 'fallido'
+        finally:
+            trabajo.terminado = time.time()
+
+    def _podar(self):
+        # Se olvidan los trabajos terminados más antiguos; los activos nunca se descartan
+        terminados = [t for t in self.trabajos.values() if not t.activo]
+        for trabajo in terminados[:max(0, len(self.trabajos) - MAX_TRABAJOS_GUARDADOS)]:
+            del self.trabajos[trabajo.id]
+
+    def listar(self):
+        with self.lock:
+            return list(self.trabajos.values())
+
+    def activos(self, tipos=None):
+        return [t for t in self.listar() if t.activo and (tipos is None or t.tipo in tipos)]
+
+    def ultimo(self, tipo: str):
+        """El trabajo más reciente de ese tipo, o None."""
+        trabajos = [t for t in self.listar() if t.tipo == tipo]
+        return trabajos[-1] if trabajos else None
+
+
+@st.cache_resource
+def obtener_gestor_trabajos():
+    # Compartido por todas las sesiones del proceso
+    return GestorTrabajos()
+
+
+# --- Trabajos de ingesta ---
+
+def _buscar_carga_previa(repo: RepositorioDatos, hash_archivo: str):
+    try:
+        return repo.buscar_carga_por_hash(hash_archivo)
+    except Exception:
+        return None # Sin la columna hash_archivo (sql/cargas_log_hash.sql) no se puede saber
+
+
+def analisis_en_cache(hash_archivo: str, nombre: str, repo: RepositorioDatos):
+    """
+    Si ese mismo archivo ya se analizó, reutiliza su lectura (marcada como repetida) sin
+    volver a leerlo. Las filas que desde entonces entraron a la BD pasan a existentes y los
+    cambios se vuelven a comparar con la base actual: otra carga pudo modificar esas filas.
+    """
+    analisis = obtener_cache_analisis().obtener(hash_archivo)
+    if analisis is None: return None
+    df_nuevos, df_existentes = analisis['df_nuevos'], analisis['df_existentes']
+    ya_cargados = obtener_indice_archivos().conocidos_de(df_nuevos['file'])
+    if ya_cargados:
+        mask = df_nuevos['file'].isin(ya_cargados)
+        df_nuevos, df_existentes = df_nuevos[~mask], pd.concat([df_existentes, df_nuevos[mask]], ignore_index=True)
+    cambios, num_cambiados = detectar_cambios(df_existentes, repo)
+    return {**analisis, 'nombre': nombre, 'df_nuevos': df_nuevos, 'df_existentes': df_existentes, 'cambios': cambios, 'num_cambiados': num_cambiados, 'repetido': True, 'carga_previa': _buscar_carga_previa(repo, hash_archivo)}
+
+
+def trabajo_analisis(trabajo: Trabajo, contenido: bytes, nombre: str, repo: RepositorioDatos, hash_archivo: str):
+    """
+    Lee y analiza el archivo subido. 'contenido' son los bytes: el UploadedFile muere con la
+    sesión. En la caché se guarda solo la lectura del archivo, nunca los cambios contra la base.
+    """
+    trabajo.reportar(None, "Buscando un análisis previo del mismo archivo...")
+    analisis_previo = analisis_en_cache(hash_archivo, nombre, repo)
+    if analisis_previo is not None:
+        return analisis_previo
+    archivo = io.BytesIO(contenido)
+    archivo.name = nombre
+    def al_leer(bloques, filas):
+        trabajo.reportar(None, f"Bloque {bloques} · {filas:,} filas leídas")
+    df_nuevos, df_existentes, df_duplicados_internos, resumen_calidad, problemas_esquema = analizar_archivo_por_bloques(leer_en_bloques(archivo), repo, al_progresar=al_leer)
+    trabajo.reportar(None, f"Comparando {len(df_existentes):,} registros existentes...")
+    analisis = {'nombre': nombre, 'hash_archivo': hash_archivo, 'df_nuevos': df_nuevos, 'df_existentes': df_existentes, 'df_duplicados_internos': df_duplicados_internos, 'resumen_calidad': resumen_calidad, 'problemas_esquema': problemas_esquema}
+    obtener_cache_analisis().guardar(hash_archivo, analisis)
+    cambios, num_cambiados = detectar_cambios(df_existentes, repo)
+    return {**analisis, 'cambios': cambios, 'num_cambiados': num_cambiados, 'repetido': False, 'carga_previa': _buscar_carga_previa(repo, hash_archivo)}
+
+
+def trabajo_carga(trabajo: Trabajo, analisis: dict, repo: RepositorioDatos):
+    """
+    Inserta los registros nuevos de un análisis, actualiza los que cambiaron y, si todo
+    entró, registra el log.
+    """
+    def al_progresar(hechos, totales, filas, filas_seg):
+        trabajo.reportar(hechos / totales, f"Lote {hechos}/{totales} · {filas:,} filas · {filas_seg:,.0f} filas/s")
+    resultado = insertar_nuevos_datos(analisis['df_nuevos'], repo, al_progresar=al_progresar)
+    resultado['actualizados'], resultado['files_actualizados'], resultado['log_registrado'] = 0, [], False
+    if analisis['cambios']:
+        trabajo.reportar(None, f"Actualizando {len(analisis['cambios']):,} registros modificados...")
+        try:
+            resultado['actualizados'] = aplicar_cambios(analisis['cambios'], repo)
+            resultado['files_actualizados'] = [cambio['file'] for cambio in analisis['cambios']]
+        except Exception as e:
+            resultado['error_actualizacion'] = str(e)
+    if resultado['lotes_fallidos'] == 0 and 'error_actualizacion' not in resultado:
+        error_log = registrar_log_de_carga(repo, resultado['insertados'], len(analisis['df_existentes']), len(analisis['df_duplicados_internos']), analisis['resumen_calidad'], lotes_exitosos=resultado['lotes_exitosos'], lotes_reintentados=resultado['lotes_reintentados'], hash_archivo=analisis['hash_archivo'])
+        resultado['log_registrado'] = error_log is None
+        if error_log is not None:
+            resultado['error_log'] = error_log
+    return resultado
@@ -0,0 +1,69 @@
+# dashboard/ui/descargas.py
+import pandas as pd
+import streamlit as st
+from core.exportacion import FORMATOS_EXPORTACION, exportar, nombre_archivo
+
+MAX_FILAS_FIRMA = 50_000 # Hasta este tamaño la firma de un DataFrame se calcula con su hash
+
+
+def _firma(datos, firma):
+    if firma is not None:
+        return firma
+    if isinstance(datos, pd.DataFrame) and len(datos) <= MAX_FILAS_FIRMA:
+        return (tuple(datos.columns), int(pd.util.hash_pandas_object(datos, index=False).sum()))
+    return None
+
+
+def boton_descarga_archivo(etiqueta: str, generar, nombre: str, mime: str, key: str, firma=None, contenedor=None):
+    """
+    Descarga en dos pasos de un archivo cualquiera: generar() devuelve sus bytes y solo se llama
+    al pulsar "Preparar"; el resultado queda en la sesión y los reruns siguientes lo entregan sin
+    recalcular. Si 'firma' cambia (otros filtros, nueva versión), el archivo preparado se descarta.
+    """
+    clave = f"descarga_{key}"
+    preparado = st.session_state.get(clave)
+    if preparado is not None and preparado['firma'] != firma:
+        del st.session_state[clave]
+        preparado = None
+
+    # El botón de descarga ocupa el mismo lugar que el de preparar, sin esperar a otro rerun
+    hueco = (contenedor or st).empty()
+    if preparado is None:
+        if not hueco.button(f"Preparar: {etiqueta}", key=f"{clave}_preparar", use_container_width=True):
+            return
+        try:
+            with st.spinner(f"Generando {nombre}..."):
+                contenido = generar()
+        except ValueError as e:
+            st.warning(str(e))
+            return
+        preparado = {'firma': firma, 'contenido': contenido}
+        st.session_state[clave] = preparado
+    hueco.download_button(
+        label=etiqueta,
+        data=preparado['contenido'],
+        file_name=nombre,
+        mime=mime,
+        use_container_width=True,
+        key=f"{clave}_descargar",
+    )
+
+
+def boton_descarga(etiqueta: str, datos, nombre_base: str, key: str, firma=None):
+    """
+    Descarga en Excel, CSV o Parquet que solo se genera cuando el usuario la pide: el primer
+    botón arma el archivo y el segundo lo entrega. 'datos' puede ser el DataFrame o una función
+    que lo devuelve (así ni siquiera se cargan las filas si nadie descarga). 'firma' identifica
+    los datos: si cambia (otros filtros, nueva versión), el archivo preparado se descarta.
+    """
+    col_formato, col_boton = st.columns([1, 2])
+    formato = col_formato.selectbox("Formato", list(FORMATOS_EXPORTACION), key=f"descarga_{key}_formato", label_visibility="collapsed")
+    boton_descarga_archivo(
+        f"{etiqueta} ({formato})",
+        lambda: exportar(datos() if callable(datos) else datos, formato),
+        nombre_archivo(nombre_base, formato),
+        FORMATOS_EXPORTACION[formato][1],
+        key=key,
+        firma=(formato, _firma(datos, firma)),
+        contenedor=col_boton,
+    )
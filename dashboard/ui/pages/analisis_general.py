@@ -1,16 +1,15 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from supabase import Client
+from core.repositorio import RepositorioDatos
 
 
 @st.cache_data(ttl=600)
-def cargar_logs_de_carga(_supabase: Client):
-    response = _supabase.table('cargas_log').select("*").order('fecha_carga', desc=True).execute()
-    return pd.DataFrame(response.data)
+def cargar_logs_de_carga(_repo: RepositorioDatos):
+    return _repo.leer_cargas_log()
 
-def mostrar_kpis_calidad(supabase: Client):
-    logs_df = cargar_logs_de_carga(supabase)
+def mostrar_kpis_calidad(repo: RepositorioDatos):
+    logs_df = cargar_logs_de_carga(repo)
     if logs_df.empty:
         return
 
@@ -37,33 +36,33 @@ def mostrar_kpis_calidad(supabase: Client):
             st.write("**Calidad de Datos de la Última Carga:**")
             st.dataframe(calidad_df, hide_index=True)
 
-def mostrar_analisis_general(df_filtrado):
+def _conteo_por(df_agregado, columna):
+    # Equivale a value_counts() sobre las filas, sin categorías vacías
+    conteo = df_agregado.groupby(columna, observed=True)['total_operaciones'].sum()
+    return conteo[conteo > 0].rename('count').sort_values(ascending=False).reset_index()
+
+def mostrar_analisis_general(df_agregado):
     st.markdown('<h2><i class="bi bi-bar-chart-line-fill"></i> Análisis General y Tendencias</h2>', unsafe_allow_html=True)
     
-    if df_filtrado.empty:
+    # El agregado (mes, operativo, tipo) ya excluye operaciones sin fecha_file
+    if df_agregado.empty:
         st.warning("No hay datos para analizar con los filtros seleccionados."); return
-    df = df_filtrado.copy()
-    df.dropna(subset=['fecha_file'], inplace=True)
-    if df.empty:
-        st.warning("No hay datos con fechas válidas para mostrar tendencias."); return
-        
-    df['año_mes'] = df['fecha_file'].dt.to_period('M').astype(str)
     
     col1, col2 = st.columns(2);
     with col1:
         st.subheader("Tendencia de Operaciones Mensuales")
-        operaciones_por_mes = df.groupby('año_mes')['file'].count().reset_index()
-        fig1 = px.line(operaciones_por_mes.sort_values('año_mes'), x='año_mes', y='file', title="Evolución del Nº de Operaciones", labels={'año_mes': 'Mes', 'file': 'Cantidad'}, markers=True)
+        operaciones_por_mes = df_agregado.groupby('año_mes')['total_operaciones'].sum().reset_index()
+        fig1 = px.line(operaciones_por_mes.sort_values('año_mes'), x='año_mes', y='total_operaciones', title="Evolución del Nº de Operaciones", labels={'año_mes': 'Mes', 'total_operaciones': 'Cantidad'}, markers=True)
         st.plotly_chart(fig1, use_container_width=True)
     with col2:
         st.subheader("Distribución por Tipo de Operación")
-        operaciones_por_tipo = df['tipo'].value_counts().reset_index()
+        operaciones_por_tipo = _conteo_por(df_agregado, 'tipo')
         fig2 = px.pie(operaciones_por_tipo, names='tipo', values='count', title="Proporción por Tipo de Operación", hole=0.4)
         st.plotly_chart(fig2, use_container_width=True)
         
     st.divider()
     st.subheader("Carga de Trabajo por Operativo")
-    carga_por_operativo = df['operativo'].value_counts().reset_index()
+    carga_por_operativo = _conteo_por(df_agregado, 'operativo')
     fig3 = px.bar(carga_por_operativo.sort_values('count', ascending=False).head(15), x='operativo', y='count', title="Operaciones por Operativo (Top 15)", labels={'operativo': 'Operativo', 'count': 'Cantidad'}, color='operativo')
     st.plotly_chart(fig3, use_container_width=True)
 
@@ -2,21 +2,15 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from core.processing import to_excel
+from ui.descargas import boton_descarga
 from config import REFERENCIA_DATA
 
-@st.cache_data
 def calcular_duracion_real(df):
-    df_calc = df.copy()
-    if 'fecha_cierre' not in df_calc.columns or 'fecha_file' not in df_calc.columns:
+    # 'duracion_real_dias' ya viene calculada en el dataset (core/derivadas.py): vacía si la
+    # operación no está cerrada o sus fechas no son válidas
+    if 'duracion_real_dias' not in df.columns:
         return pd.DataFrame()
-    df_calc['fecha_cierre'] = pd.to_datetime(df_calc['fecha_cierre'], errors='coerce')
-    df_calc['fecha_file'] = pd.to_datetime(df_calc['fecha_file'], errors='coerce')
-    df_calc.dropna(subset=['fecha_file', 'fecha_cierre'], inplace=True)
-    if df_calc.empty: return pd.DataFrame()
-    df_calc['duracion_real_dias'] = (df_calc['fecha_cierre'] - df_calc['fecha_file']).dt.days
-    df_calc = df_calc[df_calc['duracion_real_dias'] >= 0]
-    return df_calc
+    return df[df['duracion_real_dias'].notna()]
 
 # --- NUEVA FUNCIÓN ANALÍTICA ---
 def analizar_cuellos_de_botella(df_operaciones_cerradas):
@@ -47,9 +41,10 @@ def analizar_cuellos_de_botella(df_operaciones_cerradas):
         return
 
     # Análisis de Causa Raíz: Contamos qué factores son más comunes en las operaciones lentas.
-    causas_por_tipo = df_lentos['tipo'].value_counts().nlargest(3)
-    causas_por_operativo = df_lentos['operativo'].value_counts().nlargest(3)
-    causas_por_cliente = df_lentos['cliente'].value_counts().nlargest(3) if 'cliente' in df_lentos else None
+    # En columnas categóricas value_counts incluye categorías con 0; las descartamos
+    causas_por_tipo = df_lentos['tipo'].value_counts().loc[lambda s: s > 0].nlargest(3)
+    causas_por_operativo = df_lentos['operativo'].value_counts().loc[lambda s: s > 0].nlargest(3)
+    causas_por_cliente = df_lentos['cliente'].value_counts().loc[lambda s: s > 0].nlargest(3) if 'cliente' in df_lentos else None
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -76,12 +71,29 @@ def analizar_cuellos_de_botella(df_operaciones_cerradas):
     except IndexError:
         st.warning("No se pudo generar una conclusión automática con los datos disponibles.")
 
+def calcular_comparativa_tiempos(df_calculo):
+    """Tiempo estándar de cada tipo junto a la duración real promedio de sus operaciones cerradas."""
+    df_referencia = pd.DataFrame(REFERENCIA_DATA)
+    df_promedio_real = df_calculo.groupby('tipo', observed=True)['duracion_real_dias'].mean().reset_index()
+    df_promedio_real.rename(columns={'tipo': 'Tipo', 'duracion_real_dias': 'Duración Real Promedio (días)'}, inplace=True)
+    df_final = pd.merge(df_referencia, df_promedio_real, on="Tipo", how="left")
+    df_final['Duración Real Promedio (días)'] = df_final['Duración Real Promedio (días)'].round(1)
+    return df_final
+
+
+def calcular_rendimiento_operativo(df_calculo):
+    """Duración promedio, mínima y máxima de las operaciones cerradas de cada operativo."""
+    df_operativo_tiempos = df_calculo.groupby('operativo', observed=True)['duracion_real_dias'].agg(['mean', 'count', 'min', 'max']).reset_index()
+    df_operativo_tiempos.rename(columns={'mean': 'Duración Promedio', 'count': 'Nº Op. Cerradas', 'min': 'Más Rápido (días)', 'max': 'Más Lento (días)'}, inplace=True)
+    df_operativo_tiempos['Duración Promedio'] = df_operativo_tiempos['Duración Promedio'].round(1)
+    return df_operativo_tiempos.sort_values(by='Duración Promedio')
+
+
 def mostrar_analisis_tiempos(df_filtrado):
     st.markdown('<h3><i class="bi bi-clock-history"></i> Análisis de Tiempos de Ciclo y Cumplimiento</h3>', unsafe_allow_html=True)
     if df_filtrado.empty:
         st.warning("No hay datos para calcular los tiempos."); return
-        
-    df_referencia = pd.DataFrame(REFERENCIA_DATA)
+
     df_calculo = calcular_duracion_real(df_filtrado)
     
     if df_calculo.empty:
@@ -90,13 +102,10 @@ def mostrar_analisis_tiempos(df_filtrado):
     # --- TU CÓDIGO ORIGINAL SE MANTIENE INTACTO AQUÍ ---
     st.markdown("#### 1. Comparativa de Tiempos: Estándar vs. Realidad (Tabla)")
     # ... tu código de la tabla ...
-    df_promedio_real = df_calculo.groupby('tipo')['duracion_real_dias'].mean().reset_index()
-    df_promedio_real.rename(columns={'tipo': 'Tipo', 'duracion_real_dias': 'Duración Real Promedio (días)'}, inplace=True)
-    df_final = pd.merge(df_referencia, df_promedio_real, on="Tipo", how="left")
-    df_final['Duración Real Promedio (días)'] = df_final['Duración Real Promedio (días)'].round(1)
+    df_final = calcular_comparativa_tiempos(df_calculo)
     st.dataframe(df_final, use_container_width=True)
     if not df_final.empty:
-        st.download_button("Descargar Tabla Comparativa", to_excel(df_final), "comparativa_tiempos.xlsx")
+        boton_descarga("Descargar Tabla Comparativa", df_final, "comparativa_tiempos", key="comparativa_tiempos")
     st.divider()
     st.markdown("#### 2. Comparativa de Tiempos: Estándar vs. Realidad (Gráfico)")
     # ... tu código del gráfico ...
@@ -108,14 +117,11 @@ def mostrar_analisis_tiempos(df_filtrado):
     st.divider()
     st.markdown("#### 3. Rendimiento por Operativo")
     # ... tu código de la tabla de rendimiento ...
-    df_operativo_tiempos = df_calculo.groupby('operativo')['duracion_real_dias'].agg(['mean', 'count', 'min', 'max']).reset_index()
-    df_operativo_tiempos.rename(columns={'mean': 'Duración Promedio', 'count': 'Nº Op. Cerradas', 'min': 'Más Rápido (días)', 'max': 'Más Lento (días)'}, inplace=True)
-    df_operativo_tiempos['Duración Promedio'] = df_operativo_tiempos['Duración Promedio'].round(1)
-    st.dataframe(df_operativo_tiempos.sort_values(by='Duración Promedio'), use_container_width=True)
+    df_operativo_tiempos = calcular_rendimiento_operativo(df_calculo)
+    st.dataframe(df_operativo_tiempos, use_container_width=True)
     if not df_operativo_tiempos.empty:
-        st.download_button("Descargar Rendimiento por Operativo", to_excel(df_operativo_tiempos), "rendimiento_operativo.xlsx")
+        boton_descarga("Descargar Rendimiento por Operativo", df_operativo_tiempos, "rendimiento_operativo", key="rendimiento_operativo")
 
     # --- AQUÍ INTEGRAMOS LA NUEVA SECCIÓN ANALÍTICA ---
-    # Usamos merge para asegurarnos de que el dataframe de cálculos tenga toda la info necesaria (como el cliente).
-    df_calculo_enriquecido = pd.merge(df_calculo, df_filtrado, on='file', how='left', suffixes=('', '_y'))
-    analizar_cuellos_de_botella(df_calculo_enriquecido)
\ No newline at end of file
+    # df_calculo es un subconjunto de las filas filtradas: ya trae toda la info necesaria (como el cliente)
+    analizar_cuellos_de_botella(df_calculo)
\ No newline at end of file
@@ -5,27 +5,19 @@ import plotly.express as px
 
 # Importamos las funciones y configs necesarias
 from .soporte import calcular_capacidad_disponible
-from .analisis_tiempos import calcular_duracion_real
-from config import TIEMPOS_ESTANDAR_POR_TIPO
+from core.agregados import resumir_cubo
+from core.asignacion_lote import SIN_CAPACIDAD, resolver_asignacion, resumir_plan
+from ui.descargas import boton_descarga
 
-@st.cache_data
-def calcular_eficacia_operativos(df_operaciones_cerradas):
+def calcular_eficacia_operativos(df_cubo_operativo_tipo):
     """
     Calcula la "tasa de éxito" de cada operativo por tipo de operación.
-    Un "éxito" se define como cerrar una operación dentro de su tiempo estándar.
+    Un "éxito" se define como cerrar una operación dentro de su tiempo estándar
+    ('fue_exitoso', calculada al cargar el dataset); el cubo ya trae cuántas lo lograron.
     """
-    if df_operaciones_cerradas.empty:
-        return pd.DataFrame(columns=['operativo', 'tipo', 'eficacia_historica'])
-
-    # Añadimos la columna de tiempo estándar a cada operación
-    df_operaciones_cerradas['tiempo_estandar'] = df_operaciones_cerradas['tipo'].map(TIEMPOS_ESTANDAR_POR_TIPO)
-    
-    # Comparamos: ¿la duración real fue menor o igual al estándar?
-    df_operaciones_cerradas['fue_exitoso'] = df_operaciones_cerradas['duracion_real_dias'] <= df_operaciones_cerradas['tiempo_estandar']
-    
-    # Agrupamos por operativo y tipo, y calculamos el promedio de éxitos (que es la tasa de éxito)
-    df_eficacia = df_operaciones_cerradas.groupby(['operativo', 'tipo'])['fue_exitoso'].mean().reset_index()
-    df_eficacia.rename(columns={'fue_exitoso': 'eficacia_historica'}, inplace=True)
+    # Solo las combinaciones con operaciones cerradas con duración válida
+    df_eficacia = df_cubo_operativo_tipo[df_cubo_operativo_tipo['duracion_conteo'] > 0][['operativo', 'tipo', 'tasa_exito']]
+    df_eficacia = df_eficacia.rename(columns={'tasa_exito': 'eficacia_historica'})
     
     # Convertimos a porcentaje para que sea más legible
     df_eficacia['eficacia_historica'] = (df_eficacia['eficacia_historica'] * 100).round(1)
@@ -33,22 +25,21 @@ def calcular_eficacia_operativos(df_operaciones_cerradas):
     return df_eficacia
 
 
-def mostrar_asignacion(df_filtrado):
-    st.markdown('<h3><i class="bi bi-sign-turn-right-fill"></i> Asignación Estratégica de Cargas</h3>', unsafe_allow_html=True)
-    if df_filtrado.empty:
-        st.warning("No hay datos para generar una guía de asignación."); return
-    
+def calcular_guia_asignacion(df_agregado):
+    """
+    Capacidad disponible, velocidad y eficacia de cada operativo por tipo, combinadas en el
+    índice estratégico, a partir del cubo. Devuelve un DataFrame vacío si no hay capacidad que calcular.
+    """
     # Obtenemos los 3 componentes de nuestro análisis
-    df_capacidad = calcular_capacidad_disponible(df_filtrado)
-    df_duracion = calcular_duracion_real(df_filtrado)
-    df_eficacia = calcular_eficacia_operativos(df_duracion)
-    
+    df_capacidad = calcular_capacidad_disponible(df_agregado)
     if df_capacidad.empty:
-        st.info("No hay datos para calcular la asignación."); return
+        return pd.DataFrame()
 
-    if not df_duracion.empty:
-        df_velocidad = df_duracion.groupby(['operativo', 'tipo'])['duracion_real_dias'].mean().reset_index()
-        df_velocidad.rename(columns={'duracion_real_dias': 'velocidad_promedio_dias'}, inplace=True)
+    df_cubo = resumir_cubo(df_agregado, ['operativo', 'tipo'])
+    df_eficacia = calcular_eficacia_operativos(df_cubo)
+
+    if df_cubo['duracion_conteo'].sum() > 0:
+        df_velocidad = df_cubo[['operativo', 'tipo', 'duracion_promedio']].rename(columns={'duracion_promedio': 'velocidad_promedio_dias'})
         # Unimos capacidad y velocidad
         df_guia = pd.merge(df_capacidad, df_velocidad, on=['operativo', 'tipo'], how='left')
     else:
@@ -57,12 +48,12 @@ def mostrar_asignacion(df_filtrado):
     
     # Unimos la eficacia al dataframe principal
     df_guia = pd.merge(df_guia, df_eficacia, on=['operativo', 'tipo'], how='left')
-    df_guia['eficacia_historica'].fillna(50.0, inplace=True) # Damos un 50% por defecto si no hay datos
+    df_guia['eficacia_historica'] = df_guia['eficacia_historica'].fillna(50.0) # Damos un 50% por defecto si no hay datos
 
     # Rellenamos NaN de velocidad con el promedio del tipo, y luego con el promedio general
-    promedio_por_tipo = df_guia.groupby('tipo')['velocidad_promedio_dias'].transform('mean')
-    df_guia['velocidad_promedio_dias'].fillna(promedio_por_tipo, inplace=True)
-    df_guia['velocidad_promedio_dias'].fillna(df_guia['velocidad_promedio_dias'].mean(), inplace=True)
+    promedio_por_tipo = df_guia.groupby('tipo', observed=True)['velocidad_promedio_dias'].transform('mean')
+    df_guia['velocidad_promedio_dias'] = df_guia['velocidad_promedio_dias'].fillna(promedio_por_tipo)
+    df_guia['velocidad_promedio_dias'] = df_guia['velocidad_promedio_dias'].fillna(df_guia['velocidad_promedio_dias'].mean())
 
     # --- CÁLCULO DEL NUEVO ÍNDICE ESTRATÉGICO ---
     # Índice base (el que ya tenías)
@@ -71,7 +62,36 @@ def mostrar_asignacion(df_filtrado):
     factor_eficacia = 1 + (df_guia['eficacia_historica'] / 100)
     # Índice final
     df_guia['indice_estrategico'] = (indice_base * factor_eficacia).round(2)
+    return df_guia
+
+
+COLUMNAS_GUIA = ['Tipo', 'Operativo', 'Capacidad Disponible', 'Velocidad Promedio (días)', 'Eficacia Histórica (%)', 'Índice Estratégico']
+
+
+def formatear_guia_asignacion(df_guia):
+    """Solo los operativos con capacidad, ordenados por tipo e índice, con los nombres de columna de la tabla."""
+    df_guia_final = df_guia[df_guia['cargas_posibles_adicionales'] > 0].copy()
+    df_guia_final.sort_values(by=['tipo', 'indice_estrategico'], ascending=[True, False], inplace=True)
+    df_guia_final.rename(columns={
+        'tipo': 'Tipo', 
+        'operativo': 'Operativo', 
+        'cargas_posibles_adicionales': 'Capacidad Disponible', 
+        'velocidad_promedio_dias': 'Velocidad Promedio (días)', 
+        'eficacia_historica': 'Eficacia Histórica (%)',
+        'indice_estrategico': 'Índice Estratégico'
+    }, inplace=True)
+    return df_guia_final[COLUMNAS_GUIA]
+
+
+def mostrar_asignacion(df_agregado):
+    st.markdown('<h3><i class="bi bi-sign-turn-right-fill"></i> Asignación Estratégica de Cargas</h3>', unsafe_allow_html=True)
+    if df_agregado.empty:
+        st.warning("No hay datos para generar una guía de asignación."); return
     
+    df_guia = calcular_guia_asignacion(df_agregado)
+    if df_guia.empty:
+        st.info("No hay datos para calcular la asignación."); return
+
     st.info("""
     Esta guía recomienda a quién asignar una nueva operación basándose en 3 factores:
     1. **Disponibilidad:** ¿Quién tiene espacio para más trabajo?
@@ -79,24 +99,12 @@ def mostrar_asignacion(df_filtrado):
     3. **Eficacia:** ¿Quién tiene el mejor historial cumpliendo los plazos para este tipo de operación?
     """)
     
-    df_guia_final = df_guia[df_guia['cargas_posibles_adicionales'] > 0].copy()
+    df_guia_final = formatear_guia_asignacion(df_guia)
     
     if df_guia_final.empty:
         st.warning("Todos los operativos han alcanzado su capacidad ideal."); return
 
-    df_guia_final.sort_values(by=['tipo', 'indice_estrategico'], ascending=[True, False], inplace=True)
-    
-    df_guia_final.rename(columns={
-        'tipo': 'Tipo', 
-        'operativo': 'Operativo', 
-        'cargas_posibles_adicionales': 'Capacidad Disponible', 
-        'velocidad_promedio_dias': 'Velocidad Promedio (días)', 
-        'eficacia_historica': 'Eficacia Histórica (%)',
-        'indice_estrategico': 'Índice Estratégico'
-    }, inplace=True)
-
-    columnas_a_mostrar = ['Tipo', 'Operativo', 'Capacidad Disponible', 'Velocidad Promedio (días)', 'Eficacia Histórica (%)', 'Índice Estratégico']
-    st.dataframe(df_guia_final[columnas_a_mostrar], use_container_width=True)
+    st.dataframe(df_guia_final, use_container_width=True)
     
     st.divider()
     st.markdown('<h3><i class="bi bi-trophy-fill"></i> Ranking Visual de Asignación Estratégica</h3>', unsafe_allow_html=True)
@@ -114,4 +122,39 @@ def mostrar_asignacion(df_filtrado):
     )
     fig.update_layout(yaxis={'categoryorder':'total ascending'})
     st.plotly_chart(fig, use_container_width=True)
-    st.success("Una barra más larga indica una mejor combinación de disponibilidad, velocidad y calidad histórica para ese tipo de tarea.")
\ No newline at end of file
+    st.success("Una barra más larga indica una mejor combinación de disponibilidad, velocidad y calidad histórica para ese tipo de tarea.")
+
+    mostrar_plan_asignacion(df_guia)
+
+
+def mostrar_plan_asignacion(df_guia):
+    """Plan para un lote de operaciones entrantes: quién recibe cada una, sin pasar la capacidad de nadie."""
+    st.divider()
+    st.markdown('<h3><i class="bi bi-diagram-3-fill"></i> Plan de Asignación para Operaciones Entrantes</h3>', unsafe_allow_html=True)
+    st.info("""
+    Indica cuántas operaciones de cada tipo van a llegar. El plan las reparte todas a la vez maximizando el índice
+    estratégico total: cada operativo recibe como mucho su capacidad disponible y cada carga adicional que recibe
+    reduce su índice, así el trabajo no se amontona en el primero del ranking.
+    """)
+    tipos = sorted(df_guia['tipo'].astype(str).unique())
+    df_entrantes = st.data_editor(
+        pd.DataFrame({'Tipo': tipos, 'Operaciones Entrantes': 0}),
+        column_config={'Tipo': st.column_config.TextColumn(disabled=True), 'Operaciones Entrantes': st.column_config.NumberColumn(min_value=0, max_value=1000, step=1)},
+        hide_index=True, use_container_width=True, key="operaciones_entrantes",
+    )
+    cantidades = df_entrantes['Operaciones Entrantes'].fillna(0).astype(int)
+    if cantidades.sum() == 0:
+        st.caption("Ingresa la cantidad de operaciones entrantes por tipo para calcular el plan."); return
+
+    pendientes = pd.DataFrame({'tipo': df_entrantes['Tipo'].repeat(cantidades)})
+    plan = resolver_asignacion(pendientes, df_guia)
+    sin_cupo = int((plan['Operativo'] == SIN_CAPACIDAD).sum())
+    if sin_cupo:
+        st.warning(f"{sin_cupo} operaciones no tienen operativo con capacidad disponible para su tipo.")
+
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.dataframe(plan, hide_index=True, use_container_width=True)
+    with col2:
+        st.dataframe(resumir_plan(plan), use_container_width=True)
+    boton_descarga("Descargar Plan de Asignación", plan, "plan_asignacion", key="plan_asignacion")
@@ -2,24 +2,19 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
+from config import PROMEDIO_IDEAL
+from core.agregados import resumir_cubo
 
 
-
-def mostrar_clasificacion(df, numero_de_meses_analizados):
-    st.markdown('<h3><i class="bi bi-sort-down"></i> Clasificación de Flujo Operativo</h3>', unsafe_allow_html=True)
-    st.info(f"El promedio mensual se calcula sobre un período de **{numero_de_meses_analizados}** meses.")
-    if df.empty:
-        st.warning("No hay datos para mostrar."); return
-        
-    PROMEDIO_IDEAL = {'A': 15, 'M': 10, 'F': 8, 'B': 8, 'S': 10, 'T': 12, 'C': 5}
-    df_agrupado = df.groupby(['operativo', 'tipo'])['file'].count().reset_index()
-    df_agrupado.rename(columns={'file': 'Total general'}, inplace=True)
-    
+def calcular_clasificacion(df_agregado, numero_de_meses_analizados):
+    """Promedio mensual de cada operativo y tipo contra el promedio ideal, con su nivel (ALTO/MEDIO/BAJO)."""
+    df_agrupado = resumir_cubo(df_agregado, ['operativo', 'tipo'])[['operativo', 'tipo', 'total_operaciones']]
+    df_agrupado.rename(columns={'total_operaciones': 'Total general'}, inplace=True)
     if df_agrupado.empty:
-        st.info("No hay datos suficientes para clasificar."); return
+        return df_agrupado
 
     df_agrupado['Promedio mensual'] = df_agrupado['Total general'] / numero_de_meses_analizados
-    df_agrupado['Promedio ideal'] = df_agrupado['tipo'].map(PROMEDIO_IDEAL)
+    df_agrupado['Promedio ideal'] = df_agrupado['tipo'].map(PROMEDIO_IDEAL).astype(float)
     df_agrupado['Índice flujo (%)'] = (df_agrupado['Promedio mensual'] / df_agrupado['Promedio ideal'].replace(0, np.nan)) * 100
     df_agrupado.fillna({'Índice flujo (%)': 0, 'Promedio ideal': 0}, inplace=True)
     
@@ -28,6 +23,18 @@ def mostrar_clasificacion(df, numero_de_meses_analizados):
         elif 70 <= indice < 100: return "MEDIO"
         else: return "ALTO"
     df_agrupado['Nivel'] = df_agrupado['Índice flujo (%)'].apply(clasificar_nivel)
+    return df_agrupado
+
+
+def mostrar_clasificacion(df_agregado, numero_de_meses_analizados):
+    st.markdown('<h3><i class="bi bi-sort-down"></i> Clasificación de Flujo Operativo</h3>', unsafe_allow_html=True)
+    st.info(f"El promedio mensual se calcula sobre un período de **{numero_de_meses_analizados}** meses.")
+    if df_agregado.empty:
+        st.warning("No hay datos para mostrar."); return
+
+    df_agrupado = calcular_clasificacion(df_agregado, numero_de_meses_analizados)
+    if df_agrupado.empty:
+        st.info("No hay datos suficientes para clasificar."); return
 
     st.dataframe(df_agrupado, use_container_width=True)
     
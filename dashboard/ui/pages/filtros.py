@@ -3,6 +3,7 @@
 import streamlit as st
 import pandas as pd
 import locale
+from core.filtrado import obtener_indice_filtros
 
 # Esta era la línea que causaba el error. La hemos eliminado.
 # from config import CAPACIDAD_IDEAL_OPERACIONES, ...
@@ -12,8 +13,15 @@ try:
 except:
     pass
 
-# El resto de tu archivo de filtros se queda exactamente igual.
-def mostrar_filtros(df):
+
+def _nombre_mes(año_mes):
+    # '2024-03' -> 'Marzo 2024'; se formatea solo cada opción, no cada fila
+    return pd.Period(año_mes, freq='M').strftime('%B %Y').capitalize()
+
+
+# Los filtros ahora se eligen sobre el agregado (mes, operativo, tipo), que es pequeño y
+# existe tanto en modo local como en pushdown. Devuelve un dict con las selecciones.
+def mostrar_filtros(df_opciones):
     with st.sidebar:
         st.markdown('<h3><i class="bi bi-funnel-fill"></i> Filtros Globales</h3>', unsafe_allow_html=True)
         st.divider()
@@ -21,54 +29,34 @@ def mostrar_filtros(df):
         with st.expander("Seleccionar Fechas", expanded=True):
             st.markdown('<h5><i class="bi bi-calendar3"></i> Período de Tiempo</h5>', unsafe_allow_html=True)
 
-            all_years = sorted(df['fecha_file'].dt.year.unique())
+            meses_disponibles = sorted(df_opciones['año_mes'].unique())
+            all_years = sorted({int(mes[:4]) for mes in meses_disponibles})
             select_all_years = st.checkbox("Todos los años", value=True, key="cb_years")
             default_years = all_years if select_all_years else (all_years[-1:] if all_years else [])
             selected_years = st.multiselect("Año(s)", all_years, default=default_years)
 
-            df_meses_disponibles = df[df['fecha_file'].dt.year.isin(selected_years)]
-            if not df_meses_disponibles.empty:
-                df_meses_disponibles = df_meses_disponibles.copy()
-                df_meses_disponibles['año_mes_num'] = df_meses_disponibles['fecha_file'].dt.strftime('%Y-%m')
-                df_meses_disponibles['display_month'] = df_meses_disponibles['fecha_file'].dt.strftime('%B %Y').str.capitalize()
-                mes_options = df_meses_disponibles.sort_values('año_mes_num')['display_month'].unique()
-
+            meses_seleccionados = None
+            mes_options = [mes for mes in meses_disponibles if int(mes[:4]) in selected_years]
+            if mes_options:
                 select_all_months = st.checkbox("Todos los meses", value=True, key="cb_months")
-                default_months = list(mes_options) if select_all_months else []
-                meses_seleccionados_display = st.multiselect("Mes(es)", mes_options, default=default_months)
+                default_months = mes_options if select_all_months else []
+                meses_elegidos = st.multiselect("Mes(es)", mes_options, default=default_months, format_func=_nombre_mes)
+                if not select_all_months:
+                    meses_seleccionados = meses_elegidos
 
         with st.expander("Operaciones", expanded=True):
             st.markdown('<h5><i class="bi bi-tags-fill"></i> Categorías de Operación</h5>', unsafe_allow_html=True)
 
-            tipo_options = sorted(df['tipo'].unique())
+            tipo_options = sorted(df_opciones['tipo'].unique())
             tipo = st.multiselect("Tipo de operación", tipo_options, default=tipo_options)
 
-            operativo_options = sorted(df['operativo'].unique())
+            operativo_options = sorted(df_opciones['operativo'].unique())
             operativo = st.multiselect("Operativo", operativo_options, default=operativo_options)
 
-    # --- APLICACIÓN DE FILTROS (SIN NINGÚN CAMBIO) ---
-    df_filtrado = df.copy()
-
-    if selected_years:
-        df_filtrado = df_filtrado[df_filtrado['fecha_file'].dt.year.isin(selected_years)]
-    else:
-        return pd.DataFrame()
-
-    if 'meses_seleccionados_display' in locals() and not select_all_months:
-         if meses_seleccionados_display:
-            df_filtrado['display_month'] = df_filtrado['fecha_file'].dt.strftime('%B %Y').str.capitalize()
-            df_filtrado = df_filtrado[df_filtrado['display_month'].isin(meses_seleccionados_display)]
-         else:
-            return pd.DataFrame()
-
-    if tipo:
-        df_filtrado = df_filtrado[df_filtrado['tipo'].isin(tipo)]
-    else:
-        return pd.DataFrame()
+    return {'anios': selected_years, 'meses': meses_seleccionados, 'tipos': tipo, 'operativos': operativo}
 
-    if operativo:
-        df_filtrado = df_filtrado[df_filtrado['operativo'].isin(operativo)]
-    else:
-        return pd.DataFrame()
 
-    return df_filtrado
\ No newline at end of file
+def aplicar_filtros(df, filtros, version: int):
+    # 'df' es el DataFrame compartido entre sesiones; el índice de su versión resuelve la
+    # combinación con códigos por dimensión y guarda las combinaciones recientes
+    return obtener_indice_filtros(df, version).filtrar(filtros)
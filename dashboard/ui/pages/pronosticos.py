@@ -1,36 +1,128 @@
 import streamlit as st
 import pandas as pd
-from prophet import Prophet
-
-
-
-@st.cache_data(ttl=3600)
-def generar_pronostico_filtrado(_df_historico, periodos, tipo_operacion=None):
-    """
-    Genera un pronóstico para todos los datos o filtrado por un tipo de operación.
-    """
-    df_filtrado = _df_historico.copy()
-    if tipo_operacion != "TODOS":
-        df_filtrado = df_filtrado[df_filtrado['tipo'] == tipo_operacion]
-    
-    if len(df_filtrado) < 10: # Prophet necesita un mínimo de datos
-        return None, None
-
-    # Agrupar por día para la serie temporal
-    df_prophet = df_filtrado.groupby(df_filtrado['fecha_file'].dt.date).size().reset_index(name='y')
-    df_prophet.rename(columns={'fecha_file': 'ds'}, inplace=True)
-    
-    if len(df_prophet) < 2: # Prophet necesita al menos 2 puntos de datos
-        return None, None
-
-    model = Prophet(daily_seasonality=False, weekly_seasonality=True, yearly_seasonality=True, changepoint_prior_scale=0.05)
-    model.fit(df_prophet)
-    
-    future = model.make_future_dataframe(periods=periodos, freq='D')
-    forecast = model.predict(future)
-    return model, forecast
-
-def mostrar_pronosticos(df_operaciones):
+import plotly.express as px
+import plotly.graph_objects as go
+from core.pronosticos import HORIZONTE_MAXIMO, TODOS, MOTOR_PROPHET, obtener_gestor_pronosticos, obtener_series, cargar_pronostico, recortar_horizonte, huella_serie
+from core.pronostico_rapido import MOTORES_RAPIDOS
+from core.pronostico_lotes import FRECUENCIAS_LOTE, MOTOR_LOTE_POR_DEFECTO, pronosticar_lote, leer_pronostico_lote
+from core.trabajos import obtener_gestor_trabajos
+from ui.descargas import boton_descarga
+
+TRABAJO_LOTE = 'pronostico_lote'
+
+
+@st.cache_resource(max_entries=32)
+def _pronostico_rapido(_serie: pd.DataFrame, huella: str, motor: str):
+    # Milisegundos en NumPy: se calcula en la misma petición, una vez por serie y motor
+    return MOTORES_RAPIDOS[motor](_serie, HORIZONTE_MAXIMO)
+
+
+def _grafico_pronostico(serie: pd.DataFrame, forecast: pd.DataFrame, tipo_seleccionado):
+    """El mismo gráfico de Prophet (datos reales, predicción e intervalo) para los motores NumPy."""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=forecast['ds'], y=forecast['yhat_upper'], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=forecast['ds'], y=forecast['yhat_lower'], line=dict(width=0), fill='tonexty', fillcolor='rgba(0, 114, 178, 0.2)', name='Intervalo (80 %)'))
+    fig.add_trace(go.Scatter(x=forecast['ds'], y=forecast['yhat'], line=dict(color='#0072B2'), name='Predicción'))
+    fig.add_trace(go.Scatter(x=serie['ds'], y=serie['y'], mode='markers', marker=dict(color='black', size=3), name='Datos reales'))
+    fig.update_layout(title="Pronóstico de Operaciones Diarias", xaxis_title="Fecha", yaxis_title=f"Operaciones de Tipo '{tipo_seleccionado}'")
+    return fig
+
+
+@st.cache_resource(max_entries=4)
+def _obtener_lote(_df: pd.DataFrame, version: int, motor: str, frecuencia: str):
+    # Una vez por versión del dataset y configuración; si ya está en disco, solo se lee el resumen
+    return pronosticar_lote(_df, motor, frecuencia)
+
+
+def _calcular_lote(trabajo, df: pd.DataFrame, motor: str, frecuencia: str):
+    trabajo.reportar(None, "Pronosticando todas las series operativo × tipo...")
+    return pronosticar_lote(df, motor, frecuencia)
+
+
+def _descripcion_lote(version: int, frecuencia: str):
+    return f"Pronóstico por operativo con {MOTOR_PROPHET} ({frecuencia}, versión {version})"
+
+
+def _trabajo_lote(version: int, frecuencia: str):
+    """El último trabajo de fondo del lote Prophet para esa versión y frecuencia (de cualquier sesión), o None."""
+    descripcion = _descripcion_lote(version, frecuencia)
+    trabajos = [t for t in obtener_gestor_trabajos().listar() if t.tipo == TRABAJO_LOTE and t.descripcion == descripcion]
+    return trabajos[-1] if trabajos else None
+
+
+def _enviar_lote(df: pd.DataFrame, version: int, frecuencia: str):
+    return obtener_gestor_trabajos().enviar(TRABAJO_LOTE, _descripcion_lote(version, frecuencia), _calcular_lote, df, MOTOR_PROPHET, frecuencia)
+
+
+@st.experimental_fragment(run_every=3)
+def _esperar_lote(version: int, frecuencia: str):
+    # Mientras el trabajo de fondo ajusta las series, este fragmento consulta su estado solo
+    trabajo = _trabajo_lote(version, frecuencia)
+    if trabajo is None or not trabajo.activo:
+        st.rerun()
+    st.info("⏳ El lote con Prophet se está calculando en segundo plano; puede demorar varios minutos. Aparecerá aquí en cuanto esté listo.")
+
+
+def mostrar_pronostico_lote(df_operaciones, version: int, periodo_a_predecir: int):
+    """Pronóstico de todas las series operativo × tipo, calculado en lote a pedido."""
+    st.markdown('<h3><i class="bi bi-people"></i> Pronóstico por Operativo y Tipo</h3>', unsafe_allow_html=True)
+    st.caption("Pronostica a la vez cada combinación de operativo y tipo con historia suficiente, para planificar el personal.")
+    col_motor, col_frecuencia = st.columns(2)
+    motores = list(MOTORES_RAPIDOS) + [MOTOR_PROPHET]
+    motor = col_motor.selectbox("Motor del lote:", motores, index=motores.index(MOTOR_LOTE_POR_DEFECTO), key="motor_lote")
+    frecuencia = FRECUENCIAS_LOTE[col_frecuencia.radio("Frecuencia:", list(FRECUENCIAS_LOTE), horizontal=True, key="frecuencia_lote")]
+
+    configuracion = (version, motor, frecuencia)
+    if st.session_state.get("lote_pronostico") != configuracion:
+        if motor == MOTOR_PROPHET:
+            st.caption("Con Prophet cada serie tarda segundos: el lote completo puede demorar varios minutos.")
+        if not st.button("Calcular pronósticos por operativo", key="calcular_lote"): return
+        st.session_state["lote_pronostico"] = configuracion
+    if motor == MOTOR_PROPHET:
+        # Prophet tarda segundos por serie: el lote corre en segundo plano (core/trabajos.py)
+        trabajo = _trabajo_lote(version, frecuencia) or _enviar_lote(df_operaciones, version, frecuencia)
+        if trabajo.activo:
+            _esperar_lote(version, frecuencia); return
+        if trabajo.estado == 'fallido':
+            st.error(f"Ocurrió un error al calcular el lote: {trabajo.error}")
+            if st.button("Reintentar lote", key="reintentar_lote"):
+                _enviar_lote(df_operaciones, version, frecuencia)
+                st.rerun()
+            return
+        resumen = trabajo.resultado
+    else:
+        with st.spinner("Pronosticando todas las series operativo × tipo..."):
+            resumen = _obtener_lote(df_operaciones, version, motor, frecuencia)
+
+    st.caption(f"{resumen['series']} series pronosticadas; {resumen['omitidas']} omitidas por tener pocos datos.")
+    if resumen['fallidas']:
+        with st.expander(f"{len(resumen['fallidas'])} series no se pudieron pronosticar"):
+            st.dataframe(pd.DataFrame(resumen['fallidas']), hide_index=True, use_container_width=True)
+    if resumen['desde'] is None:
+        st.info("Ninguna combinación de operativo y tipo tiene historia suficiente para pronosticar."); return
+
+    hasta = pd.Timestamp(resumen['desde']) + pd.Timedelta(days=periodo_a_predecir - 1)
+    operativos = st.multiselect("Operativos:", sorted(df_operaciones['operativo'].dropna().unique()), key="operativos_lote")
+    tabla = leer_pronostico_lote(resumen['ruta'], operativos=operativos or None, hasta=hasta)
+    por_operativo = tabla.groupby(['operativo', 'ds'], observed=True)['yhat'].sum().reset_index()
+    fig = px.line(por_operativo, x='ds', y='yhat', color='operativo', labels={'ds': 'Fecha', 'yhat': 'Operaciones pronosticadas', 'operativo': 'Operativo'},
+                  title=f"Operaciones pronosticadas por operativo ({periodo_a_predecir} días)")
+    st.plotly_chart(fig, use_container_width=True)
+    totales = tabla.pivot_table(index='operativo', columns='tipo', values='yhat', aggfunc='sum', observed=True).round(0)
+    st.dataframe(totales, use_container_width=True)
+    boton_descarga("Descargar Pronóstico por Operativo", tabla, "pronostico_operativos", key="pronostico_lote", firma=(resumen['ruta'], tuple(operativos), periodo_a_predecir))
+
+
+@st.experimental_fragment(run_every=3)
+def _esperar_pronostico(tipo_seleccionado, serie):
+    # Mientras el proceso de fondo ajusta el modelo, este fragmento consulta su estado solo
+    estado, _ = obtener_gestor_pronosticos().estado(tipo_seleccionado, serie)
+    if estado != 'en_curso':
+        st.rerun()
+    st.info(f"⏳ El pronóstico para '{tipo_seleccionado}' se está calculando en segundo plano con los datos más recientes. Aparecerá aquí en cuanto esté listo.")
+
+
+def mostrar_pronosticos(df_operaciones, version: int):
     st.markdown('<h2><i class="bi bi-calendar-week"></i> Pronóstico de Carga de Trabajo Futura</h2>', unsafe_allow_html=True)
     st.info("Utiliza esta herramienta para predecir el volumen de operaciones futuras, ya sea en general o para un tipo de operación específico. Esto te ayudará a anticipar la demanda y planificar recursos.")
 
@@ -40,7 +132,7 @@ def mostrar_pronosticos(df_operaciones):
         st.subheader("Configuración del Pronóstico")
         
         # Filtro para Tipo de Operación
-        tipos_disponibles = ["TODOS"] + sorted(df_operaciones['tipo'].unique())
+        tipos_disponibles = [TODOS] + sorted(df_operaciones['tipo'].dropna().unique())
         tipo_seleccionado = st.selectbox(
             "Selecciona un Tipo de Operación para pronosticar:",
             options=tipos_disponibles,
@@ -50,24 +142,40 @@ def mostrar_pronosticos(df_operaciones):
         # Slider para el período
         periodo_a_predecir = st.slider(
             "Selecciona el horizonte de pronóstico (en días):",
-            min_value=30, max_value=365, value=90, step=15
+            min_value=30, max_value=HORIZONTE_MAXIMO, value=90, step=15
         )
 
+        # Los motores NumPy responden al instante; Prophet se ajusta en segundo plano
+        motor = st.selectbox("Motor de pronóstico:", [MOTOR_PROPHET] + list(MOTORES_RAPIDOS), index=0)
+
+    model = None
     with col2:
-        try:
-            with st.spinner(f"Generando pronóstico para '{tipo_seleccionado}'..."):
-                model, forecast = generar_pronostico_filtrado(df_operaciones, periodo_a_predecir, tipo_seleccionado)
-            
-            if model is None or forecast is None:
-                st.warning(f"No hay suficientes datos históricos para el tipo '{tipo_seleccionado}' para generar un pronóstico confiable.")
+        # Los modelos se ajustan en segundo plano al cambiar los datos (core/pronosticos.py);
+        # aquí solo se lee de disco el pronóstico al horizonte máximo y se recorta
+        serie = obtener_series(df_operaciones, version).get(str(tipo_seleccionado))
+        if serie is None:
+            st.warning(f"No hay suficientes datos históricos para el tipo '{tipo_seleccionado}' para generar un pronóstico confiable.")
+        elif motor != MOTOR_PROPHET:
+            forecast = recortar_horizonte(_pronostico_rapido(serie, huella_serie(serie), motor), serie['ds'].max(), periodo_a_predecir)
+            st.subheader("Gráfico del Pronóstico")
+            st.plotly_chart(_grafico_pronostico(serie, forecast, tipo_seleccionado), use_container_width=True)
+        else:
+            estado, detalle = obtener_gestor_pronosticos().estado(str(tipo_seleccionado), serie)
+            if estado == 'en_curso':
+                _esperar_pronostico(str(tipo_seleccionado), serie)
+            elif estado == 'fallido':
+                st.error(f"Ocurrió un error al generar el pronóstico: {detalle}")
+                if st.button("Reintentar pronóstico"):
+                    obtener_gestor_pronosticos().reintentar(str(tipo_seleccionado), serie)
+                    st.rerun()
             else:
+                model, forecast_completo = cargar_pronostico(detalle)
+                forecast = recortar_horizonte(forecast_completo, serie['ds'].max(), periodo_a_predecir)
                 st.subheader("Gráfico del Pronóstico")
                 fig = model.plot(forecast, xlabel="Fecha", ylabel=f"Operaciones de Tipo '{tipo_seleccionado}'")
                 ax = fig.gca()
                 ax.set_title(f"Pronóstico de Operaciones Diarias", size=18)
                 st.pyplot(fig)
-        except Exception as e:
-            st.error(f"Ocurrió un error al generar el pronóstico: {e}")
 
     st.divider()
     with st.expander("📖 ¿Cómo interpretar estos gráficos?"):
@@ -81,3 +189,6 @@ def mostrar_pronosticos(df_operaciones):
             st.subheader("Desglose de Componentes del Pronóstico")
             fig_components = model.plot_components(forecast)
             st.pyplot(fig_components)
+
+    st.divider()
+    mostrar_pronostico_lote(df_operaciones, version, periodo_a_predecir)
@@ -1,24 +1,23 @@
 import streamlit as st
-import pandas as pd
-from core.processing import to_excel # <- CAMBIO EN IMPORT
+from ui.descargas import boton_descarga
+from core.agregados import resumir_cubo
 
 
-def mostrar_resumen(df):
+def calcular_resumen(df_agregado):
+    """Total de operaciones por operativo y tipo, ordenado por operativo y volumen."""
+    df_resumen = resumir_cubo(df_agregado, ['operativo', 'tipo'])[['operativo', 'tipo', 'total_operaciones']]
+    return df_resumen.sort_values(by=['operativo', 'total_operaciones'], ascending=[True, False])
+
+
+def mostrar_resumen(df_agregado):
     st.markdown('<h3><i class="bi bi-card-checklist"></i> Resumen de Operaciones por Operativo y Tipo</h3>', unsafe_allow_html=True)
-    if df.empty:
+    if df_agregado.empty:
         st.warning("No hay datos para mostrar.")
         return
-    df_resumen = df.groupby(['operativo', 'tipo']).agg(total_operaciones=('file', 'count')).reset_index()
-    df_resumen.sort_values(by=['operativo', 'total_operaciones'], ascending=[True, False], inplace=True)
+    df_resumen = calcular_resumen(df_agregado)
     st.dataframe(df_resumen, use_container_width=True)
     if not df_resumen.empty:
-        datos_excel = to_excel(df_resumen)
-        st.download_button(
-            label="Descargar Resumen en Excel",
-            data=datos_excel,
-            file_name="resumen_operaciones.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-    total_operaciones = df.shape[0]
+        boton_descarga("Descargar Resumen", df_resumen, "resumen_operaciones", key="resumen")
+    total_operaciones = int(df_agregado['total_operaciones'].sum())
     st.metric(label="Total de operaciones (según filtros)", value=f"{total_operaciones:,}")
 
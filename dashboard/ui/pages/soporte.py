@@ -2,37 +2,44 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from config import ESFUERZO_POR_TIPO
 from config import PROMEDIO_IDEAL # Importamos la regla de negocio que necesitamos
+from core.agregados import resumir_cubo
 
-def calcular_capacidad_disponible(df):
+def calcular_capacidad_disponible(df_agregado):
     """
-    Calcula la capacidad disponible de cada operativo.
+    Calcula la capacidad disponible de cada operativo a partir del cubo (mes, operativo, tipo).
     Esta función es usada por el módulo de Asignación.
     """
-    if df.empty or 'estado' not in df.columns: 
+    if df_agregado.empty:
         return pd.DataFrame()
     
-    # Filtramos solo las operaciones abiertas
-    df_abiertas = df[df['estado'].str.upper() != 'CERRADO'].copy()
-    
-    # Contamos las operaciones abiertas por operativo y tipo
-    df_capacidad = df_abiertas.groupby(['operativo', 'tipo'])['file'].count().reset_index()
-    df_capacidad.rename(columns={'file': 'operaciones_abiertas'}, inplace=True)
-    
-    # Unimos con todos los operativos y tipos para no perder a los que no tienen cargas
-    df_todos = pd.DataFrame([(op, tipo) for op in df['operativo'].unique() for tipo in df['tipo'].unique()], columns=['operativo', 'tipo'])
-    df_capacidad = pd.merge(df_todos, df_capacidad, on=['operativo', 'tipo'], how='left').fillna(0)
+    # Operaciones abiertas por operativo y tipo, sobre la grilla completa operativo × tipo
+    # para no perder a los que no tienen cargas (o no tienen operaciones de ese tipo)
+    df_abiertas = resumir_cubo(df_agregado, ['operativo', 'tipo']).set_index(['operativo', 'tipo'])['operaciones_abiertas']
+    grilla = pd.MultiIndex.from_product([df_agregado['operativo'].unique(), df_agregado['tipo'].unique()], names=['operativo', 'tipo'])
+    df_capacidad = df_abiertas.reindex(grilla, fill_value=0).reset_index()
     
     # Mapeamos la capacidad ideal y calculamos la disponible
-    df_capacidad['capacidad_ideal'] = df_capacidad['tipo'].map(PROMEDIO_IDEAL).fillna(0)
+    df_capacidad['capacidad_ideal'] = df_capacidad['tipo'].map(PROMEDIO_IDEAL).astype(float).fillna(0)
     df_capacidad['cargas_posibles_adicionales'] = df_capacidad['capacidad_ideal'] - df_capacidad['operaciones_abiertas']
     df_capacidad['cargas_posibles_adicionales'] = df_capacidad['cargas_posibles_adicionales'].clip(lower=0).astype(int)
     
     return df_capacidad[['operativo', 'tipo', 'cargas_posibles_adicionales']]
 
 
-def analizar_balance_carga(df_filtrado):
+def calcular_balance_carga(df_agregado):
+    """Operaciones abiertas y esfuerzo ponderado (ESFUERZO_POR_TIPO) de cada operativo."""
+    # Nos quedamos con las combinaciones que tienen operaciones sin cerrar
+    df_abiertas = df_agregado[df_agregado['operaciones_abiertas'] > 0]
+    if df_abiertas.empty:
+        return pd.DataFrame(columns=['operativo', 'cantidad_operaciones', 'esfuerzo_total'])
+
+    # El cubo ya trae los puntos de esfuerzo de las abiertas de cada celda
+    df_carga = resumir_cubo(df_abiertas, ['operativo'])
+    return df_carga.rename(columns={'operaciones_abiertas': 'cantidad_operaciones', 'esfuerzo_abiertas': 'esfuerzo_total'})[['operativo', 'cantidad_operaciones', 'esfuerzo_total']]
+
+
+def analizar_balance_carga(df_agregado):
     """
     Esta función analiza la carga de trabajo desde dos perspectivas:
     1. Cantidad de operaciones abiertas.
@@ -44,22 +51,11 @@ def analizar_balance_carga(df_filtrado):
     A la derecha, quién tiene el **mayor peso de trabajo** basado en la complejidad de esas operaciones.
     """)
 
-    # Filtramos solo las operaciones que no están cerradas
-    df_abiertas = df_filtrado[df_filtrado['estado'].str.upper() != 'CERRADO'].copy()
-    
-    if df_abiertas.empty:
+    df_carga = calcular_balance_carga(df_agregado)
+    if df_carga.empty:
         st.success("¡No hay operaciones abiertas en el período seleccionado para analizar la carga de trabajo!")
         return
 
-    # Mapeamos la puntuación de esfuerzo a cada operación abierta
-    df_abiertas['puntos_esfuerzo'] = df_abiertas['tipo'].map(ESFUERZO_POR_TIPO).fillna(1) # Asignamos 1 si el tipo no está en el dict
-
-    # Agrupamos por operativo y calculamos ambas métricas
-    df_carga = df_abiertas.groupby('operativo').agg(
-        cantidad_operaciones=('file', 'count'),
-        esfuerzo_total=('puntos_esfuerzo', 'sum')
-    ).reset_index()
-
     col1, col2 = st.columns(2)
 
     with col1:
@@ -105,6 +101,6 @@ def analizar_balance_carga(df_filtrado):
         aunque no necesariamente tengan la mayor cantidad de tareas. Esto puede justificar su percepción de alta carga laboral.
         """)
 
-def mostrar_soporte(df_filtrado):
+def mostrar_soporte(df_agregado):
     # La función principal ahora llama al nuevo análisis
-    analizar_balance_carga(df_filtrado)
\ No newline at end of file
+    analizar_balance_carga(df_agregado)
\ No newline at end of file
@@ -0,0 +1,55 @@
+# dashboard/ui/reporte.py
+import streamlit as st
+from core.reportes import version_reporte, generar_reporte
+from core.exportacion import FORMATOS_EXPORTACION
+from ui.pages.analisis_general import cargar_logs_de_carga
+from ui.descargas import boton_descarga_archivo
+from ui.pages.resumen import calcular_resumen
+from ui.pages.clasificacion import calcular_clasificacion
+from ui.pages.analisis_tiempos import calcular_duracion_real, calcular_comparativa_tiempos, calcular_rendimiento_operativo
+from ui.pages.soporte import calcular_balance_carga
+from ui.pages.asignacion import calcular_guia_asignacion, formatear_guia_asignacion
+
+
+def construir_hojas_reporte(df_agregado, obtener_filtrado, numero_de_meses):
+    """Las tablas de resumen de cada pestaña, con los mismos cálculos que muestran las páginas."""
+    hojas = {
+        'Resumen': calcular_resumen(df_agregado),
+        'Clasificación': calcular_clasificacion(df_agregado, numero_de_meses),
+        'Capacidad': calcular_balance_carga(df_agregado),
+    }
+    df_filtrado = obtener_filtrado()
+    df_calculo = calcular_duracion_real(df_filtrado) if not df_filtrado.empty else df_filtrado
+    if not df_calculo.empty:
+        hojas['Tiempos'] = calcular_comparativa_tiempos(df_calculo)
+        hojas['Rendimiento Operativo'] = calcular_rendimiento_operativo(df_calculo)
+    if not df_agregado.empty:
+        df_guia = calcular_guia_asignacion(df_agregado)
+        if not df_guia.empty:
+            hojas['Asignación'] = formatear_guia_asignacion(df_guia)
+    return hojas
+
+
+def mostrar_descarga_reporte(repo, df_agregado_total, df_agregado, seleccion, numero_de_meses, obtener_filtrado, firma=None):
+    """
+    Reporte consolidado en un solo Excel. Nada se calcula hasta pulsar "Preparar": entonces se
+    lee del disco si otra sesión ya lo generó para esa versión de datos y filtros, o se arma y se
+    guarda. Si el disco falla se avisa una sola vez; el libro queda igual en la sesión.
+    """
+    filtros = {**seleccion, 'numero_de_meses': [numero_de_meses]}
+
+    def generar():
+        logs_df = cargar_logs_de_carga(repo)
+        ultima_carga = logs_df['fecha_carga'].iloc[0] if not logs_df.empty else None
+        contenido, error = generar_reporte(
+            version_reporte(df_agregado_total, ultima_carga), filtros,
+            lambda: construir_hojas_reporte(df_agregado, obtener_filtrado, numero_de_meses),
+        )
+        if error is not None:
+            st.warning(f"El reporte se generó pero no se pudo guardar para otras sesiones: {error}")
+        return contenido
+
+    boton_descarga_archivo(
+        "Reporte Consolidado (Excel)", generar, "reporte_consolidado.xlsx", FORMATOS_EXPORTACION['Excel'][1],
+        key="reporte_consolidado", firma=(firma, numero_de_meses),
+    )
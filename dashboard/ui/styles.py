@@ -19,19 +19,25 @@ def load_lottie_url(url: str):
         return None
     return r.json()
 
-# Tu función 'inyectar_iconos_en_tabs' original
+# Tu función 'inyectar_iconos_en_tabs' original, ahora sobre la navegación por radio de app.py.
+# Se llama justo antes del radio: deja una marca y los estilos solo alcanzan al radio que la
+# sigue, no a los demás radios de la app (p. ej. la frecuencia en Pronósticos)
+ICONOS_NAVEGACION = ["\\f428", "\\f54d", "\\f1c8", "\\f551", "\\f223", "\\f28c", "\\f1f3", "\\f4f6"]
+_NAVEGACION = '.element-container:has(#navegacion-secciones) + .element-container div[role="radiogroup"]'
+
 def inyectar_iconos_en_tabs():
-    st.markdown("""
+    iconos = "\n    ".join(
+        f'{_NAVEGACION} > label:nth-child({i}) p::before {{ font-family: "bootstrap-icons"; content: "{icono}"; margin-right: 8px; }}'
+        for i, icono in enumerate(ICONOS_NAVEGACION, start=1)
+    )
+    st.markdown(f"""
+    <span id="navegacion-secciones"></span>
     <style>
-    button[data-baseweb="tab"] { display: flex; align-items: center; gap: 8px; }
-    button[data-baseweb="tab"]:nth-child(1)::before { font-family: "bootstrap-icons"; content: "\\f428"; }
-    button[data-baseweb="tab"]:nth-child(2)::before { font-family: "bootstrap-icons"; content: "\\f54d"; }
-    button[data-baseweb="tab"]:nth-child(3)::before { font-family: "bootstrap-icons"; content: "\\f1c8"; }
-    button[data-baseweb="tab"]:nth-child(4)::before { font-family: "bootstrap-icons"; content: "\\f551"; }
-    button[data-baseweb="tab"]:nth-child(5)::before { font-family: "bootstrap-icons"; content: "\\f223"; }
-    button[data-baseweb="tab"]:nth-child(6)::before { font-family: "bootstrap-icons"; content: "\\f28c"; }
-    button[data-baseweb="tab"]:nth-child(7)::before { font-family: "bootstrap-icons"; content: "\\f1f3"; }
-    button[data-baseweb="tab"]:nth-child(8)::before { font-family: "bootstrap-icons"; content: "\\f4f6"; }
+    {_NAVEGACION} {{ gap: 4px; border-bottom: 1px solid rgba(49, 51, 63, 0.2); }}
+    {_NAVEGACION} > label {{ padding: 6px 12px; margin: 0; border-bottom: 2px solid transparent; }}
+    {_NAVEGACION} > label > div:first-child {{ display: none; }}
+    {_NAVEGACION} > label:has(input:checked) {{ border-bottom-color: #ff4b4b; color: #ff4b4b; }}
+    {iconos}
     </style>
     """, unsafe_allow_html=True)
 
@@ -0,0 +1,64 @@
+-- sql/agregado_operaciones.sql
+-- Agregados del dashboard calculados en Postgres (modo AGGREGATION_PUSHDOWN=1).
+-- Ejecutar una vez en el editor SQL de Supabase. Los parámetros en NULL no filtran.
+-- Devuelve el cubo de estadísticas por mes, operativo y tipo (core/agregados.py). Los
+-- tiempos estándar y el esfuerzo por tipo repiten TIEMPOS_ESTANDAR_POR_TIPO y
+-- ESFUERZO_POR_TIPO de config.py: si cambian allí, actualizarlos aquí.
+
+create index if not exists operaciones_fecha_file_idx on public.operaciones (fecha_file);
+
+-- El tipo de retorno cambió (nuevas medidas del cubo): 'create or replace' no puede cambiarlo
+drop function if exists public.agregado_operaciones(int[], text[], text[], text[]);
+
+create or replace function public.agregado_operaciones(
+    p_anios int[] default null,
+    p_meses text[] default null,
+    p_tipos text[] default null,
+    p_operativos text[] default null
+)
+returns table (
+    "año_mes" text,
+    operativo text,
+    tipo text,
+    total_operaciones bigint,
+    operaciones_abiertas bigint,
+    duracion_suma bigint,
+    duracion_conteo bigint,
+    operaciones_exitosas bigint,
+    esfuerzo_abiertas double precision
+)
+language sql
+stable
+as $$
+    with filas as (
+        select to_char(o.fecha_file, 'YYYY-MM') as "año_mes",
+               o.operativo,
+               o.tipo,
+               upper(coalesce(o.estado, '')) <> 'CERRADO' as es_abierta,
+               -- Días completos entre fecha_file y fecha_cierre; nula si falta o es negativa
+               case when o.fecha_cierre >= o.fecha_file
+                    then floor(extract(epoch from (o.fecha_cierre - o.fecha_file)) / 86400)::bigint
+               end as duracion
+        from public.operaciones o
+        where o.fecha_file is not null
+          and (p_anios is null or extract(year from o.fecha_file)::int = any(p_anios))
+          and (p_meses is null or to_char(o.fecha_file, 'YYYY-MM') = any(p_meses))
+          and (p_tipos is null or o.tipo = any(p_tipos))
+          and (p_operativos is null or o.operativo = any(p_operativos))
+    )
+    select f."año_mes",
+           f.operativo,
+           f.tipo,
+           count(*) as total_operaciones,
+           count(*) filter (where f.es_abierta) as operaciones_abiertas,
+           coalesce(sum(f.duracion), 0)::bigint as duracion_suma,
+           count(f.duracion) as duracion_conteo,
+           count(*) filter (where f.duracion <= case f.tipo
+                when 'A' then 30 when 'M' then 90 when 'F' then 90 when 'B' then 90
+                when 'S' then 90 when 'T' then 30 when 'C' then 30 end) as operaciones_exitosas,
+           (count(*) filter (where f.es_abierta) * case f.tipo
+                when 'A' then 3 when 'M' then 9 when 'F' then 9 when 'B' then 9
+                when 'S' then 9 when 'T' then 3 when 'C' then 3 else 1 end)::double precision as esfuerzo_abiertas
+    from filas f
+    group by 1, 2, 3;
+$$;
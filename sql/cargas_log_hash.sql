@@ -0,0 +1,6 @@
+-- sql/cargas_log_hash.sql
+-- Hash SHA-256 del archivo subido, para detectar que un archivo ya se cargó.
+-- Ejecutar una vez en el editor SQL de Supabase.
+
+alter table public.cargas_log add column if not exists hash_archivo text;
+create index if not exists cargas_log_hash_archivo_idx on public.cargas_log (hash_archivo);
@@ -0,0 +1,6 @@
+-- sql/cargas_log_lotes.sql
+-- Columnas para registrar cómo se insertó cada carga (insertar_nuevos_datos por lotes).
+-- Ejecutar una vez en el editor SQL de Supabase.
+
+alter table public.cargas_log add column if not exists lotes_exitosos integer;
+alter table public.cargas_log add column if not exists lotes_reintentados integer;
@@ -0,0 +1,7 @@
+-- sql/operaciones_hash_contenido.sql
+-- Detección de cambios en recargas: hash del contenido de cada operación y upsert por 'file'.
+-- Ejecutar una vez en el editor SQL de Supabase. El índice único falla si ya hay 'file'
+-- repetidos en la tabla: depurarlos antes (la app ya descarta duplicados al cargar).
+
+alter table public.operaciones add column if not exists hash_contenido text;
+create unique index if not exists operaciones_file_key on public.operaciones (file);